@@ -0,0 +1,93 @@
+# aes_zip.py
+# In-process AES-256 zip encryption, replacing the 7zz subprocess.
+#
+# Writes the same WinZip AES-256 (AE-2) format as `7zz a -tzip -mem=AES256`,
+# so 7-Zip, WinZip, PeaZip, Keka etc. open the result as before. Files are
+# streamed through deflate + AES by ZipFile.write(), so memory use stays flat
+# for multi-GB inputs, and ZIP64 is used automatically past 4 GB. The password
+# never leaves this process (no shell command line for `ps` to show).
+#
+# zip_many() builds independent zips in parallel on a process pool sized to the
+# machine's cores; compression and encryption are CPU bound, so threads would
+# serialize on the GIL.
+#
+#   python aes_zip.py out.zip Hello.txt test.txt      # prompts for the password
+
+import getpass
+import os
+import sys
+import uuid
+
+COMPRESS_LEVEL = 6         # deflate level; 7zz's default for -tzip is similar
+
+
+def zip_with_password(output_zip, files, password, compresslevel=COMPRESS_LEVEL):
+    # Encrypt files into a password protected zip using AES-256.
+    # The zip is written next to output_zip under a unique temp name and renamed
+    # into place when complete, so a crash never leaves a truncated archive and
+    # two processes building the same output can't interleave their writes.
+    import pyzipper  # deferred so callers that only plan zips (e.g. --dry-run) start fast
+
+    for file in files:
+        if not os.path.isfile(file):
+            raise FileNotFoundError(f'File not found: {file}')
+
+    tmp_path = f'{output_zip}.{uuid.uuid4().hex}.tmp'
+    try:
+        with pyzipper.AESZipFile(tmp_path, 'w', compression=pyzipper.ZIP_DEFLATED,
+                                 compresslevel=compresslevel, encryption=pyzipper.WZ_AES) as zf:
+            zf.setpassword(password.encode('utf-8'))
+            zf.setencryption(pyzipper.WZ_AES, nbits=256)
+            for file in files:
+                # Takes the compression level from the AESZipFile's compresslevel
+                zf.write(file, os.path.basename(file))
+        os.replace(tmp_path, output_zip)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return output_zip
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def zip_many(jobs, workers=None):
+    # Build several independent zips in parallel.
+    # jobs: iterable of (output_zip, files, password).
+    # Yields (output_zip, error) as each finishes; error is None on success.
+    jobs = list(jobs)
+    workers = min(workers or default_workers(), len(jobs))
+    if workers <= 1:
+        for output_zip, files, password in jobs:
+            try:
+                zip_with_password(output_zip, files, password)
+                yield output_zip, None
+            except Exception as e:
+                yield output_zip, e
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed  # multiprocessing is slow to import
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(zip_with_password, *job): job[0] for job in jobs}
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+                yield futures[fut], None
+            except Exception as e:
+                yield futures[fut], e
+
+
+def main():
+    if len(sys.argv) < 3:
+        print('usage: python aes_zip.py OUTPUT.zip FILE [FILE ...]')
+        return 2
+    password = getpass.getpass('Zip password: ')
+    zip_with_password(sys.argv[1], sys.argv[2:], password)
+    print(f'Wrote {sys.argv[1]} ({os.path.getsize(sys.argv[1]) / 1024:.2f} KB)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# bench_mime.py
+# Peak memory of building and sending one email per attachment size: the
+# in-memory EmailMessage + 'raw' body path against mime_spool's spooled
+# message + media upload. Sends go to the local stub service (fake_gmail.py),
+# which reads uploads the way googleapiclient sends them. Each case runs in
+# its own process so peaks don't carry over.
+#
+#   python bench_mime.py
+#   python bench_mime.py --sizes 50 200 500 --inline-max 200
+
+import argparse
+import base64
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import tempfile
+import time
+from email.message import EmailMessage
+
+import gmail_sender
+import mime_spool
+from fake_gmail import FakeGmailService
+
+
+def _make_attachment(path, size_mb):
+    block = os.urandom(1024 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def _inline_email(sender, to, subject, body, attachment):
+    # The whole message in memory as a 'raw' body, the way the script used to send
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = to
+    msg.set_content(body)
+    with open(attachment, 'rb') as f:
+        msg.add_attachment(f.read(), maintype='application', subtype='zip', filename=os.path.basename(attachment))
+    return {'raw': base64.urlsafe_b64encode(msg.as_bytes()).decode()}
+
+
+def _run(mode, attachment, results):
+    service = FakeGmailService()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if mode == 'inline':
+        message = _inline_email('me@example.com', 'you@example.com', 'Encrypted File', 'Hi', attachment)
+        result = gmail_sender.send_one(service, message)
+    else:
+        with mime_spool.spool_email('me@example.com', 'you@example.com', 'Encrypted File', 'Hi',
+                                    attachment) as message:
+            result = gmail_sender.send_one(service, message)
+    elapsed = time.perf_counter() - t0
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 1024
+    results.put((result.ok, elapsed, peak_mb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Email build + send memory: inline vs spooled')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200], help='attachment sizes in MB')
+    parser.add_argument('--inline-max', type=int, default=200,
+                        help='largest size to try with the in-memory path (it needs ~5x the size in RAM)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='mime-bench-')
+    print(f"{'mode':<8} {'MB':>6} {'seconds':>8} {'peak +MB':>9} {'peak/size':>10}")
+    try:
+        for size_mb in args.sizes:
+            attachment = os.path.join(workdir, f'attachment_{size_mb}.zip')
+            _make_attachment(attachment, size_mb)
+            for mode in ('inline', 'spooled'):
+                if mode == 'inline' and size_mb > args.inline_max:
+                    continue
+                results = mp.Queue()
+                proc = mp.Process(target=_run, args=(mode, attachment, results))
+                proc.start()
+                ok, elapsed, peak_mb = results.get()
+                proc.join()
+                assert ok, f'{mode} send of {size_mb} MB failed'
+                print(f'{mode:<8} {size_mb:>6} {elapsed:>8.2f} {peak_mb:>9.1f} {peak_mb / size_mb:>10.2f}')
+            os.remove(attachment)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
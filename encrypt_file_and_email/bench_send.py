@@ -0,0 +1,53 @@
+# bench_send.py
+# Messages/second of gmail_sender.send_all() at different concurrency levels,
+# against the local fake service (fake_gmail.py) with simulated API latency
+# and a share of 429/5xx responses that get retried. A last run with the
+# default token bucket shows the rate limit holding regardless of concurrency.
+#
+#   python bench_send.py
+#   python bench_send.py --messages 500 --latency 0.2 --error-rate 0.1
+
+import argparse
+import time
+
+import gmail_sender
+from fake_gmail import FakeGmailService
+
+
+def run(n, concurrency, latency, error_rate, rate, base_delay):
+    service = FakeGmailService(latency=latency, error_rate=error_rate, seed=concurrency)
+    messages = ((i, {'raw': f'message {i}'}) for i in range(n))
+    t0 = time.perf_counter()
+    results = gmail_sender.send_all(lambda: service, messages, concurrency=concurrency, rate=rate,
+                                    base_delay=base_delay, max_delay=base_delay * 8)
+    elapsed = time.perf_counter() - t0
+    sent = sum(r.ok for r in results)
+    retries = sum(r.attempts - 1 for r in results)
+    assert len(results) == n and len(service.sent) == sent
+    assert service.max_in_flight <= concurrency
+    return elapsed, sent, retries, service.max_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent Gmail sender throughput (fake service)')
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.1, help='simulated seconds per API call')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='share of calls failing with 429/5xx')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--base-delay', type=float, default=0.05, help='backoff base, shortened for the bench')
+    args = parser.parse_args()
+
+    print(f'{args.messages} messages, {args.latency * 1000:.0f} ms per call, '
+          f'{args.error_rate:.0%} transient errors')
+    print(f"{'concurrency':>11} {'rate limit':>10} {'seconds':>8} {'msgs/s':>8} {'sent':>6} {'retries':>8} {'peak':>5}")
+    runs = [(c, None) for c in args.concurrency]
+    runs.append((max(args.concurrency), gmail_sender.DEFAULT_RATE))
+    for concurrency, rate in runs:
+        n = args.messages if rate is None else min(args.messages, 25)
+        elapsed, sent, retries, peak = run(n, concurrency, args.latency, args.error_rate, rate, args.base_delay)
+        limit = f'{rate:g}/s' if rate else 'off'
+        print(f'{concurrency:>11} {limit:>10} {elapsed:>8.2f} {sent / elapsed:>8.1f} {sent:>6} {retries:>8} {peak:>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# bench_startup.py
+# Cold-start budget for the email script. Each case runs in a fresh
+# interpreter and is timed from its first import to ready-to-work; the median
+# of --repeat runs is checked against BUDGET_MS. Cases also list modules that
+# must NOT be loaded by then: --dry-run, for one, shouldn't pay for the Google
+# client libraries or pyzipper. The "gmail client" case starts with the script
+# already imported; "discovery.build" is the old way of making a client, for
+# comparison.
+#
+#   python bench_startup.py
+#   python bench_startup.py --profile "dry run"    # heaviest imports via -X importtime
+#   python bench_startup.py --suggest              # print a budget from this machine
+#
+# Exit status is 1 when a case's median is over budget or loads a lazy module.
+
+import argparse
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GOOGLE = ['googleapiclient', 'google.auth', 'google.oauth2', 'google_auth_oauthlib']
+HEADROOM = 2.0     # --suggest prints the measured median times this...
+MIN_SLACK_MS = 25  # ...but at least this much over it, so tiny cases aren't all noise
+
+# name -> (untimed setup, timed code, modules that must stay unloaded)
+CASES = {
+    'import script': ('', 'import file_encrypt_email_OAuth', GOOGLE + ['pyzipper']),
+    'dry run': ('import sys, contextlib, io\nfrom pathlib import Path',
+                'import file_encrypt_email_OAuth as m\n'
+                'm.RECIPIENTS_CSV, m.ZIP_CACHE_DIR, m.TOKEN_PATH = Path(RECIPIENTS), CACHE, Path(TOKEN)\n'
+                'sys.argv = ["x", "--dry-run"]\n'
+                'with contextlib.redirect_stdout(io.StringIO()):\n'
+                '    m.main()',
+                GOOGLE + ['pyzipper']),
+    'gmail client': ('import file_encrypt_email_OAuth as m',
+                     'from google.oauth2.credentials import Credentials\n'
+                     'm.build_service(Credentials(token="x"))',
+                     ['google_auth_oauthlib']),
+    'discovery.build': ('',
+                        'from googleapiclient.discovery import build\n'
+                        'from google.oauth2.credentials import Credentials\n'
+                        'build("gmail", "v1", credentials=Credentials(token="x"))',
+                        []),
+    'client per thread': ('import file_encrypt_email_OAuth as m\n'
+                          'from google.oauth2.credentials import Credentials\n'
+                          'creds = Credentials(token="x"); m.build_service(creds)',
+                          'm.build_service(creds)',
+                          []),
+}
+
+# Medians x HEADROOM on a 1-CPU Linux VM (python bench_startup.py --suggest)
+BUDGET_MS = {
+    'import script': 74,
+    'dry run': 84,
+    'gmail client': 209,
+    'discovery.build': 268,
+    'client per thread': 27,
+}
+
+_PROBE = '''
+import json, sys, time
+RECIPIENTS, CACHE, TOKEN = {recipients!r}, {cache!r}, {token!r}
+{setup}
+t0 = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {lazy!r} if m in sys.modules]}}))
+'''
+
+
+def _set_up(workdir, recipients=50):
+    # A recipients CSV over a few small files, and a cache dir with them hashed
+    paths = {}
+    for i in range(5):
+        paths[i] = os.path.join(workdir, f'file_{i}.txt')
+        with open(paths[i], 'w') as f:
+            f.write(f'file {i}\n' * 1000)
+    recipients_csv = os.path.join(workdir, 'recipients.csv')
+    with open(recipients_csv, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'email', 'filename', 'password'])
+        for i in range(recipients):
+            writer.writerow([f'R{i}', f'r{i}@example.com', paths[i % 5], f'pw{i % 10}'])
+    token = os.path.join(workdir, 'token.json')
+    with open(token, 'w') as f:
+        json.dump({'token': 'x', 'refresh_token': 'r', 'expiry': '2099-01-01T00:00:00Z'}, f)
+    return recipients_csv, os.path.join(workdir, 'cache'), token
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SCRIPT_DIR, env.get('PYTHONPATH')]))
+    return env
+
+
+def measure(name, paths, repeat):
+    setup, code, lazy = CASES[name]
+    recipients, cache, token = paths
+    probe = _PROBE.format(recipients=recipients, cache=cache, token=token, setup=setup, code=code, lazy=lazy)
+    samples, loaded = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', probe], env=_env(), cwd=tempfile.gettempdir(),
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result['ms'])
+        loaded = result['loaded']
+    return statistics.median(samples), loaded
+
+
+def profile(name, paths, top=15):
+    # Heaviest imports (cumulative) for one case, from -X importtime
+    setup, code, _ = CASES[name]
+    recipients, cache, token = paths
+    source = f'RECIPIENTS, CACHE, TOKEN = {recipients!r}, {cache!r}, {token!r}\n{setup}\n{code}'
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', source], env=_env(),
+                         cwd=tempfile.gettempdir(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, module = line.split('|')
+        rows.append((int(cumulative_us), module.rstrip()))
+    print(f'heaviest imports for {name!r} (cumulative ms):')
+    for cumulative_us, module in sorted(rows, reverse=True)[:top]:
+        print(f'{cumulative_us / 1000:>9.1f}  {module}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Email script startup time budget')
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per case (median is used)')
+    parser.add_argument('--suggest', action='store_true', help=f'print measured medians x{HEADROOM} as a budget')
+    parser.add_argument('--profile', metavar='CASE', choices=list(CASES), help='show -X importtime for one case')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='email-startup-') as workdir:
+        paths = _set_up(workdir)
+        if args.profile:
+            profile(args.profile, paths)
+            return 0
+
+        ok = True
+        measured = {}
+        print(f"{'case':<20} {'median ms':>10} {'budget ms':>10}")
+        for name in CASES:
+            ms, loaded = measure(name, paths, args.repeat)
+            measured[name] = ms
+            limit = BUDGET_MS.get(name)
+            notes = []
+            if limit is not None and ms > limit:
+                notes.append('OVER BUDGET')
+            if loaded:
+                notes.append(f"loaded {', '.join(loaded)}")
+            ok = ok and not notes
+            limit_text = f'{limit:>10}' if limit is not None else f"{'-':>10}"
+            print(f'{name:<20} {ms:>10.1f} {limit_text}  {"  ".join(notes)}')
+
+    if args.suggest:
+        print('BUDGET_MS = {')
+        for name, ms in measured.items():
+            print(f"    '{name}': {round(max(ms * HEADROOM, ms + MIN_SLACK_MS))},")
+        print('}')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
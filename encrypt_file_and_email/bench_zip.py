@@ -0,0 +1,164 @@
+# bench_zip.py
+# Throughput of the in-process AES-256 zip (aes_zip.py) against the old
+# per-file `7zz` subprocess, plus peak memory on a large input and scaling of
+# zip_many() across worker processes. The 7zz rows are skipped when 7zz/7z
+# isn't on PATH. Each archive is read back and decrypted to check it.
+#
+#   python bench_zip.py
+#   python bench_zip.py --small 500 --large-mb 2048
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pyzipper
+
+import aes_zip
+
+PASSWORD = 'bench-Password-123'
+VERIFY_CHUNK = 1024 * 1024
+
+
+def _make_file(path, size, seed):
+    # Half random, half repetitive text, so deflate has some work to do
+    rnd = os.urandom(size // 2)
+    text = (f'line {seed} of some fairly ordinary invoice text\n' * (size // 80 + 1)).encode()[:size - len(rnd)]
+    with open(path, 'wb') as f:
+        f.write(rnd + text)
+
+
+def _make_large_file(path, size_mb):
+    block = os.urandom(512 * 1024) + b'x' * (512 * 1024)
+    with open(path, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def _7zz():
+    return shutil.which('7zz') or shutil.which('7z')
+
+
+def zip_7zz(exe, output_zip, files, password):
+    # The old code path: one shell + 7zz process per archive
+    file_list = ' '.join(f'"{file}"' for file in files)
+    command = f'{exe} a -tzip -p"{password}" -mem=AES256 "{output_zip}" {file_list}'
+    result = subprocess.run(command, shell=True, stdout=subprocess.DEVNULL)
+    if result.returncode != 0:
+        raise RuntimeError('Failed to create encrypted zip file')
+
+
+def verify(zip_path, source):
+    with pyzipper.AESZipFile(zip_path) as zf:
+        zf.setpassword(PASSWORD.encode())
+        name = zf.namelist()[0]
+        with zf.open(name) as member, open(source, 'rb') as original:
+            while True:
+                a = member.read(VERIFY_CHUNK)
+                if a != original.read(VERIFY_CHUNK):
+                    raise AssertionError(f'{zip_path}: contents differ')
+                if not a:
+                    return
+
+
+def bench_small(workdir, count, size):
+    sources = []
+    for i in range(count):
+        path = os.path.join(workdir, f'small_{i}.txt')
+        _make_file(path, size, i)
+        sources.append(path)
+    total_mb = count * size / 1e6
+
+    rows = []
+    t0 = time.perf_counter()
+    for src in sources:
+        aes_zip.zip_with_password(src + '.aes.zip', [src], PASSWORD)
+    rows.append(('in-process', time.perf_counter() - t0))
+
+    exe = _7zz()
+    if exe:
+        t0 = time.perf_counter()
+        for src in sources:
+            zip_7zz(exe, src + '.7zz.zip', [src], PASSWORD)
+        rows.append((os.path.basename(exe) + ' subprocess', time.perf_counter() - t0))
+
+    print(f'\n{count} files of {size / 1024:.0f} KB, one archive each (sequential)')
+    print(f"{'engine':<22} {'seconds':>8} {'ms/zip':>8} {'MB/s':>8}")
+    for label, elapsed in rows:
+        print(f'{label:<22} {elapsed:>8.2f} {elapsed / count * 1000:>8.2f} {total_mb / elapsed:>8.1f}')
+    if not exe:
+        print('(7zz/7z not found on PATH; subprocess row skipped)')
+    for src in sources[:5]:
+        verify(src + '.aes.zip', src)
+    return sources
+
+
+def _zip_large(src, out, results):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    aes_zip.zip_with_password(out, [src], PASSWORD)
+    elapsed = time.perf_counter() - t0
+    results.put((elapsed, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 1024))
+
+
+def bench_large(workdir, size_mb):
+    src = os.path.join(workdir, 'large.bin')
+    _make_large_file(src, size_mb)
+    out = src + '.aes.zip'
+    # Own process, so the peak RSS reading belongs to this archive alone
+    results = mp.Queue()
+    proc = mp.Process(target=_zip_large, args=(src, out, results))
+    proc.start()
+    elapsed, peak_mb = results.get()
+    proc.join()
+
+    print(f'\none {size_mb} MB file')
+    print(f'in-process   {elapsed:>8.2f}s {size_mb / elapsed:>8.1f} MB/s  peak +{peak_mb:.1f} MB RSS  '
+          f'zip {os.path.getsize(out) / 1e6:.1f} MB')
+    exe = _7zz()
+    if exe:
+        t0 = time.perf_counter()
+        zip_7zz(exe, src + '.7zz.zip', [src], PASSWORD)
+        elapsed = time.perf_counter() - t0
+        print(f'{os.path.basename(exe):<12} {elapsed:>8.2f}s {size_mb / elapsed:>8.1f} MB/s')
+    verify(out, src)
+    os.remove(src)
+
+
+def bench_parallel(workdir, sources):
+    print(f'\nzip_many over {len(sources)} files')
+    print(f"{'workers':>7} {'seconds':>8} {'zips/s':>8}")
+    levels = sorted({1, 2, aes_zip.default_workers()})
+    for workers in levels:
+        jobs = [(f'{src}.w{workers}.zip', [src], PASSWORD) for src in sources]
+        t0 = time.perf_counter()
+        errors = [e for _, e in aes_zip.zip_many(jobs, workers=workers) if e is not None]
+        elapsed = time.perf_counter() - t0
+        if errors:
+            raise errors[0]
+        print(f'{workers:>7} {elapsed:>8.2f} {len(jobs) / elapsed:>8.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AES zip throughput: in-process vs 7zz')
+    parser.add_argument('--small', type=int, default=200, help='number of small files')
+    parser.add_argument('--small-kb', type=int, default=64, help='size of each small file')
+    parser.add_argument('--large-mb', type=int, default=512, help='size of the large file (0 to skip)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='aes-zip-bench-')
+    try:
+        sources = bench_small(workdir, args.small, args.small_kb * 1024)
+        bench_parallel(workdir, sources)
+        if args.large_mb:
+            bench_large(workdir, args.large_mb)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
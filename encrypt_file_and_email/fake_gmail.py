@@ -0,0 +1,101 @@
+# fake_gmail.py
+# Local stand-in for the Gmail API service object, for tests and benchmarks.
+# Supports service.users().messages().send(userId=..., body=..., media_body=...)
+# .execute() with configurable latency and a configurable share of 429/5xx
+# failures, and keeps counts that are safe to read from several threads.
+# Media uploads are read the way googleapiclient sends them (resumable ones in
+# chunksize pieces) and recorded by size and SHA-256 rather than kept.
+#
+#   service = FakeGmailService(latency=0.05, error_rate=0.1)
+#   gmail_sender.send_all(lambda: service, messages)
+
+import hashlib
+import random
+import threading
+import time
+
+
+class FakeHttpError(Exception):
+    # Shaped like googleapiclient.errors.HttpError: .resp.status and a dict-like .resp
+    def __init__(self, status, reason, retry_after=None):
+        self.resp = _Response(status, retry_after)
+        self.reason = reason
+        super().__init__(f'<HttpError {status}: "{reason}">')
+
+
+class _Response(dict):
+    def __init__(self, status, retry_after=None):
+        super().__init__({'status': str(status)})
+        if retry_after is not None:
+            self['retry-after'] = str(retry_after)
+        self.status = status
+
+
+class FakeGmailService:
+    def __init__(self, latency=0.0, error_rate=0.0, error_statuses=(429, 500, 503), seed=None):
+        self.latency = latency              # seconds per send call
+        self.error_rate = error_rate        # share of calls that fail with an error status
+        self.error_statuses = error_statuses
+        self.sent = []                      # bodies of successful sends, in order
+        self.calls = 0
+        self.failures = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId, body=None, media_body=None):
+        return _Request(self, body, media_body)
+
+    def _execute(self, body, media_body):
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            fail = self._random.random() < self.error_rate
+            status = self._random.choice(self.error_statuses) if fail else None
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if status is not None:
+                with self._lock:
+                    self.failures += 1
+                reason = 'rateLimitExceeded' if status == 429 else 'backendError'
+                raise FakeHttpError(status, reason)
+            if media_body is not None:
+                body = _read_media(media_body)
+            with self._lock:
+                self.sent.append(body)
+                return {'id': f'fake-{len(self.sent)}', 'labelIds': ['SENT']}
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class _Request:
+    def __init__(self, service, body, media_body):
+        self._service = service
+        self._body = body
+        self._media_body = media_body
+
+    def execute(self, num_retries=0):
+        return self._service._execute(self._body, self._media_body)
+
+
+def _read_media(media):
+    # MediaUpload interface: size(), chunksize(), resumable(), getbytes()
+    size = media.size()
+    step = media.chunksize() if media.resumable() and media.chunksize() > 0 else size
+    digest = hashlib.sha256()
+    offset = 0
+    while offset < size:
+        chunk = media.getbytes(offset, step)
+        digest.update(chunk)
+        offset += len(chunk)
+    return {'media_size': size, 'sha256': digest.hexdigest(), 'mimetype': media.mimetype()}
@@ -3,44 +3,48 @@
 # This program will compress a file then encrypt it using AES-256. 
 # The password protected .zip file is then emailed using the GMail API
 
+import argparse
 import csv
+import json
 import os
-import base64
-import subprocess
-import time
-import googleapiclient.errors
-from email.message import EmailMessage
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from functools import lru_cache, partial
+import gmail_sender
+from mime_spool import spool_email
+from zip_cache import DEFAULT_MAX_BYTES, ZipCache
 
 # Build accurate file paths
 SCRIPT_DIR = Path(__file__).resolve().parent
 CREDENTIALS_PATH = SCRIPT_DIR / "credentials.json"
 TOKEN_PATH = SCRIPT_DIR / "token.json"
 RECIPIENTS_CSV = SCRIPT_DIR / "recipients.csv"
+ZIP_CACHE_DIR = SCRIPT_DIR / ".zip_cache"
 
 # Gmail API scope for sending email
 SCOPES = ['https://www.googleapis.com/auth/gmail.send']
 
-def zip_with_password(output_zip, files, password):
-    # Encrypt files into a password protected zip using AES-256
-    '''
-    for file in files:
-        if not os.path.isfile(file):
-            raise FileNotFoundError('File not found')
-    '''
-    
-    file_list = " ".join(f'"{file}"' for file in files)
-    command = f'7zz a -tzip -p"{password}" -mem=AES256 "{output_zip}" {file_list}'
-    result = subprocess.run(command, shell=True)
-    if result.returncode != 0:
-        raise RuntimeError("Failed to create encrypted zip file")
-    
-def authenticate_gmail():
+# Before sending, the access token is refreshed if it would expire within the
+# expected send time plus this margin, so the refresh doesn't land mid-send
+TOKEN_MARGIN = timedelta(minutes=5)
+
+# The Google client libraries take about 300 ms to import, so they're imported
+# inside the functions below rather than up here: --dry-run never loads them
+
+def zip_name(filename):
+    # Name of the encrypted attachment as the recipient sees it
+    return f"{os.path.splitext(os.path.basename(filename))[0]}_protected.zip"
+
+def utcnow():
+    # Naive UTC, the way google-auth stores token expiry
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def load_credentials():
     # Load credentials or prompt user to log in
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     creds = None
 
     if TOKEN_PATH.exists():
@@ -61,82 +65,160 @@ def authenticate_gmail():
             creds = flow.run_local_server(port=0) 
         TOKEN_PATH.write_text(creds.to_json())
 
-    return build('gmail', 'v1', credentials=creds)
+    # If a long run still gets close to expiry, refresh on a background thread
+    # instead of holding up the send that notices
+    creds.with_non_blocking_refresh()
+    return creds
 
-def create_email(sender, to, subject, body, attachment):
-    msg = EmailMessage()
-    msg['Subject'] = subject
-    msg['From'] = sender
-    msg['To'] = to
-    msg.set_content(body)
-    
-    with open(attachment, 'rb') as f:
-        msg.add_attachment(f.read(), maintype='application', subtype='zip', filename=os.path.basename(attachment))
-        
-    encoded = base64.urlsafe_b64encode(msg.as_bytes()).decode()
-    return {'raw': encoded}
+def refresh_if_expiring(creds, min_valid):
+    # Refresh now if the token expires within min_valid (a timedelta)
+    if creds.expiry is None or not creds.refresh_token or creds.expiry - utcnow() > min_valid:
+        return creds
+    from google.auth.transport.requests import Request
+    creds.refresh(Request())
+    TOKEN_PATH.write_text(creds.to_json())
+    return creds
 
-def send_email(service, message):
+def token_status():
+    # token.json's state in words, read without the Google libraries
+    if not TOKEN_PATH.exists():
+        if CREDENTIALS_PATH.exists():
+            return "no token.json yet; a browser login will be needed"
+        return f"no token.json or {CREDENTIALS_PATH.name}; sending will fail"
     try:
-        result = service.users().messages().send(userId='me', body=message).execute()
-        print(f"Email sent! ID: {result['id']}")
-    except googleapiclient.errors.HttpError as e:
-        print("Gmail API error:", e)
-    except TimeoutError as e:
-        print("Timeout occurred. Retrying in 5 seconds...")
-        time.sleep(5)
-        try:
-            result = service.users().messages().send(userId='me', body=message).execute()
-            print(f"Email sent after retry! ID: {result['id']}")
-        except Exception as e:
-            print("Failed again:", e)
-    except Exception as e:
-        print("Unexpected error:", e)
+        token = json.loads(TOKEN_PATH.read_text())
+        left = datetime.fromisoformat(token['expiry'].rstrip('Z')) - utcnow()
+    except (ValueError, KeyError):
+        return "token.json has no readable expiry; it will be refreshed"
+    if left > timedelta(0):
+        return f"access token valid for another {left.total_seconds() / 60:.0f} min"
+    if token.get('refresh_token'):
+        return "access token expired; it will be refreshed before sending"
+    return "access token expired and can't be refreshed; a browser login will be needed"
+
+@lru_cache(maxsize=None)
+def gmail_discovery_doc():
+    # The Gmail API description google-api-python-client ships with, read once
+    # per run, so building a client never fetches it over the network
+    from googleapiclient.discovery_cache import get_static_doc
+    return get_static_doc('gmail', 'v1')
+
+def build_service(creds):
+    # One per thread: the client's HTTP transport isn't thread-safe.
+    # Each build parses the document itself, since building patches the parsed
+    # copy in place.
+    from googleapiclient.discovery import build, build_from_document
+    doc = gmail_discovery_doc()
+    if doc is None:
+        return build('gmail', 'v1', credentials=creds, static_discovery=False)
+    return build_from_document(doc, credentials=creds)
+
+def email_body(name, password):
+    return (
+        f'Hi {name},\n\n'
+        'This is a test of the OAuth version of file_encrypt_email_OAuth.\n'
+        f'The password is: {password}\n'
+        '- Leyton'
+        )
+
+def print_result(result):
+    row = result.key
+    if result.ok:
+        print(f"Sent to {row['email']}: {row['zip_name']}, password {row['password']} "
+              f"(ID: {result.message_id}, attempts: {result.attempts})")
+    else:
+        print(f"FAILED {row['email']}: {result.error} (attempts: {result.attempts})")
+
+def dry_run(rows, cache):
+    # What a real run would send, checked without encrypting, logging in or sending
+    status = cache.lookup((row['filename'], row['password']) for row in rows)
+    for row in rows:
+        found = status[(row['filename'], row['password'])]
+        if isinstance(found, OSError):
+            state = f"can't read file: {found}"
+        else:
+            state = 'zip cached' if found else 'zip to be built'
+        print(f"Would send {zip_name(row['filename'])} to {row['email']} ({state})")
+    cached = sum(found is True for found in status.values())
+    print(f"\n{len(rows)} email(s); {cached} of {len(status)} encrypted zip(s) already cached")
+    print(f"Gmail login: {token_status()}")
+
+def write_report(path, results):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'email', 'attachment', 'status', 'message_id', 'attempts', 'seconds', 'error'])
+        for r in results:
+            writer.writerow([r.key['name'], r.key['email'], r.key['zip_name'], 'sent' if r.ok else 'failed',
+                             r.message_id or '', r.attempts, f'{r.elapsed:.2f}', r.error or ''])
 
     
 def main():
     # === Configuration ===
     sender = 'leytonmeadows16@gmail.com'
     subject = 'Encrypted File'
-    
-    gmail_service = authenticate_gmail()
+
+    parser = argparse.ArgumentParser(description='Encrypt files and email them via the Gmail API')
+    parser.add_argument('--concurrency', type=int, default=gmail_sender.DEFAULT_CONCURRENCY,
+                        help='sends in flight at once')
+    parser.add_argument('--rate', type=float, default=gmail_sender.DEFAULT_RATE,
+                        help='max sends per second (Gmail quota: 2.5)')
+    parser.add_argument('--report', help='write per-recipient outcomes to this CSV')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_MAX_BYTES // 2 ** 20,
+                        help='size limit of the encrypted zip cache in MB')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='check recipients, files and login, then exit without encrypting or sending')
+    args = parser.parse_args()
 
     if not RECIPIENTS_CSV.exists():
-        raise FileNotFound(f"Recipients CSV not found: {RECIPIENTS_CSV}")
+        raise FileNotFoundError(f"Recipients CSV not found: {RECIPIENTS_CSV}")
     
+    rows = []
     with open(str(RECIPIENTS_CSV), newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            name = row['name']
-            email = row['email']
-            filename = row['filename']
-            password = row['password']
-            
-            if not os.path.exists(filename):
-                print(f"Skipping {name}: File not found - {filename}")
+        for row in csv.DictReader(csvfile):
+            if not os.path.exists(row['filename']):
+                print(f"Skipping {row['name']}: File not found - {row['filename']}")
                 continue
-            
-            body = (
-                f'Hi {name},\n\n'
-                'This is a test of the OAuth version of file_encrypt_email_OAuth.\n'
-                f'The password is: {password}\n'
-                '- Leyton'
-                )
+            rows.append(row)
+
+    cache = ZipCache(ZIP_CACHE_DIR, max_bytes=args.cache_mb * 2 ** 20)
+    if args.dry_run:
+        dry_run(rows, cache)
+        return
+
+    # Log in before the (possibly long) encryption, so a missing login fails fast
+    creds = load_credentials()
+
+    # Encrypt every distinct file/password pair up front, in parallel; pairs
+    # encrypted by an earlier run come straight from the cache
+    zips = cache.build((row['filename'], row['password']) for row in rows)
+    print(f"Encrypted zips: {cache.hits} reused from cache, {cache.misses} created")
+
+    messages = []
+    for row in rows:
+        row['zip_name'] = zip_name(row['filename'])
+        zip_path, error = zips[(row['filename'], row['password'])]
+        if error is not None:
+            print(f"Skipping {row['name']}: could not encrypt {row['filename']}: {error}")
+            continue
+        # Spooled to a temp file on the sending thread and uploaded from there, so
+        # memory stays flat whatever the attachment size
+        build_message = partial(spool_email, sender, row['email'], subject,
+                                email_body(row['name'], row['password']), zip_path,
+                                filename=row['zip_name'])
+        messages.append((row, build_message))
+    cache.evict(keep=[path for path, _ in zips.values() if path])
+
+    expected = timedelta(seconds=len(messages) / args.rate if args.rate else 0)
+    refresh_if_expiring(creds, expected + TOKEN_MARGIN)
 
-            zip_name = f"{os.path.splitext(filename)[0]}_protected.zip"
-            zip_with_password(zip_name, [filename], password)
-            
-            zip_size = os.path.getsize(zip_name)
-            print(f"\nZip size: {zip_size / 1024:.2f} KB")
-            email_message = create_email(sender, email, subject, body, zip_name)
-            print(f"Sending to: {email}")
-            print(f'Attachment: {zip_name}')
-            print(f'Password: {password}')
-            
-            try:
-                send_email(gmail_service, email_message)
-            except Exception as e:
-                print(f'Failed to send email: {e}')    
+    print(f"Sending {len(messages)} email(s), {args.concurrency} at a time, at most {args.rate:g}/s")
+    results = gmail_sender.send_all(partial(build_service, creds), messages,
+                                    concurrency=args.concurrency, rate=args.rate, on_result=print_result)
+    sent = sum(r.ok for r in results)
+    print(f"\nSent {sent} of {len(results)} email(s); {len(results) - sent} failed")
+    if args.report:
+        write_report(args.report, results)
+        print(f"Outcomes written to {args.report}")
         
 if __name__ == "__main__":
     main()
@@ -0,0 +1,180 @@
+# gmail_sender.py
+# Concurrent Gmail sending engine: keeps up to `concurrency` sends in flight on
+# a thread pool, paces them with a token bucket to stay inside the Gmail API
+# quota, and retries rate-limit (429, 403 rateLimitExceeded) and server (5xx)
+# errors with jittered exponential backoff. Every message gets a SendResult.
+#
+# googleapiclient services are not thread-safe, so each worker thread gets its
+# own from service_factory(). Nothing here imports the Google libraries; HTTP
+# errors are recognised by their .resp.status, so fake_gmail.py can stand in
+# for the real service in tests and benchmarks.
+
+import random
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Gmail allows 250 quota units per user per second and messages.send costs 100
+DEFAULT_RATE = 2.5          # sends per second
+DEFAULT_BURST = 5           # sends allowed back to back after an idle spell
+DEFAULT_CONCURRENCY = 4
+MAX_ATTEMPTS = 6
+BASE_DELAY = 1.0            # seconds; the backoff ceiling doubles per attempt
+MAX_DELAY = 64.0
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+
+class TokenBucket:
+    # Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        # Blocks until a token is available, then takes it
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+@dataclass
+class SendResult:
+    key: Any                         # caller's identifier, e.g. the recipient row
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+    status: Optional[int] = None     # HTTP status of the last failure, if any
+    attempts: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def http_status(error):
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def is_retryable(error):
+    status = http_status(error)
+    if status is not None:
+        if status in RETRY_STATUSES:
+            return True
+        # Gmail reports some quota errors as 403 with a rateLimitExceeded reason
+        return status == 403 and any(r in str(error) for r in RATE_LIMIT_REASONS)
+    return isinstance(error, (TimeoutError, socket.timeout, ConnectionError))
+
+
+def retry_delay(error, attempt, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+    # "Full jitter": uniform over [0, base * 2**attempt], capped; Retry-After wins if given
+    resp = getattr(error, 'resp', None)
+    retry_after = resp.get('retry-after') if hasattr(resp, 'get') else None
+    if retry_after:
+        try:
+            return min(max_delay, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def send_one(service, message, bucket=None, max_attempts=MAX_ATTEMPTS,
+             base_delay=BASE_DELAY, max_delay=MAX_DELAY, key=None, sleep=time.sleep):
+    # Sends one message with retries; never raises for send failures
+    result = SendResult(key=key)
+    t0 = time.perf_counter()
+    request = None
+    for attempt in range(max_attempts):
+        if bucket is not None:
+            bucket.acquire()
+        result.attempts = attempt + 1
+        try:
+            # The request is kept across attempts so a resumable upload picks up
+            # where it failed instead of starting over
+            if request is None:
+                request = _send_request(service, message)
+            sent = request.execute()
+            result.message_id = sent.get('id')
+            result.error = None
+            break
+        except Exception as e:
+            result.error = f'{type(e).__name__}: {e}'
+            result.status = http_status(e)
+            if not is_retryable(e) or attempt + 1 == max_attempts:
+                break
+            sleep(retry_delay(e, attempt, base_delay, max_delay))
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def _send_request(service, message):
+    # Spooled messages (mime_spool.SpooledEmail) go through media upload;
+    # anything else is a request body such as {'raw': ...}
+    if hasattr(message, 'send_request'):
+        return message.send_request(service)
+    return service.users().messages().send(userId='me', body=message)
+
+
+def send_all(service_factory, messages, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+             burst=DEFAULT_BURST, max_attempts=MAX_ATTEMPTS, base_delay=BASE_DELAY,
+             max_delay=MAX_DELAY, on_result=None):
+    """
+    Sends (key, message) pairs with up to `concurrency` in flight and returns a
+    SendResult per message, in completion order. `message` may be the Gmail
+    request body, a mime_spool.SpooledEmail, or a zero-argument callable that
+    builds either; callables run on the worker thread, so only in-flight
+    messages are ever held in memory (or on disk, for spooled ones).
+    rate=None disables pacing.
+    """
+    bucket = TokenBucket(rate, burst) if rate else None
+    local = threading.local()
+
+    def work(key, message):
+        try:
+            service = getattr(local, 'service', None)
+            if service is None:
+                service = local.service = service_factory()
+            body = message() if callable(message) else message
+        except Exception as e:
+            return SendResult(key=key, error=f'could not prepare send: {type(e).__name__}: {e}')
+        try:
+            return send_one(service, body, bucket, max_attempts, base_delay, max_delay, key=key)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()  # e.g. delete a spooled message's temp file
+
+    results = []
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='gmail-send') as pool:
+        pending = set()
+        for key, message in messages:
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _collect(done, results, on_result)
+            pending.add(pool.submit(work, key, message))
+        _collect(as_completed(pending), results, on_result)
+    return results
+
+
+def _collect(futures, results, on_result):
+    for fut in futures:
+        result = fut.result()
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
@@ -0,0 +1,102 @@
+# mime_spool.py
+# Bounded-memory email building for large attachments.
+#
+# Building the message as an EmailMessage holds the attachment, the serialized
+# message and its base64 'raw' encoding in memory at once. spool_email()
+# instead writes the MIME message to a temporary file, base64-encoding the
+# attachment CHUNK_SIZE bytes at a time. The file is then sent with the Gmail
+# media upload endpoint as message/rfc822 (no 'raw' re-encoding): a simple
+# one-request upload for small messages, a resumable upload in
+# UPLOAD_CHUNK_SIZE pieces above RESUMABLE_THRESHOLD. Memory stays flat however
+# big the attachment is.
+#
+# Gmail itself still caps a sent message at 35 MB (about 25 MB of attachment
+# after base64); larger messages are rejected by the API, not by this code.
+
+import base64
+import os
+import tempfile
+import uuid
+from email.message import EmailMessage
+from email.policy import SMTP
+
+CHUNK_SIZE = 57 * 16 * 1024          # multiple of 57 bytes = whole 76-char base64 lines
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # resumable upload piece; must be a multiple of 256 KB
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+
+
+class SpooledEmail:
+    # A complete RFC 822 message in a temp file, sent with media upload.
+    # Use as a context manager, or call close() to delete the file.
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._media = None
+
+    def media_body(self):
+        from googleapiclient.http import MediaFileUpload  # only needed once a send happens
+        if self._media is None:
+            self._media = MediaFileUpload(self.path, mimetype='message/rfc822',
+                                          chunksize=UPLOAD_CHUNK_SIZE,
+                                          resumable=self.size > RESUMABLE_THRESHOLD)
+        return self._media
+
+    def send_request(self, service):
+        return service.users().messages().send(userId='me', body={}, media_body=self.media_body())
+
+    def close(self):
+        if self._media is not None:
+            self._media.stream().close()
+            self._media = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def spool_email(sender, to, subject, body, attachment, spool_dir=None, filename=None):
+    # The same message an EmailMessage would give, written to a temp file piece by piece.
+    # filename is the attachment's name in the email (default: attachment's own)
+    filename = filename or os.path.basename(attachment)
+    boundary = f'=============={uuid.uuid4().hex}=='
+    msg = EmailMessage(policy=SMTP)
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = to
+    msg.set_content(body)
+    msg.make_mixed(boundary=boundary)
+
+    part = EmailMessage(policy=SMTP)
+    part['Content-Type'] = 'application/zip'
+    part.set_param('name', filename)
+    part['Content-Transfer-Encoding'] = 'base64'
+    part['Content-Disposition'] = 'attachment'
+    part.set_param('filename', filename, header='Content-Disposition')
+
+    # The generated skeleton ends with the closing boundary; the attachment part
+    # goes in front of it
+    head = msg.as_bytes()
+    closing = f'--{boundary}--'.encode()
+    cut = head.rindex(closing)
+
+    fd, path = tempfile.mkstemp(prefix='email-', suffix='.eml', dir=spool_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out, open(attachment, 'rb') as src:
+            out.write(head[:cut])
+            out.write(f'--{boundary}\r\n'.encode())
+            out.write(bytes(part))  # headers plus the blank line
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+            out.write(b'\r\n' + closing + b'\r\n')
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledEmail(path)
@@ -0,0 +1,220 @@
+# zip_cache.py
+# Content-addressed cache of encrypted zips, so each distinct (file, password)
+# pair is compressed and encrypted once and reused by later runs.
+#
+# An entry is named by a hash of the file's bytes, a key derived from the
+# password, the name stored inside the zip and the zip settings. Renaming or
+# moving a file still hits; editing it or changing its password misses. The
+# password itself is never written anywhere: it goes through PBKDF2 salted
+# with the file's hash, at the same work factor the zip format itself uses
+# (WinZip AES derives its key with 1000 PBKDF2 rounds), so an entry name is no
+# easier to attack than the encrypted zip it names.
+#
+# Hashing a multi-GB file costs a full read, so digests are remembered in
+# hashes.json by path, size, mtime and inode, and only recomputed when one of
+# those changes.
+#
+# Entries are written by aes_zip under a unique temp name and renamed into
+# place, so several threads or processes can share one cache directory: a
+# reader sees a whole zip or none, and a race to build the same entry only
+# costs duplicate work. Each hit bumps the entry's mtime; evict() deletes the
+# least recently used entries until the cache fits in max_bytes, sparing ones
+# this run needs and anything used in the last PROTECT_SECONDS (a concurrent
+# run may be about to attach it).
+
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import aes_zip
+
+FORMAT_VERSION = 1                    # bump when aes_zip's output changes
+PBKDF2_ITERATIONS = 1000
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+PROTECT_SECONDS = 15 * 60
+STALE_TMP_SECONDS = 24 * 60 * 60      # temp files left by a killed build
+INDEX_NAME = 'hashes.json'
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ZipCache:
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, INDEX_NAME)
+        self._digests = self._load_index()
+        self._index_dirty = False
+
+    # --- keys ---
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}  # missing or half-written by an older crash: rehash
+
+    def _save_index(self):
+        if not self._index_dirty:
+            return
+        # Forget files that are gone so the index doesn't grow forever
+        index = {p: v for p, v in self._digests.items() if os.path.exists(p)}
+        tmp_path = f'{self._index_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+        self._index_dirty = False
+
+    def digest(self, path):
+        # sha256 of the file's bytes, reusing the remembered one if the file is unchanged
+        real = os.path.realpath(path)
+        st = os.stat(real)
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        known = self._digests.get(real)
+        if known and known[:3] == stamp:
+            return known[3]
+        digest = file_digest(real)
+        self._digests[real] = stamp + [digest]
+        self._index_dirty = True
+        return digest
+
+    def key(self, path, password):
+        digest = bytes.fromhex(self.digest(path))
+        password_key = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), b'zip-cache' + digest,
+                                           PBKDF2_ITERATIONS)
+        h = hashlib.sha256(f'{FORMAT_VERSION}|{aes_zip.COMPRESS_LEVEL}|{os.path.basename(path)}|'.encode())
+        h.update(digest)
+        h.update(password_key)
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, f'{key}.zip')
+
+    # --- lookup and build ---
+
+    def lookup(self, pairs):
+        # {(filename, password): True if cached, False if it would be built, or
+        # the OSError hashing hit}. Builds nothing and doesn't count as a use.
+        found = {}
+        for pair in dict.fromkeys(pairs):
+            try:
+                found[pair] = os.path.exists(self.entry_path(self.key(*pair)))
+            except OSError as e:
+                found[pair] = e
+        self._save_index()
+        return found
+
+    def get(self, key):
+        # Path of the cached zip, or None. A hit counts as a use for LRU.
+        path = self.entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def build(self, pairs, workers=None):
+        """
+        Returns {(filename, password): (zip_path, error)} for the given pairs,
+        encrypting only those not already cached (in parallel, via
+        aes_zip.zip_many). zip_path is None when error is set.
+        """
+        results = {}
+        wanted = {}  # key -> pairs needing it; same bytes + name + password share one zip
+        for pair in dict.fromkeys(pairs):
+            filename, password = pair
+            try:
+                key = self.key(filename, password)
+            except OSError as e:
+                results[pair] = (None, e)
+                continue
+            wanted.setdefault(key, []).append(pair)
+        self._save_index()
+
+        jobs = []
+        for key, key_pairs in wanted.items():
+            path = self.get(key)
+            if path is not None:
+                self.hits += 1
+                for pair in key_pairs:
+                    results[pair] = (path, None)
+            else:
+                self.misses += 1
+                jobs.append((self.entry_path(key), [key_pairs[0][0]], key_pairs[0][1]))
+
+        by_path = {self.entry_path(key): key_pairs for key, key_pairs in wanted.items()}
+        for path, error in aes_zip.zip_many(jobs, workers):
+            for pair in by_path[path]:
+                results[pair] = (None, error) if error is not None else (path, None)
+        return results
+
+    # --- eviction ---
+
+    def entries(self):
+        # [(path, size, mtime)] of every cached zip
+        found = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.zip'):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process mid-scan
+                found.append((entry.path, st.st_size, st.st_mtime))
+        return found
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=()):
+        # Deletes least recently used zips until the cache fits in max_bytes.
+        # Returns the removed paths.
+        now = time.time()
+        self._remove_stale_tmp(now)
+        keep = {os.path.abspath(p) for p in keep}
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for path, size, mtime in entries:
+            if total <= self.max_bytes:
+                break
+            if os.path.abspath(path) in keep or now - mtime < PROTECT_SECONDS:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # another process got there first
+            except OSError:
+                continue  # e.g. open for sending on Windows; try again next run
+            total -= size
+            removed.append(path)
+        return removed
+
+    def _remove_stale_tmp(self, now):
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > STALE_TMP_SECONDS:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
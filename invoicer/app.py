@@ -3,17 +3,167 @@ import datetime as dt
 from pathlib import Path
 import streamlit as st
 
-import db
-from invoice_pdf import build_invoice_pdf
+import cached
+import line_items
+import metrics
+import reports
+import jobs
 from settings import DEFAULT_HOURLY_RATE, DEFAULT_TAX_RATE
 
 st.set_page_config(page_title="Handyman Invoicer", layout="wide")
 
-db.init_db()
+cached.init_db_once()
+cached.start_pdf_worker()
+cached.start_metrics_server()
 
 st.title("Handyman Invoicer")
 
-tab1, tab2 = st.tabs(["Clients", "Create Invoice"])
+CLIENT_PAGE_SIZE = 25
+
+
+def keyset_page(key: str, filters: tuple, fetch, page_size: int, cursor_of) -> list:
+    """
+    Shows one page from fetch(after) with Previous/Next controls. fetch must return
+    up to page_size + 1 rows (the extra row only signals a next page); cursor_of(row)
+    gives the keyset cursor after that row. Visited cursors live in session_state and
+    reset whenever `filters` change.
+    """
+    pager = st.session_state.setdefault(f"{key}_pager", {"filters": None, "cursors": [None]})
+    if pager["filters"] != filters:
+        pager["filters"] = filters
+        pager["cursors"] = [None]
+
+    rows = fetch(pager["cursors"][-1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    if has_next or len(pager["cursors"]) > 1:
+        prev_col, page_col, next_col = st.columns([1, 4, 1])
+        if prev_col.button("Previous", key=f"{key}_prev", disabled=len(pager["cursors"]) == 1):
+            pager["cursors"].pop()
+            st.rerun()
+        page_col.caption(f"Page {len(pager['cursors'])}")
+        if next_col.button("Next", key=f"{key}_next", disabled=not has_next):
+            pager["cursors"].append(cursor_of(rows[-1]))
+            st.rerun()
+    return rows
+
+
+@st.fragment(run_every=jobs.POLL_INTERVAL)
+def pdf_job_progress(job_id: int, invoice_number: str) -> None:
+    """Re-checks a queued PDF job every poll interval without rerunning the whole page."""
+    job = jobs.get_job(job_id)
+    if job is None or job["status"] in ("done", "failed"):
+        st.rerun()
+    note = f" (attempt {job['attempts']} of {jobs.MAX_ATTEMPTS})" if job["attempts"] > 1 else ""
+    st.info(f"Created invoice {invoice_number}. Rendering the PDF{note}...")
+
+
+def pdf_job_panel() -> None:
+    """Status of the last queued PDF render, with the download once it's done."""
+    pending = st.session_state.get("pdf_job")
+    if not pending:
+        return
+    job = jobs.get_job(pending["job_id"])
+    if job is None:
+        st.session_state.pop("pdf_job")
+        return
+    if job["status"] == "done":
+        if not pending["finished"]:
+            pending["finished"] = True
+            cached.pdf_job_finished(pending["client_id"])
+        pdf_path = Path(job["pdf_path"])
+        st.success(f"Created invoice {pending['invoice_number']}")
+        if pdf_path.is_file():
+            st.download_button(
+                "Download PDF",
+                data=pdf_path.read_bytes(),
+                file_name=pdf_path.name,
+                mime="application/pdf"
+            )
+    elif job["status"] == "failed":
+        st.error(f"Rendering the PDF for invoice {pending['invoice_number']} failed: {job['last_error']}")
+        if st.button("Retry PDF"):
+            jobs.retry_job(job["job_id"])
+            st.rerun()
+    else:
+        pdf_job_progress(job["job_id"], pending["invoice_number"])
+
+
+def diagnostics_panel() -> None:
+    """Sidebar switch for metrics.py, with recent latencies and the slow-query log."""
+    on = st.sidebar.toggle("Diagnostics", value=metrics.enabled,
+                           help="Times database calls, SQL statements and PDF rendering for this server process.")
+    if on and not metrics.enabled:
+        metrics.enable()
+    elif not on and metrics.enabled:
+        metrics.disable()
+    if not on:
+        return
+    snap = metrics.snapshot()
+    st.sidebar.caption(f"Latency over the last {metrics.RECENT_SAMPLES} calls per operation (ms)")
+    if snap["metrics"]:
+        st.sidebar.dataframe(
+            [{"Operation": name, "Calls": m["count"], "p50": round(m["p50_ms"], 2), "p95": round(m["p95_ms"], 2),
+              "p99": round(m["p99_ms"], 2), "Max": round(m["max_ms"], 2)}
+             for name, m in snap["metrics"].items()],
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.sidebar.info("Nothing recorded yet.")
+    with st.sidebar.expander(f"Slow queries ({len(snap['slow_queries'])})"):
+        for q in reversed(snap["slow_queries"]):
+            st.markdown(f"**{q['ms']:,.1f} ms** at {q['at']} ({q['thread']})")
+            st.code(f"{q['sql']}\n-- params: {q['params']}", language="sql")
+    with st.sidebar.expander("Prometheus export"):
+        st.code(metrics.prometheus_text(), language="text")
+    if st.sidebar.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
+
+
+def items_editor_key() -> str:
+    # A new key gives a fresh editor over the current base list, with no pending changes
+    return f"items_editor_{st.session_state['items_version']}"
+
+
+def set_items(items: list, subtotal: float) -> None:
+    """Replaces the line items the editor is showing; `subtotal` is theirs, passed in to avoid a re-sum."""
+    st.session_state["items"] = items
+    st.session_state["items_frame"] = line_items.frame(items)
+    st.session_state["items_subtotal"] = subtotal
+    st.session_state["items_version"] = st.session_state.get("items_version", 0) + 1
+
+
+def items_delta() -> line_items.Delta:
+    """The editor's pending changes against the base list."""
+    return line_items.Delta(st.session_state["items"], st.session_state.get(items_editor_key()))
+
+
+def add_items(new_items: list) -> None:
+    """Appends items, keeping whatever is pending in the editor."""
+    delta = items_delta()
+    items = line_items.merge(st.session_state["items"], delta) + [line_items.clean_item(it) for it in new_items]
+    subtotal = (st.session_state["items_subtotal"] + delta.subtotal_change
+                + sum(line_items.line_total(it) for it in new_items))
+    set_items(items, subtotal)
+
+
+def client_page(key: str, query: str) -> list:
+    """One page of clients matching `query`, with Previous/Next controls."""
+    return keyset_page(
+        key,
+        (query,),
+        lambda after: cached.search_clients(query, CLIENT_PAGE_SIZE + 1, after),
+        CLIENT_PAGE_SIZE,
+        lambda c: (c["name"], c["client_id"]),
+    )
+
+
+diagnostics_panel()
+
+tab1, tab2, tab_invoices, tab_reports = st.tabs(["Clients", "Create Invoice", "Invoices", "Reports"])
 
 # ---------------- Clients ----------------
 with tab1:
@@ -28,32 +178,159 @@ with tab1:
             if not name.strip():
                 st.error("Client name is required.")
             else:
-                client_id = db.create_client(name.strip(), phone.strip(), email.strip(), address.strip())
+                client_id = cached.create_client(name.strip(), phone.strip(), email.strip(), address.strip())
                 st.success(f"Saved client: {name} (ID {client_id})")
 
     st.subheader("Client list")
-    clients = db.list_clients()
+    list_query = st.text_input("Search clients", key="client_list_q", placeholder="Name, email, phone or address")
+    clients = client_page("client_list", list_query)
     if clients:
         st.dataframe(
             [{"ID": c["client_id"], "Name": c["name"], "Phone": c["phone"], "Email": c["email"]} for c in clients],
             use_container_width=True
         )
+    elif list_query.strip():
+        st.info("No clients match that search.")
     else:
         st.info("No clients yet. Add your first client above.")
 
+# Invoices and Reports are rendered before Create Invoice because that tab may st.stop() the script.
+
+# ---------------- Invoices ----------------
+with tab_invoices:
+    st.subheader("Invoice history")
+    colA, colB, colC, colD = st.columns(4)
+    with colA:
+        inv_status = st.selectbox("Status", ["All", "Unpaid", "Paid"], key="inv_status")
+    with colB:
+        inv_client_q = st.text_input("Client", key="inv_client_q", placeholder="Search clients")
+    with colC:
+        inv_from = st.date_input("Issued from", value=None, key="inv_from")
+    with colD:
+        inv_to = st.date_input("Issued to", value=None, key="inv_to")
+
+    inv_client_id = None
+    client_found = True
+    if inv_client_q.strip():
+        matches = cached.search_clients(inv_client_q, CLIENT_PAGE_SIZE, None)
+        match_map = {f"{c['name']} (ID {c['client_id']})": c["client_id"] for c in matches}
+        if match_map:
+            inv_client_id = match_map[st.selectbox("Matching clients", list(match_map.keys()), key="inv_client")]
+        else:
+            client_found = False
+            st.info("No clients match that search.")
+
+    if client_found:
+        filters = (
+            None if inv_status == "All" else inv_status,
+            inv_client_id,
+            str(inv_from) if inv_from else None,
+            str(inv_to) if inv_to else None,
+        )
+        invoices = keyset_page(
+            "invoice_history",
+            filters,
+            lambda after: cached.invoice_page(*filters, after),
+            cached.INVOICE_PAGE_SIZE,
+            lambda r: (r["issue_date"], r["invoice_id"]),
+        )
+        if not invoices:
+            st.info("No invoices match these filters.")
+        else:
+            picked = st.dataframe(
+                [{"Invoice": r["invoice_number"], "Client": r["client_name"], "Issued": r["issue_date"],
+                  "Due": r["due_date"], "Status": r["status"], "Total": f"${r['total']:,.2f}"}
+                 for r in invoices],
+                use_container_width=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key="invoice_history_table",
+            )
+            selected = picked.selection.rows
+            if not selected:
+                st.caption("Select a row to see its line items.")
+            else:
+                inv = invoices[selected[0]]
+                st.markdown(f"**Invoice {inv['invoice_number']}** for {inv['client_name']}")
+                # Line items are only loaded for the selected invoice
+                st.dataframe(
+                    [{"Description": it["description"], "Category": it["category"], "Qty": f"{it['qty']:g}",
+                      "Unit": f"${it['unit_price']:,.2f}", "Line Total": f"${it['qty'] * it['unit_price']:,.2f}"}
+                     for it in cached.invoice_items(inv["invoice_id"])],
+                    use_container_width=True
+                )
+                st.write(f"**Subtotal:** ${inv['subtotal']:,.2f}  |  **Tax:** ${inv['tax']:,.2f}  "
+                         f"|  **Total:** ${inv['total']:,.2f}")
+                new_status = "Unpaid" if inv["status"] == "Paid" else "Paid"
+                if st.button(f"Mark as {new_status}", key="invoice_history_status"):
+                    cached.set_invoice_status(inv["invoice_id"], inv["client_id"], new_status)
+                    st.rerun()
+
+# ---------------- Reports ----------------
+with tab_reports:
+    st.subheader("Revenue")
+    colA, colB, colC = st.columns(3)
+    with colA:
+        report_year = st.number_input("Year", min_value=2000, max_value=2100, value=dt.date.today().year, step=1)
+    with colB:
+        report_status = st.selectbox("Status", ["All", "Paid", "Unpaid"], key="report_status")
+    status_filter = None if report_status == "All" else report_status
+    period_from, period_to = f"{int(report_year)}-01", f"{int(report_year)}-12"
+
+    by_month = reports.revenue_by_month(period_from, period_to, status_filter)
+    if not by_month:
+        st.info("No invoiced revenue for this selection.")
+    else:
+        year_total = sum(r["total"] for r in by_month)
+        with colC:
+            st.metric("Total (incl. tax)", f"${year_total:,.2f}")
+        st.bar_chart({r["period"]: r["total"] for r in by_month})
+
+        colD, colE = st.columns(2)
+        with colD:
+            st.markdown("**By category**")
+            st.dataframe(
+                [{"Category": r["category"], "Amount": f"${r['amount']:,.2f}", "Total": f"${r['total']:,.2f}"}
+                 for r in reports.revenue_by_category(period_from, period_to, status_filter)],
+                use_container_width=True
+            )
+        with colE:
+            st.markdown("**Top clients**")
+            st.dataframe(
+                [{"Client": r["name"], "Amount": f"${r['amount']:,.2f}", "Total": f"${r['total']:,.2f}"}
+                 for r in reports.revenue_by_client(period_from, period_to, status_filter, limit=10)],
+                use_container_width=True
+            )
+
 # ---------------- Create Invoice ----------------
 with tab2:
-    clients = db.list_clients()
-    if not clients:
+    if not cached.search_clients("", 1, None):
         st.warning("Add a client first in the Clients tab.")
         st.stop()
 
     st.subheader("Invoice details")
 
+    picker_query = st.text_input("Find client", key="client_pick_q", placeholder="Start typing a name, email or phone")
+    clients = client_page("client_pick", picker_query)
+    if not clients:
+        st.warning("No clients match that search.")
+        st.stop()
+
     client_map = {f"{c['name']} (ID {c['client_id']})": c["client_id"] for c in clients}
     client_label = st.selectbox("Select client", list(client_map.keys()))
     client_id = client_map[client_label]
 
+    with st.expander("Recent invoices for this client"):
+        recent = cached.list_invoices(client_id)
+        if recent:
+            st.dataframe(
+                [{"Invoice": r["invoice_number"], "Issued": r["issue_date"], "Due": r["due_date"], "Status": r["status"]}
+                 for r in recent],
+                use_container_width=True
+            )
+        else:
+            st.caption("No invoices for this client yet.")
+
     colA, colB, colC = st.columns(3)
     with colA:
         issue_date = st.date_input("Issue date", value=dt.date.today())
@@ -68,7 +345,7 @@ with tab2:
     st.subheader("Line items")
 
     if "items" not in st.session_state:
-        st.session_state["items"] = []
+        set_items([], 0.0)
 
     with st.expander("Add labor"):
         col1, col2, col3 = st.columns(3)
@@ -80,12 +357,12 @@ with tab2:
             labor_rate = st.number_input("Hourly rate", min_value=0.0, value=float(DEFAULT_HOURLY_RATE), step=1.0)
 
         if st.button("Add labor line"):
-            st.session_state["items"].append({
+            add_items([{
                 "description": f"{labor_desc} ({labor_hours:g} hrs @ ${labor_rate:,.2f}/hr)",
                 "qty": float(labor_hours),
                 "unit_price": float(labor_rate),
                 "category": "labor",
-            })
+            }])
             st.success("Added labor line item.")
 
     with st.expander("Add material / misc"):
@@ -103,62 +380,77 @@ with tab2:
             if not item_desc.strip():
                 st.error("Description required.")
             else:
-                st.session_state["items"].append({
+                add_items([{
                     "description": item_desc.strip(),
                     "qty": float(qty),
                     "unit_price": float(unit),
                     "category": category,
-                })
+                }])
                 st.success("Added item.")
 
+    with st.expander("Paste from a spreadsheet"):
+        st.caption("One item per row: description, qty, unit price and optionally category "
+                   "(tab or comma separated). A header row is skipped.")
+        pasted = st.text_area("Rows", key="paste_rows", label_visibility="collapsed")
+        if st.button("Add pasted rows"):
+            new_items, errors = line_items.parse_pasted(pasted)
+            for err in errors[:10]:
+                st.error(err)
+            if new_items:
+                add_items(new_items)
+                st.success(f"Added {len(new_items)} item(s).")
+
     st.markdown("### Current items")
-    if st.session_state["items"]:
-        # show + allow remove
-        for idx, it in enumerate(st.session_state["items"]):
-            cols = st.columns([6, 1, 2, 2, 1.5])
-            cols[0].write(it["description"])
-            cols[1].write(it["category"])
-            cols[2].write(f"Qty: {it['qty']:g}")
-            cols[3].write(f"Unit: ${it['unit_price']:,.2f}")
-            if cols[4].button("Remove", key=f"rm_{idx}"):
-                st.session_state["items"].pop(idx)
-                st.rerun()
-
-        subtotal = sum(it["qty"] * it["unit_price"] for it in st.session_state["items"])
+    st.caption("Edit cells in place, select rows and press Delete to remove them, "
+               "or add rows at the bottom. Pasting a block of cells also works.")
+    st.data_editor(
+        st.session_state["items_frame"],
+        key=items_editor_key(),
+        num_rows="dynamic",
+        use_container_width=True,
+        column_order=line_items.COLUMNS,
+        column_config={
+            "description": st.column_config.TextColumn("Description", required=True, width="large"),
+            "category": st.column_config.SelectboxColumn("Category", options=line_items.CATEGORIES,
+                                                         default="material", required=True),
+            "qty": st.column_config.NumberColumn("Qty", min_value=0.0, default=1.0, format="%g"),
+            "unit_price": st.column_config.NumberColumn("Unit price", min_value=0.0, default=0.0, format="$%.2f"),
+        },
+    )
+
+    delta = items_delta()
+    item_count = len(st.session_state["items"]) + delta.count_change
+    if item_count:
+        subtotal = st.session_state["items_subtotal"] + delta.subtotal_change
         tax = subtotal * float(tax_rate)
         total = subtotal + tax
-        st.write(f"**Subtotal:** ${subtotal:,.2f}  |  **Tax:** ${tax:,.2f}  |  **Total:** ${total:,.2f}")
+        st.write(f"**Items:** {item_count}  |  **Subtotal:** ${subtotal:,.2f}  |  **Tax:** ${tax:,.2f}  "
+                 f"|  **Total:** ${total:,.2f}")
+        if delta.invalid:
+            st.warning(f"{delta.invalid} row(s) need a description.")
     else:
         st.info("Add at least one line item.")
 
     st.markdown("---")
 
-    if st.button("Generate Invoice PDF", type="primary", disabled=(len(st.session_state["items"]) == 0)):
-        year = issue_date.year
-        inv_num = db.next_invoice_number(year)
-        invoice_id = db.create_invoice(
-            invoice_number=inv_num,
+    if st.button("Generate Invoice PDF", type="primary", disabled=(item_count == 0 or delta.invalid > 0)):
+        # Only the DB writes happen here; the PDF is rendered by the background worker
+        data, job_id = cached.create_invoice_queue_pdf(
             client_id=client_id,
             issue_date=str(issue_date),
             due_date=str(due_date),
             notes=notes.strip(),
             tax_rate=float(tax_rate),
+            items=line_items.merge(st.session_state["items"], delta),
         )
-        for it in st.session_state["items"]:
-            db.add_item(invoice_id, it["description"], it["qty"], it["unit_price"], it["category"])
-
-        data = db.get_invoice_with_items(invoice_id)
-        pdf_path = build_invoice_pdf(data)
-        db.set_invoice_pdf_path(invoice_id, pdf_path)
-
-        st.success(f"Created invoice {inv_num}")
-        with open(pdf_path, "rb") as f:
-            st.download_button(
-                "Download PDF",
-                data=f.read(),
-                file_name=Path(pdf_path).name,
-                mime="application/pdf"
-            )
-
+        st.session_state["pdf_job"] = {
+            "job_id": job_id,
+            "invoice_number": data["invoice"]["invoice_number"],
+            "client_id": client_id,
+            "finished": False,
+        }
         # reset items after generation
-        st.session_state["items"] = []
+        set_items([], 0.0)
+        st.rerun()
+
+    pdf_job_panel()
@@ -0,0 +1,214 @@
+# batch_render.py
+# Re-render (or render) many invoice PDFs in parallel.
+#
+#   python batch_render.py --status Unpaid
+#   python batch_render.py --from 2026-01-01 --to 2026-01-31 --workers 8
+#   python batch_render.py --ids 12 13 14
+#   python batch_render.py --status Paid --archive paid.zip
+#   python batch_render.py --cleanup --dry-run
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import db
+import settings
+
+# Invoices fetched from the db per bulk query
+FETCH_SIZE = 200
+# pdf_path updates written per transaction
+UPDATE_BATCH = 200
+
+ProgressFn = Callable[[int, int, float], None]
+
+
+@dataclass
+class BatchResult:
+    total: int
+    rendered: int = 0
+    skipped: int = 0    # PDF on disk already matched the invoice's content hash
+    failed: List[Tuple[int, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        done = self.rendered + self.skipped
+        return done / self.elapsed if self.elapsed else 0.0
+
+
+def _render_one(data: Dict[str, Any], force: bool = False) -> Tuple[int, str, str, bool]:
+    # Imported here so the parent process never needs ReportLab loaded
+    from invoice_pdf import build_invoice_pdf_cached
+    if force:
+        data["invoice"]["pdf_hash"] = None
+    pdf_path, content_hash, rendered = build_invoice_pdf_cached(data)
+    return data["invoice"]["invoice_id"], pdf_path, content_hash, rendered
+
+
+def _render_bytes(data: Dict[str, Any], force: bool = False) -> Tuple[int, str, bytes]:
+    from invoice_pdf import render_invoice_pdf_bytes
+    inv = data["invoice"]
+    return inv["invoice_id"], f"invoice_{inv['invoice_number']}.pdf", render_invoice_pdf_bytes(data)
+
+
+def _chunks(ids: List[int], size: int) -> Iterable[List[int]]:
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def render_invoices(
+    invoice_ids: Optional[List[int]] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressFn] = None,
+    archive: Optional[str] = None,
+    force: bool = False,
+) -> BatchResult:
+    """
+    Renders the selected invoices across a process pool and records their pdf_path.
+    Selects invoice_ids if given, otherwise every invoice matching the date range/status.
+    progress(done, total, elapsed_seconds) is called as renders finish.
+    With archive, PDFs are streamed into that zip file instead of INVOICE_OUTPUT_DIR
+    and pdf_path is left untouched.
+    Invoices whose PDF is already up to date (same content hash) are skipped unless force.
+    """
+    if invoice_ids is None:
+        invoice_ids = db.find_invoice_ids(date_from, date_to, status)
+    result = BatchResult(total=len(invoice_ids))
+    if not invoice_ids:
+        return result
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    pending_paths: List[Tuple[int, str, str]] = []
+    in_flight: Dict[Future, int] = {}
+    t0 = time.perf_counter()
+
+    zf = zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) if archive else None
+    render = _render_bytes if zf else _render_one
+
+    def collect(done: Iterable[Future]) -> None:
+        for fut in done:
+            invoice_id = in_flight.pop(fut)
+            try:
+                if zf:
+                    _, name, pdf_bytes = fut.result()
+                    zf.writestr(name, pdf_bytes)
+                    result.rendered += 1
+                else:
+                    invoice_id, pdf_path, content_hash, rendered = fut.result()
+                    if rendered:
+                        pending_paths.append((invoice_id, pdf_path, content_hash))
+                        result.rendered += 1
+                    else:
+                        result.skipped += 1
+            except Exception as e:
+                result.failed.append((invoice_id, repr(e)))
+        if len(pending_paths) >= UPDATE_BATCH:
+            db.set_invoice_pdf_paths(pending_paths)
+            pending_paths.clear()
+        if progress:
+            progress(result.rendered + result.skipped + len(result.failed), result.total, time.perf_counter() - t0)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for id_chunk in _chunks(invoice_ids, FETCH_SIZE):
+                for data in db.get_invoices_with_items(id_chunk):
+                    while len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    in_flight[pool.submit(render, data, force)] = data["invoice"]["invoice_id"]
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+    finally:
+        if zf:
+            zf.close()
+
+    if pending_paths:
+        db.set_invoice_pdf_paths(pending_paths)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def cleanup_orphaned_pdfs(dry_run: bool = False) -> List[str]:
+    """
+    Deletes PDFs (and leftover .tmp files) in INVOICE_OUTPUT_DIR that no invoice's
+    pdf_path points at. Returns the paths removed (or that would be, with dry_run).
+    """
+    out_dir = Path(settings.INVOICE_OUTPUT_DIR)
+    if not out_dir.is_dir():
+        return []
+    # Older rows hold paths relative to the package folder
+    referenced = {(settings.BASE_DIR / p).resolve() for p in db.list_pdf_paths()}
+    removed = []
+    for path in sorted(out_dir.glob("invoice_*.pdf*")):
+        if not path.is_file() or path.resolve() in referenced:
+            continue
+        if path.suffix == ".tmp" and time.time() - path.stat().st_mtime < 3600:
+            continue  # may belong to a render that is still running
+        removed.append(str(path))
+        if not dry_run:
+            path.unlink(missing_ok=True)
+    return removed
+
+
+def _print_progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed else 0.0
+    print(f"\r{done}/{total} invoices  {rate:,.1f}/s", end="", file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render invoice PDFs in bulk")
+    parser.add_argument("--ids", type=int, nargs="+", help="specific invoice ids")
+    parser.add_argument("--from", dest="date_from", help="issue date from (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="issue date to (YYYY-MM-DD)")
+    parser.add_argument("--status", help="only invoices with this status, e.g. Unpaid")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--archive", help="write PDFs into this .zip instead of the invoices folder")
+    parser.add_argument("--force", action="store_true", help="re-render even if the PDF is up to date")
+    parser.add_argument("--cleanup", action="store_true",
+                        help="only delete PDFs in the invoices folder that no invoice references")
+    parser.add_argument("--dry-run", action="store_true", help="with --cleanup, list files without deleting")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    if args.cleanup:
+        removed = cleanup_orphaned_pdfs(dry_run=args.dry_run)
+        verb = "Would remove" if args.dry_run else "Removed"
+        print(f"{verb} {len(removed)} orphaned file(s)")
+        for path in removed:
+            print(f"  {path}")
+        return 0
+
+    result = render_invoices(
+        invoice_ids=args.ids,
+        date_from=args.date_from,
+        date_to=args.date_to,
+        status=args.status,
+        workers=args.workers,
+        progress=None if args.quiet else _print_progress,
+        archive=args.archive,
+        force=args.force,
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Rendered {result.rendered}/{result.total} invoices ({result.skipped} up to date) "
+          f"in {result.elapsed:.2f}s ({result.per_second:,.1f} invoices/s)")
+    for invoice_id, err in result.failed:
+        print(f"  failed invoice {invoice_id}: {err}")
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# benchmarks/bench_connections.py
+# Compares the pooled per-thread WAL connections in db.py against the old
+# open-a-connection-per-call pattern (default rollback journal).
+import argparse
+import sqlite3
+
+from common import temp_db_path, time_calls, summarize, print_row
+
+import db
+
+
+def legacy_conn(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def legacy_create_client(path: str, i: int) -> None:
+    conn = legacy_conn(path)
+    conn.execute(
+        "INSERT INTO clients(name, phone, email, address) VALUES (?, ?, ?, ?)",
+        (f"Client {i}", "555-0100", f"c{i}@example.com", "1 Main St"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_get_client(path: str, client_id: int) -> None:
+    conn = legacy_conn(path)
+    conn.execute("SELECT * FROM clients WHERE client_id=?", (client_id,)).fetchone()
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pooled vs per-call SQLite connections")
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Legacy: schema created with the pooled layer, then journal switched back to DELETE
+    legacy_path = temp_db_path("legacy.db")
+    db.set_db_path(legacy_path)
+    db.init_db()
+    db.get_conn().execute("PRAGMA journal_mode=DELETE")
+    db.close_conn()
+
+    counter = iter(range(10**9))
+    print_row("legacy create_client", summarize(
+        time_calls(lambda: legacy_create_client(legacy_path, next(counter)), args.ops)))
+    print_row("legacy get_client", summarize(
+        time_calls(lambda: legacy_get_client(legacy_path, 1 + next(counter) % args.ops), args.ops)))
+
+    pooled_path = temp_db_path("pooled.db")
+    db.set_db_path(pooled_path)
+    db.init_db()
+
+    counter = iter(range(10**9))
+    print_row("pooled create_client", summarize(
+        time_calls(lambda: db.create_client(f"Client {next(counter)}", "555-0100", "c@example.com", "1 Main St"), args.ops)))
+    print_row("pooled get_client", summarize(
+        time_calls(lambda: db.get_client(1 + next(counter) % args.ops), args.ops)))
+    db.close_conn()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# benchmarks/bench_indexes.py
+# Lookup latency before and after the index migration at several table sizes.
+# Each size is seeded at schema version 0 (no indexes), measured, migrated to
+# the latest version, and measured again.
+import argparse
+import random
+import time
+
+from common import temp_db_path, time_calls, summarize, print_row
+
+import db
+
+CLIENTS = 2000
+ITEMS_PER_INVOICE = 3
+STATUSES = ["Unpaid", "Paid", "Void"]
+
+
+def seed(n_invoices: int) -> None:
+    rng = random.Random(n_invoices)
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO clients(name, phone, email, address) VALUES (?, ?, ?, ?)",
+            [(f"Client {i:06d}", "555-0100", f"c{i}@example.com", "1 Main St") for i in range(CLIENTS)],
+        )
+    chunk = 50_000
+    for start in range(0, n_invoices, chunk):
+        invoices = []
+        items = []
+        for i in range(start, min(start + chunk, n_invoices)):
+            invoice_id = i + 1
+            year = 2016 + i * 10 // n_invoices
+            day = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            invoices.append((invoice_id, f"{year}-{i:07d}", rng.randint(1, CLIENTS), day, day, "", 0.1,
+                             rng.choice(STATUSES)))
+            for _ in range(ITEMS_PER_INVOICE):
+                items.append((invoice_id, "Seed item", 1.0, 25.0, "labor"))
+        with db.transaction() as conn:
+            conn.executemany("""
+                INSERT INTO invoices(invoice_id, invoice_number, client_id, issue_date, due_date, notes, tax_rate, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, invoices)
+            conn.executemany("""
+                INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
+                VALUES (?, ?, ?, ?, ?)
+            """, items)
+
+
+def measure(label: str, n_invoices: int, repeat: int) -> None:
+    rng = random.Random(0)
+    conn = db.get_conn()
+    queries = {
+        "get_invoice_with_items": lambda: db.get_invoice_with_items(rng.randint(1, n_invoices)),
+        "invoices by client": lambda: conn.execute(
+            "SELECT * FROM invoices WHERE client_id=? ORDER BY issue_date DESC LIMIT 50",
+            (rng.randint(1, CLIENTS),)).fetchall(),
+        "unpaid in a month": lambda: conn.execute(
+            "SELECT * FROM invoices WHERE status='Unpaid' AND issue_date BETWEEN ? AND ? LIMIT 50",
+            ("2020-03-01", "2020-03-31")).fetchall(),
+        "issued in a week": lambda: conn.execute(
+            "SELECT COUNT(*) FROM invoices WHERE issue_date BETWEEN ? AND ?",
+            ("2021-06-01", "2021-06-07")).fetchone(),
+    }
+    for name, fn in queries.items():
+        print_row(f"{label} {name}", summarize(time_calls(fn, repeat)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Index migration lookup benchmark")
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"--- {size:,} invoices ---")
+        db.set_db_path(temp_db_path(f"indexes-{size}.db"))
+        db.init_db(target_version=0)
+        t0 = time.perf_counter()
+        seed(size)
+        print(f"seeded in {time.perf_counter() - t0:.1f}s")
+        measure("before", size, args.repeat)
+        t0 = time.perf_counter()
+        db.init_db()
+        print(f"migrated to v{db.schema_version()} in {time.perf_counter() - t0:.2f}s")
+        measure("after ", size, args.repeat)
+        db.close_conn()
+
+
+if __name__ == "__main__":
+    main()
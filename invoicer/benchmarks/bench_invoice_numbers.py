@@ -0,0 +1,87 @@
+# benchmarks/bench_invoice_numbers.py
+# Multi-process stress test for invoice number allocation. Several worker
+# processes create invoices against one database at the same time; afterwards
+# every year's numbers are checked for duplicates and gaps.
+# Exits non-zero if a duplicate (any mode) or a gap (atomic mode) is found.
+import argparse
+import multiprocessing as mp
+import sys
+import time
+from collections import defaultdict
+
+from common import temp_db_path
+
+import db
+
+ITEM = {"description": "Stress item", "qty": 1.0, "unit_price": 10.0, "category": "misc"}
+
+
+def worker(db_path: str, client_id: int, count: int, block_size: int, years: list) -> None:
+    db.set_db_path(db_path)
+    db.set_invoice_number_block_size(block_size)
+    for i in range(count):
+        year = years[i % len(years)]
+        db.create_invoice_with_items(client_id, f"{year}-01-15", f"{year}-01-29", "", 0.0, [ITEM])
+    db.release_invoice_numbers()
+    db.close_conn()
+
+
+def check(db_path: str) -> tuple:
+    db.set_db_path(db_path)
+    rows = db.get_conn().execute("SELECT invoice_number FROM invoices").fetchall()
+    by_year = defaultdict(list)
+    for r in rows:
+        year, seq = r["invoice_number"].split("-")
+        by_year[year].append(int(seq))
+    duplicates = gaps = 0
+    for seqs in by_year.values():
+        duplicates += len(seqs) - len(set(seqs))
+        gaps += max(seqs) - len(set(seqs))
+    return len(rows), duplicates, gaps
+
+
+def run(mode: str, procs: int, per_proc: int, block_size: int) -> bool:
+    db_path = temp_db_path(f"numbers-{mode}.db")
+    db.set_db_path(db_path)
+    db.init_db()
+    client_id = db.create_client("Stress Client", "", "", "")
+    db.close_conn()
+
+    years = [2025, 2026]
+    size = block_size if mode == "block" else 0
+    workers = [
+        mp.Process(target=worker, args=(db_path, client_id, per_proc, size, years))
+        for _ in range(procs)
+    ]
+    t0 = time.perf_counter()
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - t0
+
+    total, duplicates, gaps = check(db_path)
+    print(
+        f"{mode:<7} procs={procs} invoices={total} "
+        f"{total / elapsed:,.0f} invoices/s duplicates={duplicates} gaps={gaps}"
+    )
+    ok = duplicates == 0 and total == procs * per_proc and all(p.exitcode == 0 for p in workers)
+    if mode == "atomic":
+        ok = ok and gaps == 0
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Invoice number allocation stress test")
+    parser.add_argument("--procs", type=int, default=8)
+    parser.add_argument("--per-proc", type=int, default=250)
+    parser.add_argument("--block-size", type=int, default=50)
+    args = parser.parse_args()
+
+    ok = run("atomic", args.procs, args.per_proc, args.block_size)
+    ok = run("block", args.procs, args.per_proc, args.block_size) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
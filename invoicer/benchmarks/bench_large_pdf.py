@@ -0,0 +1,79 @@
+# benchmarks/bench_large_pdf.py
+# Render time and peak memory for very large invoices: the single-Table layout
+# vs. the page-at-a-time large-invoice mode. Each case runs in its own process
+# so its peak RSS isn't hidden by an earlier, bigger case.
+#
+#   python benchmarks/bench_large_pdf.py
+#   python benchmarks/bench_large_pdf.py --items 10000 100000 --table-max 5000
+import argparse
+import multiprocessing as mp
+import resource
+import time
+from typing import Any, Dict, Iterator
+
+import common  # noqa: F401  (puts the invoicer folder on sys.path)
+
+
+def _items(n: int) -> Iterator[Dict[str, Any]]:
+    for i in range(n):
+        # Every 50th description wraps, so both cell kinds are exercised
+        desc = f"Line item {i}" if i % 50 else f"Extended work description for line {i}, " * 3
+        yield {"description": desc, "qty": 1.0 + i % 3, "unit_price": 25.0, "category": "labor"}
+
+
+class _CountingSink:
+    """Discards the PDF bytes but counts them, so output size doesn't sit in memory."""
+
+    def __init__(self) -> None:
+        self.size = 0
+
+    def write(self, b: bytes) -> int:
+        self.size += len(b)
+        return len(b)
+
+
+def _run(mode: str, n: int, results: "mp.Queue") -> None:
+    import invoice_pdf
+    tpl = invoice_pdf.get_template()
+    data = {
+        "invoice": {"invoice_number": "2026-00001", "issue_date": "2026-01-15", "due_date": "2026-01-29",
+                    "notes": "", "tax_rate": 0.1025},
+        "client": {"name": "Jane Doe", "address": "1 Main St\nChicago, IL"},
+        # The table layout needs a list; large mode takes the generator as-is
+        "items": list(_items(n)) if mode == "table" else _items(n),
+    }
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    sink = _CountingSink()
+    t0 = time.perf_counter()
+    if mode == "table":
+        invoice_pdf.LARGE_INVOICE_ITEMS = n  # keep the single-Table path
+        invoice_pdf.render_invoice_pdf(data, sink, tpl)
+    else:
+        invoice_pdf.render_large_invoice_pdf(data, sink, tpl)
+    elapsed = time.perf_counter() - t0
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) / 1024
+    results.put((elapsed, peak_mb, sink.size))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Large invoice PDF rendering")
+    parser.add_argument("--items", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--table-max", type=int, default=10_000,
+                        help="largest item count to try with the single-Table layout")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'items':>8} {'seconds':>9} {'items/s':>9} {'peak +MB':>9} {'PDF KB':>9}")
+    for n in args.items:
+        for mode in ("table", "large"):
+            if mode == "table" and n > args.table_max:
+                continue
+            results: mp.Queue = mp.Queue()
+            proc = mp.Process(target=_run, args=(mode, n, results))
+            proc.start()
+            elapsed, peak_mb, size = results.get()
+            proc.join()
+            print(f"{mode:<8} {n:>8,} {elapsed:>9.2f} {n / elapsed:>9,.0f} {peak_mb:>9.1f} {size / 1024:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# benchmarks/bench_pdf_template.py
+# Per-invoice render time with the cached InvoiceTemplate vs. rebuilding the
+# styles, logo and business header on every render (the old behaviour).
+import argparse
+import os
+import tempfile
+
+from common import time_calls, summarize, print_row
+
+import settings
+import invoice_pdf
+
+
+def sample_invoice(n_items: int) -> dict:
+    return {
+        "invoice": {
+            "invoice_id": 1, "invoice_number": "2026-00001", "client_id": 1,
+            "issue_date": "2026-01-15", "due_date": "2026-01-29", "notes": "Net 14",
+            "tax_rate": 0.1025, "status": "Unpaid", "pdf_path": None,
+        },
+        "client": {"client_id": 1, "name": "Jane Doe", "phone": "555-0100",
+                   "email": "jane@example.com", "address": "1 Main St\nChicago, IL"},
+        "items": [
+            {"item_id": i, "invoice_id": 1, "description": f"Line item {i}", "qty": 1.0,
+             "unit_price": 25.0, "category": "labor"}
+            for i in range(n_items)
+        ],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cached vs uncached PDF template")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--items", type=int, default=5)
+    args = parser.parse_args()
+
+    settings.INVOICE_OUTPUT_DIR = tempfile.mkdtemp(prefix="invoicer-bench-")
+    data = sample_invoice(args.items)
+
+    print_row("fresh template per render", summarize(time_calls(
+        lambda: invoice_pdf.build_invoice_pdf(data, template=invoice_pdf.InvoiceTemplate()), args.repeat)))
+    invoice_pdf.get_template()  # warm
+    print_row("cached template", summarize(time_calls(
+        lambda: invoice_pdf.build_invoice_pdf(data), args.repeat)))
+    print(f"output in {settings.INVOICE_OUTPUT_DIR} ({len(os.listdir(settings.INVOICE_OUTPUT_DIR))} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_startup.py
+# Cold-start budget for the app and the CLI tools. Each case runs in a fresh
+# interpreter (started outside the invoicer folder, so nothing leans on the
+# working directory) and is timed from the first import to ready-to-work.
+# Cases also list modules that must NOT be loaded by then, e.g. ReportLab for
+# anything that doesn't render a PDF.
+#
+#   python benchmarks/bench_startup.py                        # check against startup_budget.json
+#   python benchmarks/bench_startup.py --profile "app imports"   # heaviest imports via -X importtime
+#   python benchmarks/bench_startup.py --save-budget          # re-measure and write the budget
+#
+# Exit status is 1 when a case's median is over budget or loads a lazy module.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from common import INVOICER_DIR
+
+BUDGET_FILE = Path(__file__).resolve().parent / "startup_budget.json"
+HEADROOM = 2.0     # --save-budget writes the measured median times this...
+MIN_SLACK_MS = 25  # ...but at least this much over it, so tiny cases aren't all noise
+
+# name -> (code run in the fresh interpreter, modules that must stay unloaded)
+CASES: Dict[str, Tuple[str, List[str]]] = {
+    "app imports": ("import streamlit, cached, line_items, metrics, reports, jobs", ["reportlab", "pyarrow"]),
+    "db": ("import db", ["reportlab", "http.server"]),
+    "init_db (set up)": ("import db; db.set_db_path(DB); db.init_db()", ["reportlab"]),
+    "reports CLI": ("import reports", ["reportlab", "streamlit"]),
+    "jobs CLI": ("import jobs", ["reportlab", "streamlit"]),
+    "batch_render CLI": ("import batch_render", ["reportlab", "streamlit"]),
+    "bulk_import CLI": ("import bulk_import", ["reportlab", "streamlit"]),
+    "export CLI": ("import export", ["reportlab", "pyarrow", "streamlit"]),
+    "invoice_pdf": ("import invoice_pdf", []),
+}
+
+_PROBE = """
+import json, sys, time
+DB = {db!r}
+t0 = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(INVOICER_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def _set_up_db() -> str:
+    """A fully initialised database, so the init_db case measures the already-set-up path."""
+    path = str(Path(tempfile.mkdtemp(prefix="invoicer-bench-")) / "startup.db")
+    subprocess.run([sys.executable, "-c", f"import db; db.set_db_path({path!r}); db.init_db()"],
+                   env=_env(), cwd=tempfile.gettempdir(), check=True)
+    return path
+
+
+def measure(name: str, db_path: str, repeat: int) -> Tuple[float, List[str]]:
+    code, lazy = CASES[name]
+    probe = _PROBE.format(db=db_path, code=code, lazy=lazy)
+    samples, loaded = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", probe], env=_env(), cwd=tempfile.gettempdir(),
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        samples.append(result["ms"])
+        loaded = result["loaded"]
+    return statistics.median(samples), loaded
+
+
+def profile(name: str, db_path: str, top: int = 15) -> None:
+    """Prints the heaviest imports (cumulative) for one case, from -X importtime."""
+    code, _ = CASES[name]
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"DB = {db_path!r}\n{code}"],
+                         env=_env(), cwd=tempfile.gettempdir(), capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split("|")
+        rows.append((int(cumulative_us), module.rstrip()))
+    print(f"heaviest imports for {name!r} (cumulative ms):")
+    for cumulative_us, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative_us / 1000:>9.1f}  {module}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Startup time budget")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per case (median is used)")
+    parser.add_argument("--budget", default=str(BUDGET_FILE), help="budget JSON: case -> milliseconds")
+    parser.add_argument("--save-budget", action="store_true",
+                        help=f"write measured medians x{HEADROOM} as the new budget")
+    parser.add_argument("--profile", metavar="CASE", choices=list(CASES), help="show -X importtime for one case")
+    args = parser.parse_args(argv)
+
+    db_path = _set_up_db()
+    if args.profile:
+        profile(args.profile, db_path)
+        return 0
+
+    budget: Dict[str, float] = {}
+    if not args.save_budget and Path(args.budget).is_file():
+        budget = json.loads(Path(args.budget).read_text())
+
+    ok = True
+    measured: Dict[str, float] = {}
+    print(f"{'case':<20} {'median ms':>10} {'budget ms':>10}")
+    for name in CASES:
+        ms, loaded = measure(name, db_path, args.repeat)
+        measured[name] = ms
+        limit = budget.get(name)
+        notes = []
+        if limit is not None and ms > limit:
+            notes.append("OVER BUDGET")
+        if loaded:
+            notes.append(f"loaded {', '.join(loaded)}")
+        ok = ok and not notes
+        limit_text = f"{limit:>10.0f}" if limit is not None else f"{'-':>10}"
+        print(f"{name:<20} {ms:>10.1f} {limit_text}  {'  '.join(notes)}")
+
+    if args.save_budget:
+        Path(args.budget).write_text(
+            json.dumps({k: round(max(v * HEADROOM, v + MIN_SLACK_MS)) for k, v in measured.items()}, indent=2) + "\n")
+        print(f"wrote {args.budget}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# benchmarks/common.py
+# Shared helpers for the invoicer benchmark scripts.
+# Run any benchmark from the invoicer/ directory, e.g.
+#   python benchmarks/bench_connections.py
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+INVOICER_DIR = Path(__file__).resolve().parent.parent
+if str(INVOICER_DIR) not in sys.path:
+    sys.path.insert(0, str(INVOICER_DIR))
+
+
+def temp_db_path(name: str = "bench.db") -> str:
+    """Returns a path to a fresh database file inside a new temporary directory."""
+    return str(Path(tempfile.mkdtemp(prefix="invoicer-bench-")) / name)
+
+
+def time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Calls fn `repeat` times and returns each call's latency in seconds."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[len(ordered) // 2] * 1e6,
+        "p95_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1e6,
+        "ops_per_s": len(ordered) / sum(ordered) if sum(ordered) else float("inf"),
+    }
+
+
+def print_row(label: str, stats: Dict[str, float]) -> None:
+    print(
+        f"{label:<40} n={stats['n']:<7} mean={stats['mean_us']:>9.1f}us "
+        f"p50={stats['p50_us']:>9.1f}us p95={stats['p95_us']:>9.1f}us "
+        f"{stats['ops_per_s']:>10.0f} ops/s"
+    )
+
+
+def seed_db(n_clients: int, n_invoices: int, items_per_invoice: int = 3, seed: int = 0) -> None:
+    """
+    Fills the current database (fully migrated) with synthetic clients and invoices
+    spread over several years, using the bulk-load path so large sizes seed quickly.
+    """
+    import db
+    rng = random.Random(seed)
+    statuses = ["Unpaid", "Paid"]
+    categories = ["labor", "material", "misc"]
+    db.begin_bulk_load()
+    try:
+        with db.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO clients(name, phone, email, address) VALUES (?, ?, ?, ?)",
+                [(f"Client {i:06d}", f"555-{i % 10000:04d}", f"c{i}@example.com", f"{i} Main St")
+                 for i in range(n_clients)],
+            )
+        chunk = 50_000
+        seqs: Dict[int, int] = {}
+        for start in range(0, n_invoices, chunk):
+            invoices = []
+            items = []
+            for i in range(start, min(start + chunk, n_invoices)):
+                year = 2020 + i * 6 // max(n_invoices, 1)
+                seqs[year] = seqs.get(year, 0) + 1
+                day = f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                invoices.append((i + 1, f"{year}-{seqs[year]:05d}", rng.randint(1, n_clients), day, day, "",
+                                 0.1, rng.choice(statuses)))
+                for _ in range(items_per_invoice):
+                    items.append((i + 1, "Seed item", float(rng.randint(1, 8)), 25.0, rng.choice(categories)))
+            with db.transaction() as conn:
+                conn.executemany("""
+                    INSERT INTO invoices(invoice_id, invoice_number, client_id, issue_date, due_date, notes,
+                                         tax_rate, status)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, invoices)
+                conn.executemany("""
+                    INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
+                    VALUES (?, ?, ?, ?, ?)
+                """, items)
+    finally:
+        db.end_bulk_load()
@@ -0,0 +1,235 @@
+# benchmarks/suite.py
+# Benchmark suite for db.py and invoice_pdf.py, for local runs and CI.
+# Seeds fresh databases at each size, times every case, writes the results as
+# JSON and optionally compares them against a stored baseline.
+#
+#   python benchmarks/suite.py                                  # small + medium
+#   python benchmarks/suite.py --quick --baseline benchmarks/baseline.json
+#   python benchmarks/suite.py --quick --save-baseline benchmarks/baseline.json --machine "1-CPU Linux VM"
+#
+# With --baseline the exit status is 1 when any case's median is more than
+# --threshold slower than the baseline's. The repo has no CI, so this is run by
+# hand before merging a performance change, on the machine named in the
+# baseline: timings from another machine say nothing against it. Re-record the
+# baseline with --save-baseline after a change that moves the numbers on
+# purpose, or when moving to a different machine.
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from common import print_row, seed_db, summarize, temp_db_path, time_calls
+
+import db
+import settings
+
+# name -> (clients, invoices); every seeded invoice has 3 items
+SIZES: Dict[str, Tuple[int, int]] = {
+    "small": (1_000, 5_000),
+    "medium": (10_000, 50_000),
+    "large": (50_000, 250_000),
+}
+DEFAULT_SIZES = ["small", "medium"]
+THRESHOLD = 0.30  # fraction slower than baseline that counts as a regression
+
+# (label, item count, repeats, quick repeats)
+INVOICE_CREATE = [("1 item", 1, 200, 50), ("100 items", 100, 50, 10), ("10k items", 10_000, 5, 3)]
+PDF_CASES = [("small", 5, 20, 10), ("large", 2_000, 3, 2)]
+
+ITEM = {"description": "Bench item", "qty": 2.0, "unit_price": 12.5, "category": "material"}
+
+Results = Dict[str, Dict[str, float]]
+
+
+def _record(results: Results, key: str, samples: List[float]) -> None:
+    results[key] = summarize(samples)
+    print_row(key, results[key])
+
+
+def bench_db(size: str, quick: bool, results: Results) -> None:
+    n_clients, n_invoices = SIZES[size]
+    db.set_db_path(temp_db_path(f"suite-{size}.db"))
+    db.init_db()
+    t0 = time.perf_counter()
+    seed_db(n_clients, n_invoices)
+    print(f"-- {size}: {n_clients:,} clients, {n_invoices:,} invoices (seeded in {time.perf_counter() - t0:.1f}s)")
+    rng = random.Random(1)
+    repeat = 50 if quick else 500
+
+    counter = iter(range(10**9))
+    _record(results, f"{size}/client_insert", time_calls(
+        lambda: db.create_client(f"Bench {next(counter)}", "555-0100", "bench@example.com", "1 Main St"), repeat))
+    _record(results, f"{size}/client_search_page", time_calls(
+        lambda: db.search_clients("", 25, None), repeat))
+    _record(results, f"{size}/client_list_all", time_calls(db.list_clients, 3 if quick else 10))
+
+    for label, n_items, full_repeat, quick_repeat in INVOICE_CREATE:
+        items = [ITEM] * n_items
+        _record(results, f"{size}/invoice_create[{label}]", time_calls(
+            lambda: db.create_invoice_with_items(rng.randint(1, n_clients), "2026-03-01", "2026-03-15", "",
+                                                 0.1, items),
+            quick_repeat if quick else full_repeat))
+
+    _record(results, f"{size}/get_invoice_with_items", time_calls(
+        lambda: db.get_invoice_with_items(rng.randint(1, n_invoices)), repeat))
+    db.close_conn()
+
+
+def _allocate_worker(db_path: str, client_id: int, count: int) -> None:
+    db.set_db_path(db_path)
+    for _ in range(count):
+        db.create_invoice_with_items(client_id, "2026-06-01", "2026-06-15", "", 0.0, [ITEM])
+    db.close_conn()
+
+
+def bench_parallel_numbers(quick: bool, results: Results) -> bool:
+    """Invoices/s with several processes allocating numbers at once; False on duplicates/gaps."""
+    procs = max(2, min(8, os.cpu_count() or 1))
+    per_proc = 50 if quick else 250
+    db_path = temp_db_path("suite-numbers.db")
+    db.set_db_path(db_path)
+    db.init_db()
+    client_id = db.create_client("Parallel Client", "", "", "")
+    db.close_conn()
+
+    workers = [mp.Process(target=_allocate_worker, args=(db_path, client_id, per_proc)) for _ in range(procs)]
+    t0 = time.perf_counter()
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - t0
+
+    total = procs * per_proc
+    # Report the mean time per invoice so it compares like the other cases
+    _record(results, f"numbers/parallel[{procs} procs]", [elapsed / total] * total)
+    db.set_db_path(db_path)
+    row = db.get_conn().execute(
+        "SELECT COUNT(*) AS n, COUNT(DISTINCT invoice_number) AS d, "
+        "MAX(CAST(substr(invoice_number, 6) AS INTEGER)) AS top FROM invoices"
+    ).fetchone()
+    db.close_conn()
+    ok = row["n"] == total and row["d"] == total and row["top"] == total
+    if not ok:
+        print(f"   number allocation broken: {row['n']} invoices, {row['d']} distinct, max seq {row['top']}")
+    return ok
+
+
+def _pdf_invoice(n_items: int) -> Dict[str, Any]:
+    return {
+        "invoice": {
+            "invoice_id": 1, "invoice_number": "2026-00001", "client_id": 1,
+            "issue_date": "2026-01-15", "due_date": "2026-01-29", "notes": "Net 14",
+            "tax_rate": 0.1025, "status": "Unpaid", "pdf_path": None,
+        },
+        "client": {"client_id": 1, "name": "Jane Doe", "phone": "555-0100",
+                   "email": "jane@example.com", "address": "1 Main St\nChicago, IL"},
+        "items": [
+            {"item_id": i, "invoice_id": 1, "description": f"Line item {i}", "qty": 1.0,
+             "unit_price": 25.0, "category": "labor"}
+            for i in range(n_items)
+        ],
+    }
+
+
+def bench_pdf(quick: bool, results: Results) -> None:
+    import invoice_pdf
+    settings.INVOICE_OUTPUT_DIR = tempfile.mkdtemp(prefix="invoicer-bench-")
+    invoice_pdf.get_template()  # warm, so the first sample doesn't include template setup
+    for label, n_items, full_repeat, quick_repeat in PDF_CASES:
+        data = _pdf_invoice(n_items)
+        _record(results, f"pdf/build[{label}, {n_items} items]", time_calls(
+            lambda: invoice_pdf.build_invoice_pdf(data), quick_repeat if quick else full_repeat))
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> List[str]:
+    """Returns the keys whose median got more than `threshold` slower than the baseline."""
+    regressions = []
+    print(f"\n{'case':<44} {'baseline p50':>13} {'now p50':>11} {'change':>8}")
+    for key, stats in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<44} {'-':>13} {stats['p50_us']:>9.1f}us      new")
+            continue
+        change = stats["p50_us"] / base["p50_us"] - 1 if base["p50_us"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:<44} {base['p50_us']:>11.1f}us {stats['p50_us']:>9.1f}us {change:>+7.0%}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="invoicer benchmark suite")
+    parser.add_argument("--sizes", default=",".join(DEFAULT_SIZES),
+                        help=f"comma-separated seed sizes from {', '.join(SIZES)}")
+    parser.add_argument("--quick", action="store_true", help="small size only, fewer repeats (for CI)")
+    parser.add_argument("--skip", default="", help="comma-separated groups to skip: db, numbers, pdf")
+    parser.add_argument("--out", default="benchmark-results.json", help="where to write the results JSON")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="allowed slowdown before a case fails, as a fraction (0.3 = 30%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also write the results to PATH as the new baseline")
+    parser.add_argument("--machine", default="", help="what these numbers were measured on, stored with the results")
+    args = parser.parse_args(argv)
+
+    sizes = ["small"] if args.quick else [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+
+    results: Results = {}
+    ok = True
+    if "db" not in skip:
+        for size in sizes:
+            bench_db(size, args.quick, results)
+    if "numbers" not in skip:
+        print("-- parallel invoice number allocation")
+        ok = bench_parallel_numbers(args.quick, results)
+    if "pdf" not in skip:
+        print("-- PDF rendering")
+        bench_pdf(args.quick, results)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "machine": args.machine,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+    for path in filter(None, [args.out, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"wrote {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        meta = baseline["meta"]
+        print(f"\nbaseline: {meta.get('machine') or 'unnamed machine'}, {meta['cpus']} CPUs, "
+              f"Python {meta['python']}, recorded {meta['timestamp']}")
+        if (meta["cpus"], meta["python"]) != (os.cpu_count(), platform.python_version()):
+            print("warning: this machine doesn't match the baseline's; expect differences unrelated to the code")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+# bulk_import.py
+# Streams clients and historical invoices into the database from CSV or JSONL.
+#
+#   python bulk_import.py clients branch_clients.csv
+#   python bulk_import.py invoices branch_invoices.jsonl --rejects rejects.csv
+#
+# Clients: ref, name, phone, email, address. ref is the source system's id and is
+# stored as clients.external_ref; rows without one are keyed by lowercased email.
+# Invoices: one row per line item with invoice_number, client_ref, issue_date,
+# due_date, notes, tax_rate, status, description, qty, unit_price, category.
+# Rows of the same invoice must be adjacent; rows that come back to an invoice
+# after others are rejected, not merged. A JSONL invoice may instead carry
+# its line items in an "items" list.
+#
+# Rows are committed in chunks, and rows already in the database (same ref or
+# invoice_number) are skipped, so an interrupted import can simply be re-run.
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import db
+from settings import DEFAULT_TAX_RATE
+
+# Input rows written per transaction
+CHUNK_ROWS = 5000
+# Keys per IN (...) lookup, below SQLite's bound-parameter limit
+_IN_CHUNK = 500
+
+STATUSES = ("Unpaid", "Paid")
+CATEGORIES = ("labor", "material", "misc")
+
+Row = Dict[str, Any]
+ProgressFn = Callable[[int, float], None]
+
+
+@dataclass
+class ImportResult:
+    read: int = 0        # input rows seen (line items, for invoices)
+    inserted: int = 0    # clients or invoices added
+    skipped: int = 0     # already in the database, e.g. from an earlier partial run
+    rejected: List[Tuple[int, str]] = field(default_factory=list)  # (line, reason)
+    elapsed: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, Row]]:
+    """Yields (line number, row) from a CSV file with a header row, or from JSONL."""
+    fmt = fmt or ("jsonl" if Path(path).suffix in (".jsonl", ".ndjson") else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {"_error": f"invalid JSON: {e.msg}"}
+                yield line_no, row if isinstance(row, dict) else {"_error": "not a JSON object"}
+
+
+def _text(row: Row, key: str) -> str:
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _number(row: Row, key: str, default: Optional[float] = None) -> float:
+    raw = _text(row, key)
+    if not raw:
+        if default is None:
+            raise ValueError(f"missing {key}")
+        return default
+    try:
+        return float(raw.replace(",", "").lstrip("$"))
+    except ValueError:
+        raise ValueError(f"{key} is not a number: {raw!r}") from None
+
+
+def _date(row: Row, key: str) -> str:
+    raw = _text(row, key)
+    try:
+        return dt.date.fromisoformat(raw).isoformat()
+    except ValueError:
+        raise ValueError(f"{key} is not a YYYY-MM-DD date: {raw!r}") from None
+
+
+def clean_client(row: Row) -> Tuple[str, str, str, str, str]:
+    """Validates a client row; returns (external_ref, name, phone, email, address)."""
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    name = _text(row, "name")
+    email = _text(row, "email")
+    if not name:
+        raise ValueError("missing name")
+    if email and "@" not in email:
+        raise ValueError(f"invalid email: {email!r}")
+    ref = _text(row, "ref") or email.lower()
+    if not ref:
+        raise ValueError("needs a ref or an email to detect re-imports")
+    return ref, name, _text(row, "phone"), email, _text(row, "address")
+
+
+def clean_item(row: Row) -> Tuple[str, float, float, str]:
+    """Validates a line item; returns (description, qty, unit_price, category)."""
+    description = _text(row, "description")
+    if not description:
+        raise ValueError("missing description")
+    qty = _number(row, "qty")
+    unit_price = _number(row, "unit_price")
+    if qty <= 0:
+        raise ValueError("qty must be positive")
+    category = _text(row, "category").lower() or "misc"
+    if category not in CATEGORIES:
+        raise ValueError(f"category must be one of {', '.join(CATEGORIES)}")
+    return description, qty, unit_price, category
+
+
+def clean_invoice(row: Row) -> Tuple[str, str, str, str, str, float, str]:
+    """Validates invoice header fields; returns
+    (invoice_number, client_ref, issue_date, due_date, notes, tax_rate, status)."""
+    if "_error" in row:
+        raise ValueError(row["_error"])
+    number = _text(row, "invoice_number")
+    client_ref = _text(row, "client_ref")
+    if not number:
+        raise ValueError("missing invoice_number")
+    if not client_ref:
+        raise ValueError("missing client_ref")
+    issue_date = _date(row, "issue_date")
+    due_date = _date(row, "due_date") if _text(row, "due_date") else issue_date
+    tax_rate = _number(row, "tax_rate", DEFAULT_TAX_RATE)
+    if not 0 <= tax_rate < 1:
+        raise ValueError("tax_rate must be a fraction, e.g. 0.1025")
+    status = _text(row, "status").capitalize() or "Unpaid"
+    if status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    return number, client_ref, issue_date, due_date, _text(row, "notes"), tax_rate, status
+
+
+def _group_invoices(rows: Iterable[Tuple[int, Row]]) -> Iterator[Tuple[List[int], Row, List[Row]]]:
+    # (line numbers, header row, item rows); adjacent flat rows with the same number form one invoice
+    current: Optional[Tuple[List[int], Row, List[Row]]] = None
+    for line_no, row in rows:
+        if isinstance(row.get("items"), list):
+            if current:
+                yield current
+                current = None
+            yield [line_no], row, row["items"]
+            continue
+        if current and _text(row, "invoice_number") == _text(current[1], "invoice_number"):
+            current[0].append(line_no)
+            current[2].append(row)
+            continue
+        if current:
+            yield current
+        current = ([line_no], row, [row])
+    if current:
+        yield current
+
+
+def _existing(conn: Any, sql: str, keys: List[Any]) -> Dict[Any, Any]:
+    # sql selects (key, value) and ends in "IN ({})"
+    found: Dict[Any, Any] = {}
+    for start in range(0, len(keys), _IN_CHUNK):
+        part = keys[start:start + _IN_CHUNK]
+        for key, value in conn.execute(sql.format(",".join("?" * len(part))), part):
+            found[key] = value
+    return found
+
+
+def _insert_clients(chunk: List[Tuple[int, Tuple]], result: ImportResult) -> None:
+    with db.transaction() as conn:
+        cur = conn.executemany("""
+            INSERT INTO clients(external_ref, name, phone, email, address) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(external_ref) WHERE external_ref IS NOT NULL DO NOTHING
+        """, [values for _, values in chunk])
+        result.inserted += cur.rowcount
+        result.skipped += len(chunk) - cur.rowcount
+
+
+def import_clients(
+    rows: Iterable[Tuple[int, Row]],
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[ProgressFn] = None,
+) -> ImportResult:
+    """Inserts valid client rows in chunked transactions, skipping refs already present."""
+    result = ImportResult()
+    t0 = time.perf_counter()
+    chunk: List[Tuple[int, Tuple]] = []
+    for line_no, row in rows:
+        result.read += 1
+        try:
+            chunk.append((line_no, clean_client(row)))
+        except ValueError as e:
+            result.rejected.append((line_no, str(e)))
+        if len(chunk) >= chunk_rows:
+            _insert_clients(chunk, result)
+            chunk = []
+            if progress:
+                progress(result.read, time.perf_counter() - t0)
+    if chunk:
+        _insert_clients(chunk, result)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def _insert_invoices(chunk: List[Tuple[int, Tuple, List[Tuple]]], result: ImportResult) -> None:
+    with db.transaction() as conn:
+        numbers = [header[0] for _, header, _ in chunk]
+        present = _existing(conn, "SELECT invoice_number, 1 FROM invoices WHERE invoice_number IN ({})", numbers)
+        client_ids = _existing(
+            conn, "SELECT external_ref, client_id FROM clients WHERE external_ref IN ({})",
+            list({header[1] for _, header, _ in chunk}),
+        )
+        headers = []
+        new = []
+        for line_no, header, items in chunk:
+            number, client_ref = header[0], header[1]
+            if number in present:
+                result.skipped += 1
+            elif client_ref not in client_ids:
+                result.rejected.append((line_no, f"unknown client_ref: {client_ref!r}"))
+            else:
+                present[number] = 1  # a repeat later in the same chunk is a duplicate
+                headers.append((number, client_ids[client_ref], *header[2:]))
+                new.append((number, items))
+        if not headers:
+            return
+
+        conn.executemany("""
+            INSERT INTO invoices(invoice_number, client_id, issue_date, due_date, notes, tax_rate, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, headers)
+        invoice_ids = _existing(
+            conn, "SELECT invoice_number, invoice_id FROM invoices WHERE invoice_number IN ({})",
+            [number for number, _ in new],
+        )
+        conn.executemany("""
+            INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(invoice_ids[number], *item) for number, items in new for item in items])
+        result.inserted += len(headers)
+
+
+def import_invoices(
+    rows: Iterable[Tuple[int, Row]],
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[ProgressFn] = None,
+) -> ImportResult:
+    """
+    Inserts historical invoices with their line items in chunked transactions.
+    An invoice is rejected as a whole if its header or any item is invalid or its
+    client_ref is unknown; invoice numbers already present are skipped. Rows of an
+    invoice that reappear after other invoices are rejected row by row.
+    """
+    result = ImportResult()
+    t0 = time.perf_counter()
+    chunk: List[Tuple[int, Tuple, List[Tuple]]] = []
+    pending = 0
+    first_seen: Dict[str, int] = {}  # invoice_number -> line of its first group in this file
+    for line_nos, header, item_rows in _group_invoices(rows):
+        line_no = line_nos[0]
+        result.read += len(item_rows) if item_rows else 1
+        number = _text(header, "invoice_number")
+        if number in first_seen:
+            # The earlier group may already be committed; merging into it would
+            # mean buffering the whole file, so the stray rows are reported instead
+            reason = (f"invoice {number} started at line {first_seen[number]} with other "
+                      "invoices in between; rows of one invoice must be adjacent")
+            result.rejected.extend((n, reason) for n in line_nos)
+            continue
+        if number:
+            first_seen[number] = line_no
+        try:
+            if not item_rows:
+                raise ValueError("invoice has no line items")
+            invoice = clean_invoice(header)
+            items = [clean_item(r) for r in item_rows]
+        except ValueError as e:
+            result.rejected.append((line_no, str(e)))
+            continue
+        chunk.append((line_no, invoice, items))
+        pending += len(items)
+        if pending >= chunk_rows:
+            _insert_invoices(chunk, result)
+            chunk, pending = [], 0
+            if progress:
+                progress(result.read, time.perf_counter() - t0)
+    if chunk:
+        _insert_invoices(chunk, result)
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def run_import(
+    kind: str,
+    path: str,
+    fmt: Optional[str] = None,
+    defer_maintenance: bool = True,
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[ProgressFn] = None,
+) -> ImportResult:
+    """
+    Imports a clients or invoices file. With defer_maintenance the FTS, summary and
+    totals triggers and the secondary indexes are dropped for the duration and
+    rebuilt once at the end (included in elapsed). Either way, the per-year invoice
+    counters are moved past any imported invoice numbers.
+    """
+    importer = {"clients": import_clients, "invoices": import_invoices}[kind]
+    t0 = time.perf_counter()
+    if defer_maintenance:
+        db.begin_bulk_load()
+    try:
+        result = importer(read_rows(path, fmt), chunk_rows, progress)
+    finally:
+        # Chunks committed before a failure count too
+        if defer_maintenance:
+            db.end_bulk_load()
+        elif kind == "invoices":
+            db.catch_up_invoice_counters()
+    result.rejected.sort()
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def _print_progress(done: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed else 0.0
+    print(f"\r{done:,} rows  {rate:,.0f}/s", end="", file=sys.stderr, flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import clients or historical invoices")
+    parser.add_argument("kind", choices=("clients", "invoices"))
+    parser.add_argument("path", help="CSV with a header row, or JSONL (.jsonl/.ndjson)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="override detection by extension")
+    parser.add_argument("--rejects", help="write rejected rows (line, reason) to this CSV")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="leave triggers and indexes in place (faster for small files)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows per transaction")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    result = run_import(
+        args.kind, args.path, args.format,
+        defer_maintenance=not args.keep_indexes,
+        chunk_rows=args.chunk_rows,
+        progress=None if args.quiet else _print_progress,
+    )
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Read {result.read:,} rows in {result.elapsed:.2f}s ({result.per_second:,.0f} rows/s): "
+          f"{result.inserted:,} {args.kind} added, {result.skipped:,} already present, "
+          f"{len(result.rejected):,} rejected")
+    if args.rejects and result.rejected:
+        with open(args.rejects, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["line", "reason"])
+            writer.writerows(result.rejected)
+    else:
+        for line_no, reason in result.rejected[:20]:
+            print(f"  line {line_no}: {reason}")
+        if len(result.rejected) > 20:
+            print(f"  ... {len(result.rejected) - 20:,} more (use --rejects to save them all)")
+    return 1 if result.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
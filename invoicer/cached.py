@@ -0,0 +1,115 @@
+# cached.py
+# Read-query cache for the Streamlit app. Results live in Streamlit's
+# process-wide cache, so they survive reruns and are shared across sessions.
+# Writes go through the wrappers below, which clear only the entries they affect.
+# CACHE_TTL bounds staleness from writes made by other processes (e.g. batch_render).
+from typing import Any, Dict, List, Optional, Tuple
+
+import streamlit as st
+
+import db
+import jobs
+import metrics
+import settings
+
+CACHE_TTL = 300  # seconds
+RECENT_INVOICES = 50
+
+
+@st.cache_resource(show_spinner=False)
+def init_db_once() -> None:
+    """Schema setup/migrations, once per server process instead of once per rerun."""
+    db.init_db()
+
+
+@st.cache_resource(show_spinner=False)
+def start_pdf_worker() -> jobs.PdfWorker:
+    """One background PDF render worker per server process; picks up jobs left from before a restart."""
+    worker = jobs.PdfWorker()
+    worker.start()
+    return worker
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server() -> Optional[Any]:
+    """Serves /metrics for Prometheus when settings.METRICS_PORT is set, once per server process."""
+    if settings.METRICS_PORT is None:
+        return None
+    return metrics.serve(int(settings.METRICS_PORT))
+
+
+# ---- Reads ----
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=1000)
+def search_clients(query: str, limit: int, after: Optional[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    """One page of db.search_clients(); the app never loads the full client list."""
+    return db.search_clients(query, limit, after)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def get_client(client_id: int) -> Optional[Dict[str, Any]]:
+    return db.get_client(client_id)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def list_invoices(client_id: Optional[int]) -> List[Dict[str, Any]]:
+    """Recent invoices for one client, or for everyone with client_id=None."""
+    return db.list_invoices(client_id, RECENT_INVOICES)
+
+
+INVOICE_PAGE_SIZE = 50
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=1000)
+def invoice_page(
+    status: Optional[str],
+    client_id: Optional[int],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    after: Optional[Tuple[str, int]],
+) -> List[Dict[str, Any]]:
+    """One page (plus one lookahead row) of the invoice history browser."""
+    return db.list_invoices_page(status, client_id, date_from, date_to, INVOICE_PAGE_SIZE + 1, after)
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False, max_entries=1000)
+def invoice_items(invoice_id: int) -> List[Dict[str, Any]]:
+    return db.get_invoice_items(invoice_id)
+
+
+# ---- Writes (and the cache entries they invalidate) ----
+
+def _invalidate_invoices(client_id: int) -> None:
+    # Entries are keyed by the exact call arguments, so always call these positionally
+    list_invoices.clear(client_id)
+    list_invoices.clear(None)
+    # Any filter combination may include the changed invoice
+    invoice_page.clear()
+
+
+def create_client(name: str, phone: str, email: str, address: str) -> int:
+    client_id = db.create_client(name, phone, email, address)
+    # A new client can land on any page of any search, so drop them all
+    search_clients.clear()
+    # A lookup of this id made before the insert cached None
+    get_client.clear(client_id)
+    return client_id
+
+
+def create_invoice_queue_pdf(**kwargs: Any) -> Tuple[Dict[str, Any], int]:
+    """Creates the invoice and queues its PDF render in one transaction; returns (data, job_id)."""
+    with db.transaction():
+        data = db.create_invoice_with_items(**kwargs)
+        job_id = jobs.enqueue_pdf(data["invoice"]["invoice_id"])
+    _invalidate_invoices(data["invoice"]["client_id"])
+    return data, job_id
+
+
+def pdf_job_finished(client_id: int) -> None:
+    """Call once when a queued render is done: the worker wrote pdf_path behind the cache."""
+    _invalidate_invoices(client_id)
+
+
+def set_invoice_status(invoice_id: int, client_id: int, status: str) -> None:
+    db.set_invoice_status(invoice_id, status)
+    _invalidate_invoices(client_id)
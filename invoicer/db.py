@@ -1,151 +1,963 @@
 # db.py
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator, Tuple
 from settings import DB_PATH
 
-def get_conn() -> sqlite3.Connection:
-    Path("data").mkdir(exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+import metrics
+
+# Connection tuning applied to every connection we open. WAL lets readers run
+# alongside a writer, and NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,       # negative = KiB, so ~20 MB of page cache
+    "mmap_size": 268435456,     # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # ms to wait on a locked db before failing
+}
+
+_local = threading.local()
+
+
+def _open_conn(db_path: str) -> sqlite3.Connection:
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves in transaction()
+    factory = metrics.TimedConnection if metrics.enabled else sqlite3.Connection
+    conn = sqlite3.connect(db_path, isolation_level=None, factory=factory)
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
     return conn
 
-def init_db() -> None:
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Returns this thread's long-lived connection to DB_PATH, opening it on first use.
+    Connections are never shared across threads or forked processes.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH and _local.pid == os.getpid():
+        # Reopen once metrics are switched on or off, but never mid-transaction
+        if _local.timed == metrics.enabled or _local.depth:
+            return conn
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = _open_conn(DB_PATH)
+    _local.path = DB_PATH
+    _local.pid = os.getpid()
+    _local.timed = metrics.enabled
+    _local.depth = 0
+    return _local.conn
+
+
+def close_conn() -> None:
+    """Closes this thread's cached connection (if any)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+
+def set_db_path(path: str) -> None:
+    """Points the module at a different database file (used by tools and benchmarks)."""
+    global DB_PATH
+    close_conn()
+    DB_PATH = str(path)
+
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Runs the enclosed statements in one write transaction on this thread's connection.
+    BEGIN IMMEDIATE takes the write lock up front so read-then-write sequences can't
+    deadlock against another writer. Nested uses join the outer transaction.
+    """
+    with _transaction("BEGIN IMMEDIATE") as conn:
+        yield conn
+
+
+@contextmanager
+def snapshot() -> Iterator[sqlite3.Connection]:
+    """
+    Runs read-only statements against one consistent view of the database.
+    A plain (deferred) BEGIN takes no write lock, so writers carry on meanwhile;
+    TEMP tables may still be written. Nested uses join the outer transaction.
+    """
+    with _transaction("BEGIN") as conn:
+        yield conn
+
+
+@contextmanager
+def _transaction(begin: str) -> Iterator[sqlite3.Connection]:
     conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS clients (
-        client_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        phone TEXT,
-        email TEXT,
-        address TEXT
-    )
-    """)
+    if _local.depth:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS invoices (
-        invoice_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        invoice_number TEXT NOT NULL UNIQUE,
-        client_id INTEGER NOT NULL,
-        issue_date TEXT NOT NULL,
-        due_date TEXT NOT NULL,
-        notes TEXT,
-        tax_rate REAL NOT NULL DEFAULT 0.0,
-        status TEXT NOT NULL DEFAULT 'Unpaid',
-        pdf_path TEXT,
-        FOREIGN KEY (client_id) REFERENCES clients(client_id)
-    )
-    """)
+    conn.execute(begin)
+    _local.depth = 1
+    try:
+        yield conn
+    except BaseException:
+        # SQLite may have rolled back already (e.g. SQLITE_FULL, IOERR); a second
+        # ROLLBACK would fail and hide the original error
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    else:
+        try:
+            conn.execute("COMMIT")
+        except BaseException:
+            # e.g. SQLITE_BUSY at commit: don't leave the connection mid-transaction
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+    finally:
+        _local.depth = 0
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS invoice_items (
-        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        invoice_id INTEGER NOT NULL,
-        description TEXT NOT NULL,
-        qty REAL NOT NULL,
-        unit_price REAL NOT NULL,
-        category TEXT NOT NULL,  -- labor/material/misc
-        FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id)
-    )
-    """)
+def init_db(target_version: Optional[int] = None) -> None:
+    """
+    Creates the base tables and applies migrations up to target_version (default: all).
+    A fully set-up database is stamped with PRAGMA user_version, so later calls
+    (every CLI start, every app process) cost one header read instead of a write
+    transaction over the whole schema.
+    """
+    if target_version is None and _schema_stamp(get_conn()) == _SCHEMA_STAMP:
+        return
+    with transaction() as conn:
+        cur = conn.cursor()
 
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS counters (
-        key TEXT PRIMARY KEY,
-        value INTEGER NOT NULL
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS clients (
+            client_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            email TEXT,
+            address TEXT
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            invoice_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT NOT NULL UNIQUE,
+            client_id INTEGER NOT NULL,
+            issue_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            notes TEXT,
+            tax_rate REAL NOT NULL DEFAULT 0.0,
+            status TEXT NOT NULL DEFAULT 'Unpaid',
+            pdf_path TEXT,
+            FOREIGN KEY (client_id) REFERENCES clients(client_id)
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS invoice_items (
+            item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            qty REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            category TEXT NOT NULL,  -- labor/material/misc
+            FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id)
+        )
+        """)
+
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS counters (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """)
+        # Per-year invoice counters (invoice_seq_<year>) are created on first use
+
+        migrate(conn, target_version)
+        if conn.execute("SELECT 1 FROM counters WHERE key=?", (_BULK_LOAD_KEY,)).fetchone():
+            # A bulk load died before end_bulk_load(); put the derived data back
+            _restore_after_bulk_load(conn)
+        if target_version is None:
+            conn.execute(f"PRAGMA user_version={_SCHEMA_STAMP}")
+
+
+def _schema_stamp(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+# ---- Schema migrations ----
+# Ordered, append-only. Each entry is (version, description, statements) and runs
+# once, inside the caller's transaction, on databases below that version.
+# The CREATE TABLE statements in init_db() are the implicit version 0.
+
+# Keep clients_fts (an external-content FTS5 table) in step with clients
+CLIENTS_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts(rowid, name, email, phone, address)
+        VALUES (new.client_id, new.name, new.email, new.phone, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO clients_fts(clients_fts, rowid, name, email, phone, address)
+        VALUES ('delete', old.client_id, old.name, old.email, old.phone, old.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE ON clients BEGIN
+        INSERT INTO clients_fts(clients_fts, rowid, name, email, phone, address)
+        VALUES ('delete', old.client_id, old.name, old.email, old.phone, old.address);
+        INSERT INTO clients_fts(rowid, name, email, phone, address)
+        VALUES (new.client_id, new.name, new.email, new.phone, new.address);
+    END
+    """,
+]
+
+# revenue_summary rows computed directly from invoices + invoice_items. Used to
+# backfill the table and by reports.check_consistency() to verify the triggers.
+REVENUE_FROM_SCRATCH = """
+    SELECT substr(i.issue_date, 1, 7), i.client_id, it.category, i.status,
+           SUM(it.qty * it.unit_price), SUM(it.qty * it.unit_price * i.tax_rate)
+    FROM invoice_items it JOIN invoices i ON i.invoice_id = it.invoice_id
+    GROUP BY 1, 2, 3, 4
+"""
+
+_REVENUE_UPSERT = """
+    ON CONFLICT(period, client_id, category, status)
+    DO UPDATE SET amount = amount + excluded.amount, tax = tax + excluded.tax
+"""
+
+# Apply each item/invoice change to revenue_summary as a +/- delta
+REVENUE_SUMMARY_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS revenue_items_ai AFTER INSERT ON invoice_items BEGIN
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(i.issue_date, 1, 7), i.client_id, new.category, i.status,
+               new.qty * new.unit_price, new.qty * new.unit_price * i.tax_rate
+        FROM invoices i WHERE i.invoice_id = new.invoice_id
+        {_REVENUE_UPSERT};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS revenue_items_ad AFTER DELETE ON invoice_items BEGIN
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(i.issue_date, 1, 7), i.client_id, old.category, i.status,
+               -(old.qty * old.unit_price), -(old.qty * old.unit_price * i.tax_rate)
+        FROM invoices i WHERE i.invoice_id = old.invoice_id
+        {_REVENUE_UPSERT};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS revenue_items_au
+    AFTER UPDATE OF invoice_id, qty, unit_price, category ON invoice_items BEGIN
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(i.issue_date, 1, 7), i.client_id, old.category, i.status,
+               -(old.qty * old.unit_price), -(old.qty * old.unit_price * i.tax_rate)
+        FROM invoices i WHERE i.invoice_id = old.invoice_id
+        {_REVENUE_UPSERT};
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(i.issue_date, 1, 7), i.client_id, new.category, i.status,
+               new.qty * new.unit_price, new.qty * new.unit_price * i.tax_rate
+        FROM invoices i WHERE i.invoice_id = new.invoice_id
+        {_REVENUE_UPSERT};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS revenue_invoices_au
+    AFTER UPDATE OF client_id, issue_date, status, tax_rate ON invoices BEGIN
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(old.issue_date, 1, 7), old.client_id, it.category, old.status,
+               -SUM(it.qty * it.unit_price), -SUM(it.qty * it.unit_price * old.tax_rate)
+        FROM invoice_items it WHERE it.invoice_id = old.invoice_id
+        GROUP BY it.category
+        {_REVENUE_UPSERT};
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(new.issue_date, 1, 7), new.client_id, it.category, new.status,
+               SUM(it.qty * it.unit_price), SUM(it.qty * it.unit_price * new.tax_rate)
+        FROM invoice_items it WHERE it.invoice_id = new.invoice_id
+        GROUP BY it.category
+        {_REVENUE_UPSERT};
+    END
+    """,
+]
+
+def _totals_delta(invoice_id: str, delta: str) -> str:
+    return f"""
+        UPDATE invoices SET
+            subtotal = subtotal + {delta},
+            tax = (subtotal + {delta}) * tax_rate,
+            total = (subtotal + {delta}) * (1 + tax_rate)
+        WHERE invoice_id = {invoice_id};
+    """
+
+# Keep invoices.subtotal/tax/total equal to their items
+INVOICE_TOTALS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS invoice_totals_ai AFTER INSERT ON invoice_items BEGIN
+        {_totals_delta("new.invoice_id", "new.qty * new.unit_price")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS invoice_totals_ad AFTER DELETE ON invoice_items BEGIN
+        {_totals_delta("old.invoice_id", "-(old.qty * old.unit_price)")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS invoice_totals_au
+    AFTER UPDATE OF invoice_id, qty, unit_price ON invoice_items BEGIN
+        {_totals_delta("old.invoice_id", "-(old.qty * old.unit_price)")}
+        {_totals_delta("new.invoice_id", "new.qty * new.unit_price")}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS invoice_totals_tax_rate AFTER UPDATE OF tax_rate ON invoices BEGIN
+        UPDATE invoices SET tax = subtotal * new.tax_rate, total = subtotal * (1 + new.tax_rate)
+        WHERE invoice_id = new.invoice_id;
+    END
+    """,
+]
+
+SECONDARY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice ON invoice_items(invoice_id, item_id)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_client_date ON invoices(client_id, issue_date)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_status_date ON invoices(status, issue_date)",
+    "CREATE INDEX IF NOT EXISTS idx_invoices_issue_date ON invoices(issue_date)",
+    "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)",
+]
+
+# Added after migration 4 shipped with the list above, so it has its own
+# migration (8) rather than joining that list
+REVENUE_INVOICE_DELETE_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS revenue_invoices_ad AFTER DELETE ON invoices BEGIN
+        INSERT INTO revenue_summary(period, client_id, category, status, amount, tax)
+        SELECT substr(old.issue_date, 1, 7), old.client_id, it.category, old.status,
+               -SUM(it.qty * it.unit_price), -SUM(it.qty * it.unit_price * old.tax_rate)
+        FROM invoice_items it WHERE it.invoice_id = old.invoice_id
+        GROUP BY it.category
+        {_REVENUE_UPSERT};
+    END
+"""
+
+RECOMPUTE_INVOICE_TOTALS = [
+    """
+    UPDATE invoices SET subtotal = COALESCE(
+        (SELECT SUM(qty * unit_price) FROM invoice_items it WHERE it.invoice_id = invoices.invoice_id), 0.0)
+    """,
+    "UPDATE invoices SET tax = subtotal * tax_rate, total = subtotal * (1 + tax_rate)",
+]
+
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "indexes for invoice, client, status and date lookups", SECONDARY_INDEXES),
+    (2, "content hash of the inputs each PDF was rendered from", [
+        "ALTER TABLE invoices ADD COLUMN pdf_hash TEXT",
+    ]),
+    (3, "trigram full-text index over client name, email, phone and address", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+            name, email, phone, address,
+            content='clients', content_rowid='client_id', tokenize='trigram'
+        )
+        """,
+        *CLIENTS_FTS_TRIGGERS,
+        "INSERT INTO clients_fts(clients_fts) VALUES ('rebuild')",
+    ]),
+    (4, "incrementally maintained revenue summary by month, client, category and status", [
+        """
+        CREATE TABLE IF NOT EXISTS revenue_summary (
+            period TEXT NOT NULL,         -- YYYY-MM of the invoice issue_date
+            client_id INTEGER NOT NULL,
+            category TEXT NOT NULL,       -- labor/material/misc
+            status TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0.0,   -- sum of qty * unit_price
+            tax REAL NOT NULL DEFAULT 0.0,      -- amount * the invoice's tax_rate
+            PRIMARY KEY (period, client_id, category, status)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_revenue_client ON revenue_summary(client_id, period)",
+        *REVENUE_SUMMARY_TRIGGERS,
+        f"INSERT INTO revenue_summary(period, client_id, category, status, amount, tax) {REVENUE_FROM_SCRATCH}",
+    ]),
+    (5, "stored subtotal/tax/total on invoices, kept current by triggers", [
+        "ALTER TABLE invoices ADD COLUMN subtotal REAL NOT NULL DEFAULT 0.0",
+        "ALTER TABLE invoices ADD COLUMN tax REAL NOT NULL DEFAULT 0.0",
+        "ALTER TABLE invoices ADD COLUMN total REAL NOT NULL DEFAULT 0.0",
+        *RECOMPUTE_INVOICE_TOTALS,
+        *INVOICE_TOTALS_TRIGGERS,
+    ]),
+    (6, "source-system reference on clients so bulk imports can be re-run", [
+        "ALTER TABLE clients ADD COLUMN external_ref TEXT",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_clients_external_ref
+        ON clients(external_ref) WHERE external_ref IS NOT NULL
+        """,
+    ]),
+    (7, "persistent queue of background PDF render jobs", [
+        """
+        CREATE TABLE IF NOT EXISTS pdf_jobs (
+            job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',  -- queued/running/done/failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after REAL NOT NULL DEFAULT 0,      -- unix time: retry delay, or lease end while running
+            pdf_path TEXT,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT NOT NULL DEFAULT (datetime('now')),
+            FOREIGN KEY (invoice_id) REFERENCES invoices(invoice_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_pdf_jobs_due ON pdf_jobs(status, run_after)",
+        "CREATE INDEX IF NOT EXISTS idx_pdf_jobs_invoice ON pdf_jobs(invoice_id, status)",
+    ]),
+    (8, "revenue summary follows invoice deletes", [
+        REVENUE_INVOICE_DELETE_TRIGGER,
+        # Invoices deleted before this trigger existed left their revenue behind
+        "DELETE FROM revenue_summary",
+        f"INSERT INTO revenue_summary(period, client_id, category, status, amount, tax) {REVENUE_FROM_SCRATCH}",
+    ]),
+]
+
+# init_db()'s PRAGMA user_version marker for "all migrations applied, no bulk load pending"
+_SCHEMA_STAMP = MIGRATIONS[-1][0]
+
+def schema_version(conn: Optional[sqlite3.Connection] = None) -> int:
+    conn = conn or get_conn()
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TEXT NOT NULL DEFAULT (datetime('now'))
     )
     """)
+    row = conn.execute("SELECT COALESCE(MAX(version), 0) AS v FROM schema_version").fetchone()
+    return int(row["v"])
 
-    # Initialize invoice counter if missing
-    cur.execute("INSERT OR IGNORE INTO counters(key, value) VALUES('invoice_seq', 0)")
-
-    conn.commit()
-    conn.close()
+def migrate(conn: sqlite3.Connection, target: Optional[int] = None) -> int:
+    """
+    Applies pending migrations up to `target` (default: latest) and returns the
+    resulting schema version. Call inside transaction().
+    """
+    current = schema_version(conn)
+    for version, description, statements in MIGRATIONS:
+        if version <= current or (target is not None and version > target):
+            continue
+        for sql in statements:
+            conn.execute(sql)
+        conn.execute(
+            "INSERT INTO schema_version(version, description) VALUES (?, ?)",
+            (version, description),
+        )
+        current = version
+    return current
 
 def create_client(name: str, phone: str, email: str, address: str) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO clients(name, phone, email, address) VALUES (?, ?, ?, ?)",
-        (name, phone, email, address),
-    )
-    conn.commit()
-    client_id = cur.lastrowid
+    with transaction() as conn:
+        cur = conn.execute(
+            "INSERT INTO clients(name, phone, email, address) VALUES (?, ?, ?, ?)",
+            (name, phone, email, address),
+        )
+        client_id = cur.lastrowid
     if client_id is None:
-        conn.close()
         raise RuntimeError("Failed to obtain last row id from INSERT")
-    conn.close()
     return int(client_id)
 
 def list_clients() -> List[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    rows = cur.execute("SELECT * FROM clients ORDER BY name").fetchall()
-    conn.close()
+    rows = get_conn().execute("SELECT * FROM clients ORDER BY name").fetchall()
     return [dict(r) for r in rows]
 
 def get_client(client_id: int) -> Optional[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    row = cur.execute("SELECT * FROM clients WHERE client_id=?", (client_id,)).fetchone()
-    conn.close()
+    row = get_conn().execute("SELECT * FROM clients WHERE client_id=?", (client_id,)).fetchone()
     return dict(row) if row else None
 
+# Trigram tokens are 3 characters; shorter queries fall back to a prefix match
+_MIN_FTS_QUERY = 3
+
+def search_clients(
+    query: str = "",
+    limit: int = 25,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    One page of clients ordered by (name, client_id), optionally filtered by a
+    substring of name/email/phone/address. For the next page pass the last row's
+    (name, client_id) as `after` (keyset pagination, so every page costs the same).
+    """
+    query = (query or "").strip()
+    after_name, after_id = after if after is not None else ("", 0)
+    conn = get_conn()
+    if not query:
+        rows = conn.execute("""
+            SELECT * FROM clients
+            WHERE (name, client_id) > (?, ?)
+            ORDER BY name, client_id LIMIT ?
+        """, (after_name, after_id, limit)).fetchall()
+    elif len(query) < _MIN_FTS_QUERY:
+        like = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = conn.execute("""
+            SELECT * FROM clients
+            WHERE (name LIKE ? ESCAPE '\\' OR email LIKE ? ESCAPE '\\' OR phone LIKE ? ESCAPE '\\')
+              AND (name, client_id) > (?, ?)
+            ORDER BY name, client_id LIMIT ?
+        """, (like, like, like, after_name, after_id, limit)).fetchall()
+    else:
+        # Quote as one FTS phrase: a plain substring match, no query syntax
+        phrase = '"' + query.replace('"', '""') + '"'
+        rows = conn.execute("""
+            SELECT c.* FROM clients_fts f
+            JOIN clients c ON c.client_id = f.rowid
+            WHERE clients_fts MATCH ? AND (c.name, c.client_id) > (?, ?)
+            ORDER BY c.name, c.client_id LIMIT ?
+        """, (phrase, after_name, after_id, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+def list_invoices(client_id: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """Most recent invoices first, optionally only one client's."""
+    if client_id is None:
+        rows = get_conn().execute(
+            "SELECT * FROM invoices ORDER BY issue_date DESC, invoice_id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    else:
+        rows = get_conn().execute(
+            "SELECT * FROM invoices WHERE client_id=? ORDER BY issue_date DESC, invoice_id DESC LIMIT ?",
+            (client_id, limit),
+        ).fetchall()
+    return [dict(r) for r in rows]
+
+def list_invoices_page(
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    limit: int = 50,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    One page of invoices (newest first) with their stored totals and client name,
+    without touching invoice_items. For the next page pass the last row's
+    (issue_date, invoice_id) as `after`.
+    """
+    where = []
+    params: List[Any] = []
+    if status:
+        where.append("i.status = ?")
+        params.append(status)
+    if client_id is not None:
+        where.append("i.client_id = ?")
+        params.append(client_id)
+    if date_from:
+        where.append("i.issue_date >= ?")
+        params.append(str(date_from))
+    if date_to:
+        where.append("i.issue_date <= ?")
+        params.append(str(date_to))
+    if after is not None:
+        where.append("(i.issue_date, i.invoice_id) < (?, ?)")
+        params.extend(after)
+    sql = """
+        SELECT i.invoice_id, i.invoice_number, i.client_id, c.name AS client_name,
+               i.issue_date, i.due_date, i.status, i.subtotal, i.tax, i.total, i.pdf_path
+        FROM invoices i JOIN clients c ON c.client_id = i.client_id
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY i.issue_date DESC, i.invoice_id DESC LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in get_conn().execute(sql, params).fetchall()]
+
+def get_invoice_items(invoice_id: int) -> List[Dict[str, Any]]:
+    rows = get_conn().execute(
+        "SELECT * FROM invoice_items WHERE invoice_id=? ORDER BY item_id", (invoice_id,)
+    ).fetchall()
+    return [dict(r) for r in rows]
+
 def next_invoice_number(year: int) -> str:
     """
     Generates invoice numbers like 2026-00001.
-    Counter increments globally; format includes current year for readability.
+    Each year has its own sequence. Prefer create_invoice_with_items(), which
+    allocates the number inside the invoice insert so a failed insert can't burn it.
     """
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE counters SET value = value + 1 WHERE key='invoice_seq'")
-    cur.execute("SELECT value FROM counters WHERE key='invoice_seq'")
-    seq = cur.fetchone()["value"]
-    conn.commit()
-    conn.close()
+    reserved = _take_reserved_number(year)
+    if reserved is not None:
+        return _format_invoice_number(year, reserved)
+    with transaction() as conn:
+        return _allocate_invoice_number(conn, year)
+
+def _format_invoice_number(year: int, seq: int) -> str:
     return f"{year}-{seq:05d}"
 
+def _bump_year_counter(conn: sqlite3.Connection, year: int, count: int) -> int:
+    """
+    Advances the year's counter by `count` and returns its new value.
+    Must run inside transaction(). A year seen for the first time is seeded from
+    the highest existing invoice number for that year.
+    """
+    key = f"invoice_seq_{year}"
+    bump = "UPDATE counters SET value = value + ? WHERE key=? RETURNING value"
+    row = conn.execute(bump, (count, key)).fetchone()
+    if row is None:
+        # Only on a year's first allocation: the seed scans that year's invoice numbers
+        conn.execute("""
+            INSERT INTO counters(key, value)
+            SELECT ?, COALESCE(MAX(CAST(substr(invoice_number, 6) AS INTEGER)), 0)
+            FROM invoices WHERE invoice_number LIKE ?
+        """, (key, f"{year}-%"))
+        row = conn.execute(bump, (count, key)).fetchone()
+    return int(row["value"])
+
+def _allocate_invoice_number(conn: sqlite3.Connection, year: int) -> str:
+    return _format_invoice_number(year, _bump_year_counter(conn, year, 1))
+
+
+# ---- Optional block reservation (high-throughput batch runs) ----
+# When enabled, each process grabs `block_size` numbers per year in one short
+# transaction of its own and hands them out locally. A block is never refilled
+# inside a caller's transaction (its rollback would undo the reservation); that
+# number is allocated in the caller's transaction instead. Numbers still never repeat, but they
+# are no longer strictly in creation order across processes, and unused numbers
+# become gaps unless release_invoice_numbers() can hand them back.
+
+_block_lock = threading.Lock()
+_block_size = 0
+_blocks: Dict[int, List[int]] = {}    # year -> [next_seq, end_seq] (inclusive)
+_blocks_pid = os.getpid()
+
+def set_invoice_number_block_size(block_size: int) -> None:
+    """Enables per-process block reservation (block_size > 1) or turns it off (0 or 1)."""
+    global _block_size
+    if block_size < 0:
+        raise ValueError("block_size must be >= 0")
+    release_invoice_numbers()
+    _block_size = block_size
+
+def _take_reserved_number(year: int) -> Optional[int]:
+    global _blocks_pid
+    if _block_size <= 1:
+        return None
+    with _block_lock:
+        if _blocks_pid != os.getpid():
+            # Forked child: the parent's block isn't ours to use
+            _blocks.clear()
+            _blocks_pid = os.getpid()
+        block = _blocks.get(year)
+        if block is None or block[0] > block[1]:
+            if getattr(_local, "depth", 0):
+                # A refill here would join the caller's transaction, and its rollback
+                # would undo the reservation while the block still handed the numbers
+                # out. Let the caller allocate this one number in its own transaction.
+                return None
+            # Reserve in its own short transaction, committed before any number is used
+            with transaction() as conn:
+                end = _bump_year_counter(conn, year, _block_size)
+            block = _blocks[year] = [end - _block_size + 1, end]
+        seq = block[0]
+        block[0] += 1
+        return seq
+
+def _return_reserved_number(year: int, seq: int) -> None:
+    """Puts back a number whose invoice insert failed, if it was the last one handed out."""
+    with _block_lock:
+        block = _blocks.get(year)
+        if block is not None and block[0] == seq + 1:
+            block[0] = seq
+
+def release_invoice_numbers() -> None:
+    """
+    Gives unused reserved numbers back to the database when nobody has reserved
+    past them since; otherwise they are left as gaps.
+    """
+    with _block_lock:
+        if _blocks_pid == os.getpid():
+            for year, (next_seq, end) in _blocks.items():
+                if next_seq > end:
+                    continue
+                with transaction() as conn:
+                    conn.execute(
+                        "UPDATE counters SET value=? WHERE key=? AND value=?",
+                        (next_seq - 1, f"invoice_seq_{year}", end),
+                    )
+        _blocks.clear()
+
 def create_invoice(invoice_number: str, client_id: int, issue_date: str, due_date: str, notes: str, tax_rate: float) -> int:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO invoices(invoice_number, client_id, issue_date, due_date, notes, tax_rate)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (invoice_number, client_id, issue_date, due_date, notes, tax_rate))
-    conn.commit()
-    invoice_id = cur.lastrowid
-    conn.close()
+    with transaction() as conn:
+        cur = conn.execute("""
+            INSERT INTO invoices(invoice_number, client_id, issue_date, due_date, notes, tax_rate)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (invoice_number, client_id, issue_date, due_date, notes, tax_rate))
+        invoice_id = cur.lastrowid
     assert invoice_id is not None, "Failed to insert invoice"
     return invoice_id
 
 def add_item(invoice_id: int, description: str, qty: float, unit_price: float, category: str) -> None:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
-        VALUES (?, ?, ?, ?, ?)
-    """, (invoice_id, description, qty, unit_price, category))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
+            VALUES (?, ?, ?, ?, ?)
+        """, (invoice_id, description, qty, unit_price, category))
+
+def create_invoice_with_items(
+    client_id: int,
+    issue_date: str,
+    due_date: str,
+    notes: str,
+    tax_rate: float,
+    items: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Allocates the invoice number, inserts the header and all line items in one
+    transaction, and returns the same shape as get_invoice_with_items().
+    Each item needs description, qty, unit_price and category.
+    """
+    year = int(str(issue_date)[:4])
+    reserved = _take_reserved_number(year)
+    try:
+        data = _insert_invoice_with_items(client_id, issue_date, due_date, notes, tax_rate, items, year, reserved)
+    except BaseException:
+        if reserved is not None:
+            _return_reserved_number(year, reserved)
+        raise
+    return data
+
+def _insert_invoice_with_items(
+    client_id: int,
+    issue_date: str,
+    due_date: str,
+    notes: str,
+    tax_rate: float,
+    items: List[Dict[str, Any]],
+    year: int,
+    reserved: Optional[int],
+) -> Dict[str, Any]:
+    with transaction() as conn:
+        client = conn.execute("SELECT * FROM clients WHERE client_id=?", (client_id,)).fetchone()
+        if client is None:
+            raise ValueError(f"Unknown client_id: {client_id}")
+        if reserved is not None:
+            invoice_number = _format_invoice_number(year, reserved)
+        else:
+            # Same transaction as the insert: a failed insert rolls the counter back too
+            invoice_number = _allocate_invoice_number(conn, year)
+        inv = conn.execute("""
+            INSERT INTO invoices(invoice_number, client_id, issue_date, due_date, notes, tax_rate)
+            VALUES (?, ?, ?, ?, ?, ?)
+            RETURNING *
+        """, (invoice_number, client_id, str(issue_date), str(due_date), notes, tax_rate)).fetchone()
+        invoice_id = inv["invoice_id"]
+
+        rows = [
+            (invoice_id, it["description"], float(it["qty"]), float(it["unit_price"]), it["category"])
+            for it in items
+        ]
+        conn.executemany("""
+            INSERT INTO invoice_items(invoice_id, description, qty, unit_price, category)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+        # We hold the write lock, so the batch got consecutive ids ending at last_insert_rowid()
+        last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        # The item triggers just filled in the stored totals
+        totals = conn.execute(
+            "SELECT subtotal, tax, total FROM invoices WHERE invoice_id=?", (invoice_id,)
+        ).fetchone()
+
+    return {
+        "invoice": {**dict(inv), **dict(totals)},
+        "client": dict(client),
+        "items": [
+            {
+                "item_id": first_id + i,
+                "invoice_id": invoice_id,
+                "description": r[1],
+                "qty": r[2],
+                "unit_price": r[3],
+                "category": r[4],
+            }
+            for i, r in enumerate(rows)
+        ],
+    }
 
 def get_invoice_with_items(invoice_id: int) -> Dict[str, Any]:
     conn = get_conn()
-    cur = conn.cursor()
-    inv = cur.execute("SELECT * FROM invoices WHERE invoice_id=?", (invoice_id,)).fetchone()
-    items = cur.execute("SELECT * FROM invoice_items WHERE invoice_id=? ORDER BY item_id", (invoice_id,)).fetchall()
-    client = cur.execute("SELECT * FROM clients WHERE client_id=?", (inv["client_id"],)).fetchone()
-    conn.close()
+    inv = conn.execute("SELECT * FROM invoices WHERE invoice_id=?", (invoice_id,)).fetchone()
+    items = conn.execute("SELECT * FROM invoice_items WHERE invoice_id=? ORDER BY item_id", (invoice_id,)).fetchall()
+    client = conn.execute("SELECT * FROM clients WHERE client_id=?", (inv["client_id"],)).fetchone()
     return {
         "invoice": dict(inv),
         "client": dict(client),
         "items": [dict(r) for r in items],
     }
 
-def set_invoice_pdf_path(invoice_id: int, pdf_path: str) -> None:
+def set_invoice_pdf_path(invoice_id: int, pdf_path: str, pdf_hash: Optional[str] = None) -> None:
+    """
+    Records where the PDF was written and, if given, the content hash it was
+    rendered from. Without a hash the stored one is left as it is.
+    """
+    with transaction() as conn:
+        if pdf_hash is None:
+            conn.execute("UPDATE invoices SET pdf_path=? WHERE invoice_id=?", (pdf_path, invoice_id))
+        else:
+            conn.execute("UPDATE invoices SET pdf_path=?, pdf_hash=? WHERE invoice_id=?", (pdf_path, pdf_hash, invoice_id))
+
+def set_invoice_status(invoice_id: int, status: str) -> None:
+    with transaction() as conn:
+        conn.execute("UPDATE invoices SET status=? WHERE invoice_id=?", (status, invoice_id))
+
+def list_pdf_paths() -> List[str]:
+    """Every pdf_path currently referenced by an invoice."""
+    rows = get_conn().execute("SELECT pdf_path FROM invoices WHERE pdf_path IS NOT NULL").fetchall()
+    return [r["pdf_path"] for r in rows]
+
+# ---- Bulk helpers (batch rendering) ----
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lists
+_IN_CHUNK = 500
+
+def find_invoice_ids(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    status: Optional[str] = None,
+) -> List[int]:
+    """Invoice ids issued within [date_from, date_to] (inclusive) and/or with a status."""
+    where = []
+    params: List[Any] = []
+    if date_from:
+        where.append("issue_date >= ?")
+        params.append(str(date_from))
+    if date_to:
+        where.append("issue_date <= ?")
+        params.append(str(date_to))
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    sql = "SELECT invoice_id FROM invoices"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY invoice_id"
+    return [r["invoice_id"] for r in get_conn().execute(sql, params).fetchall()]
+
+def get_invoices_with_items(invoice_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Bulk version of get_invoice_with_items(): three queries per chunk of ids
+    instead of three per invoice. Unknown ids are skipped; order follows invoice_ids.
+    """
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE invoices SET pdf_path=? WHERE invoice_id=?", (pdf_path, invoice_id))
-    conn.commit()
-    conn.close()
+    out: Dict[int, Dict[str, Any]] = {}
+    for start in range(0, len(invoice_ids), _IN_CHUNK):
+        chunk = list(invoice_ids[start:start + _IN_CHUNK])
+        marks = ",".join("?" * len(chunk))
+        invoices = conn.execute(f"SELECT * FROM invoices WHERE invoice_id IN ({marks})", chunk).fetchall()
+        client_ids = sorted({r["client_id"] for r in invoices})
+        clients = {}
+        if client_ids:
+            cmarks = ",".join("?" * len(client_ids))
+            clients = {
+                r["client_id"]: dict(r)
+                for r in conn.execute(f"SELECT * FROM clients WHERE client_id IN ({cmarks})", client_ids)
+            }
+        for r in invoices:
+            out[r["invoice_id"]] = {"invoice": dict(r), "client": clients[r["client_id"]], "items": []}
+        items = conn.execute(
+            f"SELECT * FROM invoice_items WHERE invoice_id IN ({marks}) ORDER BY invoice_id, item_id", chunk
+        )
+        for r in items:
+            out[r["invoice_id"]]["items"].append(dict(r))
+    return [out[i] for i in invoice_ids if i in out]
+
+def set_invoice_pdf_paths(paths: List[Tuple[int, str, Optional[str]]]) -> None:
+    """Bulk set_invoice_pdf_path() for (invoice_id, pdf_path, pdf_hash) tuples, in one transaction."""
+    with transaction() as conn:
+        conn.executemany(
+            "UPDATE invoices SET pdf_path=?, pdf_hash=? WHERE invoice_id=?",
+            [(path, pdf_hash, invoice_id) for invoice_id, path, pdf_hash in paths],
+        )
+
+
+# ---- Bulk loading ----
+# Large imports run much faster without the per-row FTS/summary/totals triggers
+# and secondary index updates. begin_bulk_load() drops them; end_bulk_load()
+# recreates them and rebuilds the derived data from scratch, which also covers
+# any rows the app wrote in between. The marker row lets init_db() finish the
+# job if the importing process dies first.
+
+_BULK_LOAD_KEY = "bulk_load_active"
+_BULK_TRIGGERS = (
+    CLIENTS_FTS_TRIGGERS + REVENUE_SUMMARY_TRIGGERS + [REVENUE_INVOICE_DELETE_TRIGGER] + INVOICE_TOTALS_TRIGGERS
+)
+
+def _object_name(create_sql: str) -> Tuple[str, str]:
+    # "CREATE [UNIQUE] INDEX|TRIGGER IF NOT EXISTS <name> ..." -> (kind, name)
+    words = create_sql.split()
+    i = words.index("EXISTS")
+    return words[i - 3], words[i + 1]
+
+def begin_bulk_load() -> None:
+    """Drops derived-data triggers and secondary indexes ahead of a large import."""
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO counters(key, value) VALUES (?, 1)
+            ON CONFLICT(key) DO UPDATE SET value = 1
+        """, (_BULK_LOAD_KEY,))
+        # Clear the stamp so init_db() looks for the marker again
+        conn.execute("PRAGMA user_version=0")
+        for sql in _BULK_TRIGGERS + SECONDARY_INDEXES:
+            kind, name = _object_name(sql)
+            conn.execute(f"DROP {kind} IF EXISTS {name}")
+
+def end_bulk_load() -> None:
+    """Recreates what begin_bulk_load() dropped and rebuilds FTS, summaries and totals."""
+    with transaction() as conn:
+        _restore_after_bulk_load(conn)
+        conn.execute(f"PRAGMA user_version={_SCHEMA_STAMP}")
+
+def _restore_after_bulk_load(conn: sqlite3.Connection) -> None:
+    # Indexes first: the totals recompute looks up items by invoice_id
+    for sql in SECONDARY_INDEXES:
+        conn.execute(sql)
+    for sql in RECOMPUTE_INVOICE_TOTALS:
+        conn.execute(sql)
+    conn.execute("INSERT INTO clients_fts(clients_fts) VALUES ('rebuild')")
+    conn.execute("DELETE FROM revenue_summary")
+    conn.execute(
+        f"INSERT INTO revenue_summary(period, client_id, category, status, amount, tax) {REVENUE_FROM_SCRATCH}"
+    )
+    for sql in _BULK_TRIGGERS:
+        conn.execute(sql)
+    _catch_up_invoice_counters(conn)
+    conn.execute("DELETE FROM counters WHERE key=?", (_BULK_LOAD_KEY,))
+
+def _catch_up_invoice_counters(conn: sqlite3.Connection) -> None:
+    # Imported invoice numbers may be ahead of existing per-year counters
+    conn.execute("""
+        UPDATE counters SET value = MAX(value, COALESCE((
+            SELECT MAX(CAST(substr(invoice_number, 6) AS INTEGER)) FROM invoices
+            WHERE invoice_number LIKE substr(counters.key, 13) || '-%'
+        ), 0))
+        WHERE key LIKE 'invoice_seq_%'
+    """)
+
+def catch_up_invoice_counters() -> None:
+    """
+    Moves each per-year invoice counter past the highest number of that year in
+    the table, after invoices were inserted without going through the counter.
+    """
+    with transaction() as conn:
+        _catch_up_invoice_counters(conn)
+
+
+# Timed while metrics are enabled (see metrics.py); connection plumbing is left out
+metrics.instrument(globals(), [
+    "init_db", "schema_version", "migrate",
+    "create_client", "list_clients", "get_client", "search_clients",
+    "list_invoices", "list_invoices_page", "get_invoice_items", "next_invoice_number",
+    "release_invoice_numbers", "create_invoice", "add_item", "create_invoice_with_items",
+    "get_invoice_with_items", "set_invoice_pdf_path", "set_invoice_status", "list_pdf_paths",
+    "find_invoice_ids", "get_invoices_with_items", "set_invoice_pdf_paths",
+    "begin_bulk_load", "end_bulk_load", "catch_up_invoice_counters",
+], prefix="db")
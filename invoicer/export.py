@@ -0,0 +1,269 @@
+# export.py
+# Streams the invoice ledger (clients, invoices, invoice_items) out of SQLite
+# into columnar files for analytics tools, partitioned by invoice year:
+#
+#   <out>/invoices/year=2026/part-<run>-<first id>.parquet
+#   <out>/invoice_items/year=2026/part-<run>-<first id>.parquet
+#   <out>/clients/part-<run>-<first id>.parquet
+#
+# Parquet (zstd) needs pyarrow; without it --format auto falls back to gzip CSV.
+# Each run only exports rows added since the previous run into the same <out>
+# (id watermarks in <out>/_export_state.json), so rows edited after export are
+# not re-exported; use --full for a fresh snapshot.
+#
+#   python export.py exports/
+#   python export.py exports/ --format arrow --full
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import datetime as dt
+import gzip
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import db
+
+# pyarrow is optional (only parquet/arrow output needs it) and slow to import,
+# so it's loaded by resolve_format() rather than at module import
+pa: Any = None
+pq: Any = None
+
+
+def _load_pyarrow() -> bool:
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+# Rows pulled from the cursor and written per batch; bounds memory use
+CHUNK_ROWS = 50_000
+STATE_FILE = "_export_state.json"
+
+FORMATS = ("parquet", "arrow", "csv")
+
+# table -> (id column, SELECT (must expose the id column and a `year` column), columns)
+# Column types: int, str, float, date (ISO text in SQLite)
+TABLES: Dict[str, Tuple[str, str, List[Tuple[str, str]]]] = {
+    "clients": ("client_id", """
+        SELECT client_id, name, phone, email, address, NULL AS year
+        FROM clients WHERE client_id > ? ORDER BY client_id
+    """, [
+        ("client_id", "int"), ("name", "str"), ("phone", "str"), ("email", "str"), ("address", "str"),
+    ]),
+    "invoices": ("invoice_id", """
+        SELECT invoice_id, invoice_number, client_id, issue_date, due_date, notes, tax_rate,
+               status, subtotal, tax, total, pdf_path, substr(issue_date, 1, 4) AS year
+        FROM invoices WHERE invoice_id > ? ORDER BY invoice_id
+    """, [
+        ("invoice_id", "int"), ("invoice_number", "str"), ("client_id", "int"), ("issue_date", "date"),
+        ("due_date", "date"), ("notes", "str"), ("tax_rate", "float"), ("status", "str"),
+        ("subtotal", "float"), ("tax", "float"), ("total", "float"), ("pdf_path", "str"),
+    ]),
+    "invoice_items": ("item_id", """
+        SELECT it.item_id, it.invoice_id, it.description, it.qty, it.unit_price, it.category,
+               substr(i.issue_date, 1, 4) AS year
+        FROM invoice_items it JOIN invoices i ON i.invoice_id = it.invoice_id
+        WHERE it.item_id > ? ORDER BY it.item_id
+    """, [
+        ("item_id", "int"), ("invoice_id", "int"), ("description", "str"), ("qty", "float"),
+        ("unit_price", "float"), ("category", "str"),
+    ]),
+}
+
+
+def _arrow_type(kind: str) -> Any:
+    return {"int": pa.int64(), "str": pa.string(), "float": pa.float64(), "date": pa.date32()}[kind]
+
+
+def _parse_date(value: Optional[str]) -> Optional[dt.date]:
+    if not value:
+        return None
+    try:
+        return dt.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class _PartitionWriter:
+    """One open output file for a (table, partition); written chunk by chunk."""
+
+    def __init__(self, path: Path, fmt: str, columns: List[Tuple[str, str]]):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.fmt = fmt
+        self.columns = columns
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "csv":
+            self._fh = gzip.open(self.tmp_path, "wt", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._fh)
+            self._csv.writerow([name for name, _ in columns])
+        else:
+            self.schema = pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+            if fmt == "parquet":
+                self._writer = pq.ParquetWriter(str(self.tmp_path), self.schema, compression="zstd")
+            else:
+                self._sink = pa.OSFile(str(self.tmp_path), "wb")
+                self._writer = pa.ipc.new_file(
+                    self._sink, self.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+                )
+
+    def write(self, rows: List[Any]) -> None:
+        if self.fmt == "csv":
+            self._csv.writerows([tuple(r[name] for name, _ in self.columns) for r in rows])
+            return
+        data = {}
+        for name, kind in self.columns:
+            values = [r[name] for r in rows]
+            if kind == "date":
+                values = [_parse_date(v) for v in values]
+            data[name] = values
+        self._writer.write_batch(pa.RecordBatch.from_pydict(data, schema=self.schema))
+
+    def close(self) -> None:
+        if self.fmt == "csv":
+            self._fh.close()
+        else:
+            self._writer.close()
+            if self.fmt == "arrow":
+                self._sink.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        # The file is deleted either way, so a failure to close it doesn't matter
+        # (and mustn't hide the error that caused the abort)
+        with contextlib.suppress(Exception):
+            if self.fmt == "csv":
+                self._fh.close()
+            else:
+                self._writer.close()
+                if self.fmt == "arrow":
+                    self._sink.close()
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def _suffix(fmt: str) -> str:
+    return {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}[fmt]
+
+
+def resolve_format(fmt: str) -> str:
+    if fmt == "auto":
+        return "parquet" if _load_pyarrow() else "csv"
+    if fmt in ("parquet", "arrow") and not _load_pyarrow():
+        raise RuntimeError(f"--format {fmt} needs pyarrow (pip install pyarrow), or use --format csv")
+    return fmt
+
+
+def _load_state(out_dir: Path) -> Dict[str, int]:
+    path = out_dir / STATE_FILE
+    if path.exists():
+        return {k: int(v) for k, v in json.loads(path.read_text()).items()}
+    return {}
+
+
+def _save_state(out_dir: Path, state: Dict[str, int]) -> None:
+    tmp = out_dir / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2, sort_keys=True))
+    os.replace(tmp, out_dir / STATE_FILE)
+
+
+def export_ledger(
+    out_dir: str,
+    fmt: str = "auto",
+    full: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    """
+    Exports rows added since the last run into out_dir and advances the watermarks.
+    Returns the number of rows written per table. With full=True every row is
+    exported again regardless of the stored watermarks; point it at a fresh
+    directory, since part files from earlier runs are left in place.
+    """
+    fmt = resolve_format(fmt)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    state = {} if full else _load_state(out)
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+    counts: Dict[str, int] = {}
+    writers: Dict[Tuple[str, Optional[str]], _PartitionWriter] = {}
+    new_state = dict(state)
+
+    # One read transaction so all three tables come from the same WAL snapshot
+    # (plain BEGIN: readers don't block the app's writers)
+    try:
+        with db.snapshot() as conn:
+            for table, (id_col, sql, columns) in TABLES.items():
+                written = 0
+                last_id = start_id = state.get(table, 0)
+                # Iterating the cursor in fetchmany() chunks keeps only one chunk in memory
+                cur = conn.execute(sql, (last_id,))
+                while True:
+                    rows = cur.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    by_partition: Dict[Optional[str], List[Any]] = {}
+                    for r in rows:
+                        by_partition.setdefault(r["year"], []).append(r)
+                    for year, part_rows in by_partition.items():
+                        key = (table, year)
+                        if key not in writers:
+                            part_dir = out / table if year is None else out / table / f"year={year}"
+                            name = f"part-{run_id}-{start_id + 1}{_suffix(fmt)}"
+                            writers[key] = _PartitionWriter(part_dir / name, fmt, columns)
+                        writers[key].write(part_rows)
+                    written += len(rows)
+                    last_id = rows[-1][id_col]
+                    if progress:
+                        progress(table, written)
+                # Close this table's files before moving on so only one table's are open
+                for key in [k for k in writers if k[0] == table]:
+                    writer = writers.pop(key)
+                    try:
+                        writer.close()
+                    except BaseException:
+                        writer.abort()
+                        raise
+                counts[table] = written
+                new_state[table] = last_id
+    except BaseException:
+        for w in writers.values():
+            w.abort()
+        raise
+
+    _save_state(out, new_state)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export the invoice ledger to columnar files")
+    parser.add_argument("out_dir", help="export directory (also holds the incremental watermarks)")
+    parser.add_argument("--format", default="auto", choices=("auto",) + FORMATS,
+                        help="parquet/arrow need pyarrow; auto picks parquet if available, else csv")
+    parser.add_argument("--full", action="store_true", help="ignore watermarks and export everything")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    t0 = time.perf_counter()
+    counts = export_ledger(args.out_dir, args.format, args.full, args.chunk_rows)
+    elapsed = time.perf_counter() - t0
+    total = sum(counts.values())
+    print(", ".join(f"{table}: {n:,}" for table, n in counts.items()))
+    print(f"Exported {total:,} rows as {resolve_format(args.format)} in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,30 @@
 # invoice_pdf.py
 from __future__ import annotations
 
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from itertools import accumulate
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, BinaryIO, Callable, Deque, Iterator, Tuple
 
 from reportlab.lib.pagesizes import LETTER
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import Canvas
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+    BaseDocTemplate, SimpleDocTemplate, PageTemplate, Frame, Flowable, Paragraph, Spacer, Table,
+    TableStyle, Image
 )
 
-from settings import (
-    BUSINESS_NAME, BUSINESS_PHONE, BUSINESS_EMAIL, BUSINESS_ADDRESS_LINES,
-    LOGO_PATH, INVOICE_OUTPUT_DIR
-)
+import metrics
+import settings
 
 
 def money(x: float) -> str:
@@ -37,86 +46,259 @@ def _clean_lines(*lines: str) -> List[str]:
     return out
 
 
-def build_invoice_pdf(data: Dict[str, Any]) -> str:
-    inv = data["invoice"]
-    client = data["client"]
-    items = data["items"]
-
-    Path(INVOICE_OUTPUT_DIR).mkdir(exist_ok=True)
-    filename = f"invoice_{inv['invoice_number']}.pdf"
-    pdf_path = str(Path(INVOICE_OUTPUT_DIR) / filename)
-
-    doc = SimpleDocTemplate(
-        pdf_path,
-        pagesize=LETTER,
-        leftMargin=0.75 * inch,
-        rightMargin=0.75 * inch,
-        topMargin=0.75 * inch,
-        bottomMargin=0.75 * inch,
-        title=f"Invoice {inv['invoice_number']}"
+class InvoiceTemplate:
+    """
+    The static parts of an invoice (styles, decoded logo, business block), built
+    once from settings.py and reused across renders. Use get_template() rather
+    than constructing one directly.
+    """
+
+    def __init__(self, key: tuple | None = None):
+        self.key = key if key is not None else _template_key()
+
+        styles = getSampleStyleSheet()
+        normal = styles["BodyText"]
+        normal.fontName = "Helvetica"
+        normal.fontSize = 10
+        normal.leading = 12
+        self.normal = normal
+
+        self.small = ParagraphStyle(
+            "small",
+            parent=normal,
+            fontSize=9,
+            leading=11,
+            textColor=colors.grey
+        )
+
+        self.h1 = ParagraphStyle(
+            "h1",
+            parent=styles["Heading1"],
+            fontName="Helvetica-Bold",
+            fontSize=16,
+            leading=18,
+            spaceAfter=6
+        )
+
+        self.h2 = ParagraphStyle(
+            "h2",
+            parent=styles["Heading2"],
+            fontName="Helvetica-Bold",
+            fontSize=11,
+            leading=13,
+            spaceAfter=4
+        )
+
+        logo_file = Path(settings.LOGO_PATH)
+        if logo_file.exists():
+            self.logo = Image(_prepare_logo(logo_file), width=LOGO_SIZE, height=LOGO_SIZE)
+        else:
+            self.logo = Spacer(1, LOGO_SIZE)
+
+        biz_lines = _clean_lines(
+            settings.BUSINESS_NAME,
+            *settings.BUSINESS_ADDRESS_LINES,
+            settings.BUSINESS_PHONE,
+            settings.BUSINESS_EMAIL
+        )
+        self.biz_block = "<br/>".join([f"<b>{biz_lines[0]}</b>"] + biz_lines[1:]) if biz_lines else ""
+        # Parse the markup once; each render reuses the fragments
+        self.biz_frags = Paragraph(self.biz_block, normal).frags
+
+    def business_block(self) -> Table:
+        """Logo + business info, as a fresh Table around the cached pieces."""
+        biz_para = Paragraph(self.biz_block, self.normal, frags=self.biz_frags)
+        left_table = Table([[self.logo, biz_para]], colWidths=[1.1 * inch, 3.6 * inch])
+        left_table.setStyle(_LEFT_HEADER_STYLE)
+        return left_table
+
+
+LOGO_SIZE = 1.0 * inch
+# Resolution the logo is stored at in the PDF; plenty for print at 1 inch
+LOGO_DPI = 300
+
+
+def _prepare_logo(logo_file: Path) -> io.BytesIO:
+    """
+    Decodes the logo once and stores it the way ReportLab embeds it cheapest:
+    flattened onto the white page (no separate alpha mask) and downscaled to
+    LOGO_DPI at the printed size. Every render then embeds this smaller image.
+    """
+    from PIL import Image as PILImage  # ReportLab depends on Pillow
+
+    with PILImage.open(logo_file) as im:
+        im = im.convert("RGBA")
+        flat = PILImage.new("RGB", im.size, "white")
+        flat.paste(im, mask=im.getchannel("A"))
+    px = int(LOGO_SIZE / inch * LOGO_DPI)
+    if max(flat.size) > px:
+        flat.thumbnail((px, px), PILImage.LANCZOS)
+    buf = io.BytesIO()
+    flat.save(buf, format="PNG")
+    buf.seek(0)
+    return buf
+
+
+# Static table styles, shared by every render
+_LEFT_HEADER_STYLE = TableStyle([
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("LEFTPADDING", (0, 0), (-1, -1), 0),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+    ("TOPPADDING", (0, 0), (-1, -1), 0),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
+])
+
+_HEADER_STYLE = TableStyle([
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("ALIGN", (1, 0), (1, 0), "RIGHT"),
+    ("BOX", (1, 0), (1, 0), 1, colors.black),
+    ("LEFTPADDING", (0, 0), (-1, -1), 0),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+    ("TOPPADDING", (0, 0), (-1, -1), 0),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
+])
+
+_MARGIN = 0.75 * inch
+_ITEM_HEADER = ("Description", "Qty", "Unit", "Line Total")
+_ITEM_COL_WIDTHS = [4.4 * inch, 0.7 * inch, 0.9 * inch, 1.0 * inch]
+
+_ITEMS_STYLE = TableStyle([
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+    ("LINEBELOW", (0, 0), (-1, 0), 1, colors.black),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
+    ("LEFTPADDING", (0, 0), (-1, -1), 4),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+    ("TOPPADDING", (0, 0), (-1, -1), 4),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
+])
+
+_TOTALS_STYLE = TableStyle([
+    ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
+    ("FONTNAME", (0, 0), (-1, 1), "Helvetica"),
+    ("FONTNAME", (0, 2), (-1, 2), "Helvetica-Bold"),
+    ("LINEABOVE", (0, 0), (-1, 0), 1, colors.black),
+    ("TOPPADDING", (0, 0), (-1, -1), 4),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+])
+
+
+def _template_key() -> tuple:
+    """Everything the static template depends on; any change forces a rebuild."""
+    logo = Path(settings.LOGO_PATH)
+    try:
+        st = logo.stat()
+        logo_sig = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        logo_sig = None
+    return (
+        settings.BUSINESS_NAME,
+        settings.BUSINESS_PHONE,
+        settings.BUSINESS_EMAIL,
+        tuple(settings.BUSINESS_ADDRESS_LINES),
+        settings.LOGO_PATH,
+        logo_sig,
     )
 
-    styles = getSampleStyleSheet()
-    normal = styles["BodyText"]
-    normal.fontName = "Helvetica"
-    normal.fontSize = 10
-    normal.leading = 12
-
-    small = ParagraphStyle(
-        "small",
-        parent=normal,
-        fontSize=9,
-        leading=11,
-        textColor=colors.grey
-    )
 
-    h1 = ParagraphStyle(
-        "h1",
-        parent=styles["Heading1"],
-        fontName="Helvetica-Bold",
-        fontSize=16,
-        leading=18,
-        spaceAfter=6
-    )
+_template: InvoiceTemplate | None = None
+_template_lock = threading.Lock()
 
-    h2 = ParagraphStyle(
-        "h2",
-        parent=styles["Heading2"],
-        fontName="Helvetica-Bold",
-        fontSize=11,
-        leading=13,
-        spaceAfter=4
-    )
 
-    story = []
+def get_template() -> InvoiceTemplate:
+    """The process-wide template, rebuilt if settings.py values or the logo file changed."""
+    global _template
+    key = _template_key()
+    with _template_lock:
+        if _template is None or _template.key != key:
+            _template = InvoiceTemplate(key)
+        return _template
+
+
+def invoice_pdf_path(inv: Dict[str, Any]) -> str:
+    """Where an invoice's PDF lives under INVOICE_OUTPUT_DIR."""
+    return str(Path(settings.INVOICE_OUTPUT_DIR) / f"invoice_{inv['invoice_number']}.pdf")
+
+
+def build_invoice_pdf(data: Dict[str, Any], template: InvoiceTemplate | None = None) -> str:
+    """Renders the invoice into INVOICE_OUTPUT_DIR and returns the file path."""
+    pdf_path = invoice_pdf_path(data["invoice"])
+    with _atomic_file(pdf_path) as f:
+        render_invoice_pdf(data, f, template)
+    return pdf_path
+
+
+# Bump whenever the layout code below changes, so cached PDFs get re-rendered
+RENDER_VERSION = 3
+
+# The fields that actually reach the page; anything else can change without a re-render
+_HASHED_INVOICE_FIELDS = ("invoice_number", "issue_date", "due_date", "notes", "tax_rate")
+_HASHED_CLIENT_FIELDS = ("name", "address", "phone", "email")
+_HASHED_ITEM_FIELDS = ("description", "qty", "unit_price")
+
+
+def invoice_content_hash(data: Dict[str, Any], template: InvoiceTemplate | None = None) -> str:
+    """SHA-256 over everything a rendered PDF depends on: invoice, client, items and template."""
+    tpl = template or get_template()
+    payload = {
+        "render_version": RENDER_VERSION,
+        "template": repr(tpl.key),
+        "invoice": [data["invoice"].get(k) for k in _HASHED_INVOICE_FIELDS],
+        "client": [data["client"].get(k) for k in _HASHED_CLIENT_FIELDS],
+        "items": [[it.get(k) for k in _HASHED_ITEM_FIELDS] for it in data["items"]],
+    }
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def build_invoice_pdf_cached(data: Dict[str, Any], template: InvoiceTemplate | None = None) -> Tuple[str, str, bool]:
+    """
+    build_invoice_pdf() that skips rendering when the invoice's stored pdf_hash
+    matches its current content and the file at pdf_path still exists.
+    Returns (pdf_path, content_hash, rendered); store the hash with the path.
+    """
+    tpl = template or get_template()
+    inv = data["invoice"]
+    content_hash = invoice_content_hash(data, tpl)
+    existing = inv.get("pdf_path")
+    if existing:
+        # Older rows store pdf_path relative to the package folder, not the working directory
+        existing_file = settings.BASE_DIR / existing
+        if inv.get("pdf_hash") == content_hash and existing_file.is_file():
+            return str(existing_file), content_hash, False
+    return build_invoice_pdf(data, tpl), content_hash, True
+
+
+def render_invoice_pdf_bytes(data: Dict[str, Any], template: InvoiceTemplate | None = None) -> bytes:
+    """Renders the invoice entirely in memory and returns the PDF bytes."""
+    buf = io.BytesIO()
+    render_invoice_pdf(data, buf, template)
+    return buf.getvalue()
+
+
+@contextmanager
+def _atomic_file(path: str) -> Iterator[BinaryIO]:
+    """Write to a temp file next to `path` and rename it into place on success."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def _intro_story(inv: Dict[str, Any], client: Dict[str, Any], tpl: InvoiceTemplate) -> List[Any]:
+    """Header (logo, business info, invoice meta) and the bill-to block."""
+    normal, h2 = tpl.normal, tpl.h2
+    story: List[Any] = []
 
     # --- Header row: Logo + Business info + Invoice meta ---
-    left_cells = []
-
-    logo_file = Path(LOGO_PATH)
-    if logo_file.exists():
-        img = Image(str(logo_file), width=1.0 * inch, height=1.0 * inch)
-        left_cells.append(img)
-    else:
-        left_cells.append(Spacer(1, 1.0 * inch))
-
-    biz_lines = _clean_lines(
-        BUSINESS_NAME,
-        *BUSINESS_ADDRESS_LINES,
-        BUSINESS_PHONE,
-        BUSINESS_EMAIL
-    )
-    biz_block = "<br/>".join([f"<b>{biz_lines[0]}</b>"] + biz_lines[1:]) if biz_lines else ""
-    left_cells.append(Paragraph(biz_block, normal))
-
-    left_table = Table([[left_cells[0], left_cells[1]]], colWidths=[1.1 * inch, 3.6 * inch])
-    left_table.setStyle(TableStyle([
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 0),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 0),
-        ("TOPPADDING", (0, 0), (-1, -1), 0),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
-    ]))
+    left_table = tpl.business_block()
 
     meta_block = "<br/>".join([
         "<b>INVOICE</b>",
@@ -127,15 +309,7 @@ def build_invoice_pdf(data: Dict[str, Any]) -> str:
     meta_para = Paragraph(meta_block, normal)
 
     header = Table([[left_table, meta_para]], colWidths=[4.9 * inch, 2.0 * inch])
-    header.setStyle(TableStyle([
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("ALIGN", (1, 0), (1, 0), "RIGHT"),
-        ("BOX", (1, 0), (1, 0), 1, colors.black),
-        ("LEFTPADDING", (0, 0), (-1, -1), 0),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-        ("TOPPADDING", (0, 0), (-1, -1), 0),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
-    ]))
+    header.setStyle(_HEADER_STYLE)
 
     story.append(header)
     story.append(Spacer(1, 0.25 * inch))
@@ -156,50 +330,24 @@ def build_invoice_pdf(data: Dict[str, Any]) -> str:
 
     story.append(Paragraph("<br/>".join(bill_lines_html), normal))
     story.append(Spacer(1, 0.25 * inch))
+    return story
 
-    # --- Items table ---
-    table_data = [["Description", "Qty", "Unit", "Line Total"]]
-    subtotal = 0.0
 
-    for it in items:
-        qty = float(it["qty"])
-        unit_price = float(it["unit_price"])
-        line_total = qty * unit_price
-        subtotal += line_total
+def _final_totals(inv: Dict[str, Any], subtotal: float) -> Tuple[float, float, float]:
+    """(subtotal, tax, total), preferring the totals stored on the invoice row."""
+    if "total" in inv:
+        # Stored on the invoice row and kept in step with its items by the db
+        return float(inv["subtotal"]), float(inv["tax"]), float(inv["total"])
+    tax = subtotal * float(inv["tax_rate"])
+    return subtotal, tax, subtotal + tax
 
 
-        desc = str(it["description"]).replace("\n", "<br/>")
-        table_data.append([
-            Paragraph(desc, normal), # type: ignore
-            f"{qty:g}",
-            money(unit_price),
-            money(line_total),
-        ])
-
+def _closing_story(inv: Dict[str, Any], subtotal: float, tpl: InvoiceTemplate) -> List[Any]:
+    """Totals box, notes and sign-off after the items."""
+    normal, small, h2 = tpl.normal, tpl.small, tpl.h2
     tax_rate = float(inv["tax_rate"])
-    tax = subtotal * tax_rate
-    total = subtotal + tax
-
-    items_table = Table(
-        table_data,
-        colWidths=[4.4 * inch, 0.7 * inch, 0.9 * inch, 1.0 * inch],
-        hAlign="LEFT"
-    )
-    items_table.setStyle(TableStyle([
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("LINEBELOW", (0, 0), (-1, 0), 1, colors.black),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-        ("ALIGN", (1, 1), (-1, -1), "RIGHT"),
-        ("LEFTPADDING", (0, 0), (-1, -1), 4),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 4),
-        ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.lightgrey),
-    ]))
-
-    story.append(items_table)
-    story.append(Spacer(1, 0.2 * inch))
+    subtotal, tax, total = _final_totals(inv, subtotal)
+    story: List[Any] = []
 
     # --- Totals box ---
     totals_data = [
@@ -208,14 +356,7 @@ def build_invoice_pdf(data: Dict[str, Any]) -> str:
         ["Total:", money(total)],
     ]
     totals_table = Table(totals_data, colWidths=[1.3 * inch, 1.2 * inch], hAlign="RIGHT")
-    totals_table.setStyle(TableStyle([
-        ("ALIGN", (0, 0), (-1, -1), "RIGHT"),
-        ("FONTNAME", (0, 0), (-1, 1), "Helvetica"),
-        ("FONTNAME", (0, 2), (-1, 2), "Helvetica-Bold"),
-        ("LINEABOVE", (0, 0), (-1, 0), 1, colors.black),
-        ("TOPPADDING", (0, 0), (-1, -1), 4),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-    ]))
+    totals_table.setStyle(_TOTALS_STYLE)
     story.append(totals_table)
     story.append(Spacer(1, 0.25 * inch))
 
@@ -227,6 +368,292 @@ def build_invoice_pdf(data: Dict[str, Any]) -> str:
         story.append(Spacer(1, 0.15 * inch))
 
     story.append(Paragraph("Thank you for your business!", small))
+    return story
 
-    doc.build(story)
-    return pdf_path
+
+def render_invoice_pdf(data: Dict[str, Any], out: BinaryIO, template: InvoiceTemplate | None = None) -> None:
+    """
+    Renders the invoice into any writable binary stream (file, BytesIO, zip entry...).
+    Invoices with more than LARGE_INVOICE_ITEMS items, or whose items are an
+    iterator rather than a list, go through render_large_invoice_pdf().
+    """
+    inv = data["invoice"]
+    client = data["client"]
+    items = data["items"]
+    if not isinstance(items, list) or len(items) > LARGE_INVOICE_ITEMS:
+        render_large_invoice_pdf(data, out, template)
+        return
+    with metrics.span("pdf.template"):
+        tpl = template or get_template()
+    normal = tpl.normal
+
+    with metrics.span("pdf.header"):
+        doc = SimpleDocTemplate(
+            out,
+            pagesize=LETTER,
+            leftMargin=_MARGIN,
+            rightMargin=_MARGIN,
+            topMargin=_MARGIN,
+            bottomMargin=_MARGIN,
+            title=f"Invoice {inv['invoice_number']}"
+        )
+
+        story = _intro_story(inv, client, tpl)
+
+    # --- Items table ---
+    with metrics.span("pdf.items_table"):
+        table_data = [list(_ITEM_HEADER)]
+        subtotal = 0.0
+
+        for it in items:
+            qty = float(it["qty"])
+            unit_price = float(it["unit_price"])
+            line_total = qty * unit_price
+            subtotal += line_total
+
+
+            desc = str(it["description"]).replace("\n", "<br/>")
+            table_data.append([
+                Paragraph(desc, normal), # type: ignore
+                f"{qty:g}",
+                money(unit_price),
+                money(line_total),
+            ])
+
+        # splitInRow lets a description taller than a page continue on the next one
+        items_table = Table(
+            table_data,
+            colWidths=_ITEM_COL_WIDTHS,
+            hAlign="LEFT",
+            splitInRow=1
+        )
+        items_table.setStyle(_ITEMS_STYLE)
+
+    story.append(items_table)
+    story.append(Spacer(1, 0.2 * inch))
+    story.extend(_closing_story(inv, subtotal, tpl))
+
+    with metrics.span("pdf.doc_build"):
+        doc.build(story)
+
+
+# ---- Large-invoice mode ----
+# One platypus Table holding a Paragraph per item gets slow (table layout is
+# super-linear) and memory-hungry past a few hundred rows. Large invoices
+# instead lay the items out a page at a time: _ItemRows stands for all the
+# items not placed yet, and each time the frame asks it to split it hands back
+# one page's worth as an _ItemPage, which draws its rows directly. Each page
+# repeats the column header, continuation pages open with the amount brought
+# forward, and each page ends with its own subtotal and the running total
+# carried forward. Plain one-line descriptions are drawn as strings; only
+# descriptions that wrap or contain markup get a Paragraph, and one taller
+# than a page is split across pages. Items are consumed one at a time, so when
+# they come from an iterator the item data is never all in memory either.
+
+LARGE_INVOICE_ITEMS = 300
+
+_ROW_FONT = "Helvetica"
+_ROW_FONT_BOLD = "Helvetica-Bold"
+_ROW_FONT_SIZE = 10
+_CELL_PAD = 4
+_ROW_HEIGHT = 12 + 2 * _CELL_PAD  # one line at the body leading, plus padding
+_FRAME_HEIGHT = LETTER[1] - 2 * _MARGIN
+_DESC_WIDTH = _ITEM_COL_WIDTHS[0] - 2 * _CELL_PAD
+_COL_X = [0.0, *accumulate(_ITEM_COL_WIDTHS)]
+
+# (cells, height, font, line total); the description cell is a str or a Paragraph
+_Row = Tuple[Tuple[Any, str, str, str], float, str, float]
+
+
+def _total_row(label: str, amount: float) -> _Row:
+    return (label, "", "", money(amount)), _ROW_HEIGHT, _ROW_FONT_BOLD, 0.0
+
+
+def _para_row(desc: Paragraph, numbers: Tuple[str, str, str], amount: float) -> _Row:
+    height = desc.wrap(_DESC_WIDTH, _FRAME_HEIGHT)[1] + 2 * _CELL_PAD
+    return (desc, *numbers), height, _ROW_FONT, amount
+
+
+class _ItemPage(Flowable):
+    """One page's slice of the item table, header and total rows included."""
+
+    def __init__(self, rows: List[_Row]):
+        super().__init__()
+        self.rows = rows
+        self.width = _COL_X[-1]
+        self.height = sum(row[1] for row in rows)
+
+    def wrap(self, availWidth: float, availHeight: float) -> Tuple[float, float]:
+        return self.width, self.height
+
+    def draw(self) -> None:
+        c = self.canv
+        c.setFillColor(colors.whitesmoke)
+        c.rect(0, self.height - _ROW_HEIGHT, self.width, _ROW_HEIGHT, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        y = self.height
+        row_lines = [y]
+        for cells, height, font, _ in self.rows:
+            desc = cells[0]
+            baseline = y - _CELL_PAD - _ROW_FONT_SIZE
+            if isinstance(desc, Paragraph):
+                desc.drawOn(c, _CELL_PAD, y - height + _CELL_PAD)
+            c.setFont(font, _ROW_FONT_SIZE)
+            if not isinstance(desc, Paragraph):
+                c.drawString(_CELL_PAD, baseline, desc)
+            for i, text in enumerate(cells[1:], 1):
+                if text:
+                    c.drawRightString(_COL_X[i + 1] - _CELL_PAD, baseline, text)
+            y -= height
+            row_lines.append(y)
+        c.setStrokeColor(colors.lightgrey)
+        c.setLineWidth(0.25)
+        c.grid(_COL_X, row_lines)
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(1)
+        c.line(0, row_lines[1], self.width, row_lines[1])
+
+
+class _ItemFeed:
+    """The items of one large invoice, handed out a page at a time."""
+
+    def __init__(self, items: Any, tpl: InvoiceTemplate, closing: Callable[[float], List[Any]]):
+        self.items = iter(items)
+        self.tpl = tpl
+        self.closing = closing
+        self.pending: Deque[_Row] = deque()  # rows taken from items but not placed yet
+        self.running = 0.0
+        self.started = False
+
+    def _next_row(self) -> _Row | None:
+        if self.pending:
+            return self.pending.popleft()
+        it = next(self.items, None)
+        if it is None:
+            return None
+        qty = float(it["qty"])
+        unit_price = float(it["unit_price"])
+        line_total = qty * unit_price
+        numbers = (f"{qty:g}", money(unit_price), money(line_total))
+        desc = str(it["description"])
+        if "\n" in desc or "<" in desc or "&" in desc or stringWidth(desc, _ROW_FONT, _ROW_FONT_SIZE) > _DESC_WIDTH:
+            return _para_row(Paragraph(desc.replace("\n", "<br/>"), self.tpl.normal), numbers, line_total)
+        return (desc, *numbers), _ROW_HEIGHT, _ROW_FONT, line_total
+
+    def _split_row(self, row: _Row, room: float) -> _Row:
+        """The part of `row` that fits in `room`; the rest goes back to the front of pending."""
+        cells, _, _, amount = row
+        desc = cells[0]
+        parts = desc.split(_DESC_WIDTH, room - 2 * _CELL_PAD) if isinstance(desc, Paragraph) else []
+        if len(parts) != 2:
+            return row  # can't be split; the frame reports it as too large
+        self.pending.appendleft(_para_row(parts[1], ("", "", ""), 0.0))
+        return _para_row(parts[0], cells[1:], amount)
+
+    def next_page(self, avail: float) -> List[Any]:
+        """
+        Flowables for the next `avail` points of the frame: an _ItemPage, then
+        either an _ItemRows for the rest or, after the last item, the closing
+        story. Returns [] (taking nothing) when not even one row fits here.
+        """
+        rows = [(_ITEM_HEADER, _ROW_HEIGHT, _ROW_FONT_BOLD, 0.0)]
+        if self.started:
+            rows.append(_total_row("Brought forward", self.running))
+        # Keep room for the page subtotal and carried-forward rows
+        room = avail - (len(rows) + 2) * _ROW_HEIGHT
+        taken: List[_Row] = []
+        done = False
+        while True:
+            row = self._next_row()
+            if row is None:
+                done = True
+                break
+            if row[1] > room:
+                if taken or avail < _FRAME_HEIGHT - 1:
+                    self.pending.appendleft(row)
+                    if not taken:
+                        return []  # try again at the top of the next page
+                    break
+                # Taller than a whole page: place as much of it as fits
+                row = self._split_row(row, room)
+            taken.append(row)
+            room -= row[1]
+
+        page_subtotal = sum(row[3] for row in taken)
+        self.running += page_subtotal
+        self.started = True
+        rows.extend(taken)
+        if done:
+            return [_ItemPage(rows), Spacer(1, 0.2 * inch), *self.closing(self.running)]
+        rows.append(_total_row("Page subtotal", page_subtotal))
+        rows.append(_total_row("Carried forward", self.running))
+        return [_ItemPage(rows), _ItemRows(self)]
+
+
+class _ItemRows(Flowable):
+    """
+    Every item not placed yet. It never fits, so the frame always asks it to
+    split, and _ItemFeed.next_page() decides what goes on this page.
+    """
+
+    def __init__(self, feed: _ItemFeed):
+        super().__init__()
+        self.feed = feed
+
+    def wrap(self, availWidth: float, availHeight: float) -> Tuple[float, float]:
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth: float, availHeight: float) -> List[Any]:
+        return self.feed.next_page(availHeight)
+
+    def draw(self) -> None:
+        pass  # only ever split
+
+
+def _large_page_footer(canvas: Canvas, doc: BaseDocTemplate) -> None:
+    canvas.saveState()
+    canvas.setFont(_ROW_FONT, 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawCentredString(doc.pagesize[0] / 2, _MARGIN / 2, f"{doc.title} - page {canvas.getPageNumber()}")
+    canvas.restoreState()
+
+
+def render_large_invoice_pdf(
+    data: Dict[str, Any], out: BinaryIO, template: InvoiceTemplate | None = None
+) -> None:
+    """
+    Large-invoice mode of render_invoice_pdf(): layout time is linear in the
+    number of items and only one page of them is held at a time (the drawn
+    pages are kept until the end, as for any ReportLab document).
+    data["items"] may be any iterable of item dicts.
+    """
+    inv = data["invoice"]
+    with metrics.span("pdf.template"):
+        tpl = template or get_template()
+    with metrics.span("pdf.header"):
+        doc = BaseDocTemplate(
+            out,
+            pagesize=LETTER,
+            leftMargin=_MARGIN,
+            rightMargin=_MARGIN,
+            topMargin=_MARGIN,
+            bottomMargin=_MARGIN,
+            title=f"Invoice {inv['invoice_number']}",
+            pageCompression=1,
+        )
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height,
+                      leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0)
+        doc.addPageTemplates([PageTemplate("large", [frame], onPageEnd=_large_page_footer)])
+        story = _intro_story(inv, data["client"], tpl)
+    with metrics.span("pdf.items_table"):
+        feed = _ItemFeed(data["items"], tpl, lambda subtotal: _closing_story(inv, subtotal, tpl))
+        story.append(_ItemRows(feed))
+    # Items are laid out page by page as the document is built
+    with metrics.span("pdf.doc_build"):
+        doc.build(story)
+
+
+# Whole-call timings while metrics are enabled; the stages above are spans
+metrics.instrument(globals(), [
+    "build_invoice_pdf", "build_invoice_pdf_cached", "render_invoice_pdf", "render_invoice_pdf_bytes",
+], prefix="pdf")
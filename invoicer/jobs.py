@@ -0,0 +1,198 @@
+# jobs.py
+# Persistent background queue for invoice PDF renders. Jobs live in the pdf_jobs
+# table, so they survive restarts; a worker thread (started once per app process,
+# or standalone via this script) claims them one at a time.
+#
+# A running job holds a lease until run_after. If its worker dies, the lease
+# expires and another worker picks the job up again. Failures are retried with
+# exponential backoff up to MAX_ATTEMPTS.
+#
+#   python jobs.py                 # run a standalone worker
+#   python jobs.py --status        # job counts by status
+#   python jobs.py --retry-failed  # requeue jobs that ran out of attempts
+from __future__ import annotations
+
+import argparse
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import db
+
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 5.0       # seconds before the first retry; doubles per attempt
+LEASE_SECONDS = 300.0   # a running job not finished by then is assumed abandoned
+POLL_INTERVAL = 1.0     # idle worker's check for jobs queued by other processes
+
+# Set by enqueue_pdf() so a worker in this process starts without waiting a poll interval
+_wakeup = threading.Event()
+
+
+def enqueue_pdf(invoice_id: int) -> int:
+    """
+    Queues a PDF render for the invoice and returns the job id. Reuses a job that
+    is already queued or running for it. Joins the caller's transaction, if any.
+    """
+    with db.transaction() as conn:
+        row = conn.execute("""
+            SELECT job_id FROM pdf_jobs
+            WHERE invoice_id=? AND status IN ('queued', 'running')
+            ORDER BY job_id DESC LIMIT 1
+        """, (invoice_id,)).fetchone()
+        if row is not None:
+            job_id = int(row["job_id"])
+        else:
+            job_id = conn.execute(
+                "INSERT INTO pdf_jobs(invoice_id) VALUES (?) RETURNING job_id", (invoice_id,)
+            ).fetchone()["job_id"]
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    row = db.get_conn().execute("SELECT * FROM pdf_jobs WHERE job_id=?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def job_counts() -> Dict[str, int]:
+    rows = db.get_conn().execute("SELECT status, COUNT(*) AS n FROM pdf_jobs GROUP BY status")
+    return {r["status"]: r["n"] for r in rows}
+
+
+def retry_job(job_id: int) -> None:
+    """Puts a failed job back in the queue with a fresh set of attempts."""
+    with db.transaction() as conn:
+        conn.execute("""
+            UPDATE pdf_jobs SET status='queued', attempts=0, run_after=0, updated_at=datetime('now')
+            WHERE job_id=? AND status='failed'
+        """, (job_id,))
+    _wakeup.set()
+
+
+def retry_failed() -> int:
+    with db.transaction() as conn:
+        cur = conn.execute("""
+            UPDATE pdf_jobs SET status='queued', attempts=0, run_after=0, updated_at=datetime('now')
+            WHERE status='failed'
+        """)
+    _wakeup.set()
+    return cur.rowcount
+
+
+def claim_next() -> Optional[Dict[str, Any]]:
+    """
+    Atomically takes the oldest due job: a queued job past its retry delay, or a
+    running job whose lease has expired. Returns None if nothing is due.
+    """
+    now = time.time()
+    with db.transaction() as conn:
+        row = conn.execute("""
+            UPDATE pdf_jobs
+            SET status='running', attempts=attempts + 1, run_after=?, updated_at=datetime('now')
+            WHERE job_id = (
+                SELECT job_id FROM pdf_jobs
+                WHERE status IN ('queued', 'running') AND run_after <= ?
+                ORDER BY run_after, job_id LIMIT 1
+            )
+            RETURNING *
+        """, (now + LEASE_SECONDS, now)).fetchone()
+    return dict(row) if row else None
+
+
+def _complete(job: Dict[str, Any], pdf_path: str, pdf_hash: str) -> None:
+    with db.transaction() as conn:
+        db.set_invoice_pdf_path(job["invoice_id"], pdf_path, pdf_hash)
+        conn.execute("""
+            UPDATE pdf_jobs SET status='done', pdf_path=?, last_error=NULL, updated_at=datetime('now')
+            WHERE job_id=?
+        """, (pdf_path, job["job_id"]))
+
+
+def _fail(job: Dict[str, Any], error: str) -> None:
+    if job["attempts"] >= MAX_ATTEMPTS:
+        status, run_after = "failed", 0.0
+    else:
+        status, run_after = "queued", time.time() + RETRY_DELAY * 2 ** (job["attempts"] - 1)
+    with db.transaction() as conn:
+        conn.execute("""
+            UPDATE pdf_jobs SET status=?, run_after=?, last_error=?, updated_at=datetime('now')
+            WHERE job_id=?
+        """, (status, run_after, error, job["job_id"]))
+
+
+def run_job(job: Dict[str, Any]) -> bool:
+    """Renders a claimed job's invoice and records the outcome. Returns True on success."""
+    # Imported here so processes that only enqueue never load ReportLab
+    from invoice_pdf import build_invoice_pdf_cached
+    try:
+        data = db.get_invoice_with_items(job["invoice_id"])
+        pdf_path, pdf_hash, _ = build_invoice_pdf_cached(data)
+    except Exception as e:
+        _fail(job, repr(e))
+        return False
+    _complete(job, pdf_path, pdf_hash)
+    return True
+
+
+class PdfWorker(threading.Thread):
+    """Daemon thread that runs queued PDF jobs until stop() is called."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        super().__init__(name="pdf-worker", daemon=True)
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = claim_next()
+            except Exception:
+                job = None  # e.g. database briefly locked; try again after the poll interval
+            if job is None:
+                _wakeup.wait(self.poll_interval)
+                _wakeup.clear()
+                continue
+            try:
+                run_job(job)
+            except Exception:
+                pass  # couldn't record the outcome; the job is retried once its lease expires
+        db.close_conn()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        _wakeup.set()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Background PDF render worker")
+    parser.add_argument("--threads", type=int, default=1, help="worker threads in this process")
+    parser.add_argument("--status", action="store_true", help="print job counts by status and exit")
+    parser.add_argument("--retry-failed", action="store_true", help="requeue failed jobs and exit")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    if args.status:
+        for status, n in sorted(job_counts().items()):
+            print(f"{status:8} {n}")
+        return 0
+    if args.retry_failed:
+        print(f"Requeued {retry_failed()} failed job(s)")
+        return 0
+
+    workers = [PdfWorker() for _ in range(args.threads)]
+    for w in workers:
+        w.start()
+    try:
+        while any(w.is_alive() for w in workers):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for w in workers:
+            w.stop()
+        for w in workers:
+            w.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
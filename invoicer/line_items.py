@@ -0,0 +1,120 @@
+# line_items.py
+# Line-item bookkeeping for the app's table editor. The editor is shown over a
+# fixed base list of items; st.data_editor keeps the user's changes as a delta
+# (edited_rows / added_rows / deleted_rows against base positions). Totals are
+# the base subtotal plus an adjustment computed from the delta alone, so an edit
+# costs the same whatever the number of items. merge() folds the delta into a
+# new base when the editor is reset (e.g. after adding items from the forms).
+import csv
+import io
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+CATEGORIES = ["labor", "material", "misc"]
+COLUMNS = ["description", "category", "qty", "unit_price"]
+
+
+def line_total(it: Mapping[str, Any]) -> float:
+    return _num(it.get("qty")) * _num(it.get("unit_price"))
+
+
+def _num(value: Any) -> float:
+    # Cleared cells and freshly added rows come back as None
+    try:
+        return float(value) if value is not None else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def clean_item(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """A row as stored and rendered: stripped description, float qty/price, known category."""
+    category = row.get("category")
+    return {
+        "description": str(row.get("description") or "").strip(),
+        "qty": _num(row.get("qty")),
+        "unit_price": _num(row.get("unit_price")),
+        "category": category if category in CATEGORIES else "misc",
+    }
+
+
+def _edited(base: List[Dict[str, Any]], pos: int, changes: Mapping[str, Any]) -> Dict[str, Any]:
+    return clean_item({**base[pos], **changes})
+
+
+class Delta:
+    """Summary of a data_editor state against the base list: count, subtotal change and invalid rows."""
+
+    def __init__(self, base: List[Dict[str, Any]], state: Optional[Mapping[str, Any]]):
+        state = state or {}
+        self.edited = {int(pos): changes for pos, changes in (state.get("edited_rows") or {}).items()}
+        self.added = list(state.get("added_rows") or [])
+        self.deleted = {int(pos) for pos in state.get("deleted_rows") or []}
+
+        self.count_change = len(self.added) - len(self.deleted)
+        self.subtotal_change = 0.0
+        self.invalid = 0  # rows without a description
+        for pos in self.deleted:
+            self.subtotal_change -= line_total(base[pos])
+        for pos, changes in self.edited.items():
+            if pos in self.deleted:
+                continue
+            row = _edited(base, pos, changes)
+            self.subtotal_change += line_total(row) - line_total(base[pos])
+            self.invalid += not row["description"]
+        for added in self.added:
+            row = clean_item(added)
+            self.subtotal_change += line_total(row)
+            self.invalid += not row["description"]
+
+
+def merge(base: List[Dict[str, Any]], delta: Delta) -> List[Dict[str, Any]]:
+    """The base list with the editor's changes applied (full pass; used on reset and submit)."""
+    if not (delta.edited or delta.added or delta.deleted):
+        return base
+    items = [
+        _edited(base, pos, delta.edited[pos]) if pos in delta.edited else it
+        for pos, it in enumerate(base)
+        if pos not in delta.deleted
+    ]
+    items.extend(clean_item(row) for row in delta.added)
+    return items
+
+
+def frame(items: List[Dict[str, Any]]) -> Any:
+    """The items as a DataFrame for st.data_editor, typed even when empty so rows can be added."""
+    import pandas as pd  # loaded with Streamlit anyway; kept out of module import for the CLI tools
+    df = pd.DataFrame(items, columns=COLUMNS)
+    return df.astype({"description": "string", "category": "string", "qty": "float64", "unit_price": "float64"})
+
+
+def parse_pasted(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Parses rows copied from a spreadsheet (tab separated, or comma separated) in
+    the column order description, qty, unit price[, category]. A header row is
+    skipped. Returns (items, errors).
+    """
+    lines = [ln for ln in text.splitlines() if ln.strip()]
+    if not lines:
+        return [], []
+    delimiter = "\t" if any("\t" in ln for ln in lines) else ","
+    items: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    for n, cells in enumerate(csv.reader(io.StringIO("\n".join(lines)), delimiter=delimiter), start=1):
+        cells = [c.strip() for c in cells]
+        if len(cells) < 3:
+            errors.append(f"Row {n}: expected description, qty and unit price")
+            continue
+        qty, price = (c.replace("$", "").replace(",", "") for c in cells[1:3])
+        try:
+            qty_f, price_f = float(qty), float(price)
+        except ValueError:
+            if n == 1:
+                continue  # header row
+            errors.append(f"Row {n}: qty and unit price must be numbers")
+            continue
+        if not cells[0]:
+            errors.append(f"Row {n}: description required")
+            continue
+        category = cells[3].lower() if len(cells) > 3 else "material"
+        items.append(clean_item({"description": cells[0], "qty": qty_f, "unit_price": price_f,
+                                 "category": category}))
+    return items, errors
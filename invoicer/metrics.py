@@ -0,0 +1,265 @@
+# metrics.py
+# In-process latency metrics for the db.py functions, SQLite statements and the
+# stages of PDF rendering, with a slow-query log. Exported as Prometheus text or
+# JSON (see serve()), and shown by the app's diagnostics panel.
+#
+# Off by default (settings.METRICS_ENABLED). While off, the registered functions
+# are the plain originals and span() hands back a shared no-op, so the only cost
+# is a flag check per span. enable() swaps timing wrappers in; disable() swaps
+# the originals back.
+from __future__ import annotations
+
+import functools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Tuple
+
+import settings
+
+# Prometheus histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+# Samples kept per metric for percentiles in snapshot()
+RECENT_SAMPLES = 500
+SLOW_QUERY_LOG = 100
+
+enabled = False
+
+_lock = threading.Lock()
+_series: Dict[str, "_Series"] = {}
+_slow_queries: Deque[Dict[str, Any]] = deque(maxlen=SLOW_QUERY_LOG)
+# (module namespace, function name, metric name) registered by instrument()
+_targets: List[Tuple[Dict[str, Any], str, str]] = []
+_originals: Dict[Tuple[int, str], Callable] = {}
+
+
+class _Series:
+    __slots__ = ("count", "total", "buckets", "recent", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Records one latency sample under `name`."""
+    with _lock:
+        s = _series.get(name)
+        if s is None:
+            s = _series[name] = _Series()
+        s.count += 1
+        s.total += seconds
+        s.max = max(s.max, seconds)
+        s.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                s.buckets[i] += 1
+                break
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        observe(self.name, time.perf_counter() - self.t0)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str) -> Any:
+    """Context manager timing the enclosed block, or a no-op while disabled."""
+    return _Span(name) if enabled else _NOOP
+
+
+def _timed(fn: Callable, name: str) -> Callable:
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe(name, time.perf_counter() - t0)
+    return wrapper
+
+
+def instrument(namespace: Dict[str, Any], names: Iterable[str], prefix: str) -> None:
+    """
+    Registers module-level functions (pass the module's globals()) to be timed as
+    "<prefix>.<name>" while metrics are enabled. Callers must look them up through
+    the module (db.create_client), not hold on to `from db import ...` copies.
+    """
+    for fn_name in names:
+        _targets.append((namespace, fn_name, f"{prefix}.{fn_name}"))
+    if enabled:
+        _patch()
+
+
+def _patch() -> None:
+    for namespace, fn_name, metric in _targets:
+        key = (id(namespace), fn_name)
+        if key not in _originals:
+            _originals[key] = namespace[fn_name]
+            namespace[fn_name] = _timed(namespace[fn_name], metric)
+
+
+def enable() -> None:
+    global enabled
+    with _lock:
+        enabled = True
+    _patch()
+
+
+def disable() -> None:
+    global enabled
+    with _lock:
+        enabled = False
+    for namespace, fn_name, _ in _targets:
+        original = _originals.pop((id(namespace), fn_name), None)
+        if original is not None:
+            namespace[fn_name] = original
+
+
+def reset() -> None:
+    with _lock:
+        _series.clear()
+        _slow_queries.clear()
+
+
+# ---- SQLite statements ----
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that times execute()/executemany() and logs slow statements.
+    db.py opens its connections with this factory while metrics are enabled."""
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:  # type: ignore[override]
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, parameters, time.perf_counter() - t0)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> sqlite3.Cursor:  # type: ignore[override]
+        rows = seq_of_parameters if isinstance(seq_of_parameters, list) else list(seq_of_parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, rows)
+        finally:
+            _record_query(sql, f"<{len(rows)} rows>", time.perf_counter() - t0)
+
+
+def _record_query(sql: str, parameters: Any, seconds: float) -> None:
+    observe("sqlite.statement", seconds)
+    if seconds * 1000 >= settings.SLOW_QUERY_MS:
+        with _lock:
+            _slow_queries.append({
+                "at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "ms": round(seconds * 1000, 2),
+                "sql": " ".join(sql.split()),
+                "params": repr(parameters)[:500],
+                "thread": threading.current_thread().name,
+            })
+
+
+# ---- Export ----
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def snapshot() -> Dict[str, Any]:
+    """All metrics as plain data: totals plus percentiles (ms) over recent samples."""
+    with _lock:
+        series = {name: (s.count, s.total, s.max, sorted(s.recent)) for name, s in _series.items()}
+        slow = list(_slow_queries)
+    return {
+        "enabled": enabled,
+        "metrics": {
+            name: {
+                "count": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p50_ms": _percentile(recent, 0.50) * 1000,
+                "p95_ms": _percentile(recent, 0.95) * 1000,
+                "p99_ms": _percentile(recent, 0.99) * 1000,
+                "max_ms": peak * 1000,
+            }
+            for name, (count, total, peak, recent) in sorted(series.items())
+        },
+        "slow_queries": slow,
+    }
+
+
+def prometheus_text() -> str:
+    """Histograms in the Prometheus text exposition format."""
+    lines = [
+        "# HELP invoicer_latency_seconds Latency of instrumented invoicer operations.",
+        "# TYPE invoicer_latency_seconds histogram",
+    ]
+    with _lock:
+        for name, s in sorted(_series.items()):
+            label = f'op="{name}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.buckets):
+                cumulative += n
+                lines.append(f'invoicer_latency_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'invoicer_latency_seconds_bucket{{{label},le="+Inf"}} {s.count}')
+            lines.append(f"invoicer_latency_seconds_sum{{{label}}} {s.total}")
+            lines.append(f"invoicer_latency_seconds_count{{{label}}} {s.count}")
+        lines.append("# TYPE invoicer_slow_queries_logged gauge")
+        lines.append(f"invoicer_slow_queries_logged {len(_slow_queries)}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int, host: str = "127.0.0.1") -> Any:
+    """Serves /metrics (Prometheus) and /metrics.json from a daemon thread; returns the server."""
+    # Imported here: http.server is most of this module's import time, and db.py imports it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path == "/metrics":
+                body, ctype = prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, ctype = json.dumps(snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass  # scrapes every few seconds would flood the console
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+if settings.METRICS_ENABLED:
+    enable()
@@ -0,0 +1,189 @@
+# reports.py
+# Revenue reporting. Reads only the revenue_summary table, which triggers in
+# db.py keep current as invoices and items change, so every report touches a
+# handful of pre-aggregated rows instead of scanning invoices/invoice_items.
+#
+#   python reports.py --check            # diff summaries against a full recompute
+#   python reports.py --check --repair   # ...and rebuild them if they drifted
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import db
+
+# Amounts are float sums built up by +/- deltas; ignore sub-cent drift
+TOLERANCE = 0.005
+
+
+def _filters(
+    period_from: Optional[str],
+    period_to: Optional[str],
+    status: Optional[str],
+    client_id: Optional[int] = None,
+) -> Tuple[str, List[Any]]:
+    where = []
+    params: List[Any] = []
+    if period_from:
+        where.append("s.period >= ?")
+        params.append(period_from)
+    if period_to:
+        where.append("s.period <= ?")
+        params.append(period_to)
+    if status:
+        where.append("s.status = ?")
+        params.append(status)
+    if client_id is not None:
+        where.append("s.client_id = ?")
+        params.append(client_id)
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+def _rows(sql: str, params: List[Any]) -> List[Dict[str, Any]]:
+    out = []
+    for r in db.get_conn().execute(sql, params):
+        d = dict(r)
+        d["total"] = d["amount"] + d["tax"]
+        out.append(d)
+    return out
+
+
+def revenue_by_month(
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Revenue per YYYY-MM period (inclusive bounds), oldest first."""
+    where, params = _filters(period_from, period_to, status, client_id)
+    return _rows(f"""
+        SELECT s.period, SUM(s.amount) AS amount, SUM(s.tax) AS tax
+        FROM revenue_summary s{where}
+        GROUP BY s.period HAVING ABS(SUM(s.amount)) > {TOLERANCE}
+        ORDER BY s.period
+    """, params)
+
+
+def revenue_by_category(
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Revenue split into labor / material / misc."""
+    where, params = _filters(period_from, period_to, status, client_id)
+    return _rows(f"""
+        SELECT s.category, SUM(s.amount) AS amount, SUM(s.tax) AS tax
+        FROM revenue_summary s{where}
+        GROUP BY s.category HAVING ABS(SUM(s.amount)) > {TOLERANCE}
+        ORDER BY amount DESC
+    """, params)
+
+
+def revenue_by_client(
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """Top clients by revenue."""
+    where, params = _filters(period_from, period_to, status)
+    return _rows(f"""
+        SELECT s.client_id, c.name, SUM(s.amount) AS amount, SUM(s.tax) AS tax
+        FROM revenue_summary s JOIN clients c ON c.client_id = s.client_id{where}
+        GROUP BY s.client_id HAVING ABS(SUM(s.amount)) > {TOLERANCE}
+        ORDER BY amount DESC LIMIT ?
+    """, params + [limit])
+
+
+def revenue_by_status(
+    period_from: Optional[str] = None,
+    period_to: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Revenue per invoice status (e.g. Paid vs Unpaid)."""
+    where, params = _filters(period_from, period_to, None)
+    return _rows(f"""
+        SELECT s.status, SUM(s.amount) AS amount, SUM(s.tax) AS tax
+        FROM revenue_summary s{where}
+        GROUP BY s.status HAVING ABS(SUM(s.amount)) > {TOLERANCE}
+        ORDER BY s.status
+    """, params)
+
+
+def check_consistency() -> List[Dict[str, Any]]:
+    """
+    Recomputes every summary row from invoices/invoice_items and returns the rows
+    where the incrementally maintained values differ. An empty list means consistent.
+    """
+    # Reads only (plus a TEMP table), so no write lock: the app keeps writing meanwhile
+    with db.snapshot() as conn:
+        conn.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS revenue_expected (
+                period TEXT, client_id INTEGER, category TEXT, status TEXT, amount REAL, tax REAL,
+                PRIMARY KEY (period, client_id, category, status)
+            )
+        """)
+        conn.execute("DELETE FROM revenue_expected")
+        conn.execute(
+            f"INSERT INTO revenue_expected(period, client_id, category, status, amount, tax) {db.REVENUE_FROM_SCRATCH}"
+        )
+        rows = conn.execute(f"""
+            SELECT e.period, e.client_id, e.category, e.status,
+                   e.amount AS expected_amount, COALESCE(s.amount, 0) AS actual_amount,
+                   e.tax AS expected_tax, COALESCE(s.tax, 0) AS actual_tax
+            FROM revenue_expected e
+            LEFT JOIN revenue_summary s USING (period, client_id, category, status)
+            WHERE ABS(e.amount - COALESCE(s.amount, 0)) > {TOLERANCE}
+               OR ABS(e.tax - COALESCE(s.tax, 0)) > {TOLERANCE}
+            UNION ALL
+            SELECT s.period, s.client_id, s.category, s.status,
+                   0, s.amount, 0, s.tax
+            FROM revenue_summary s
+            LEFT JOIN revenue_expected e USING (period, client_id, category, status)
+            WHERE e.period IS NULL AND (ABS(s.amount) > {TOLERANCE} OR ABS(s.tax) > {TOLERANCE})
+        """).fetchall()
+        conn.execute("DELETE FROM revenue_expected")
+    return [dict(r) for r in rows]
+
+
+def rebuild_summaries() -> None:
+    """Throws away revenue_summary and recomputes it from scratch."""
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM revenue_summary")
+        conn.execute(
+            f"INSERT INTO revenue_summary(period, client_id, category, status, amount, tax) {db.REVENUE_FROM_SCRATCH}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Revenue summary reports and consistency check")
+    parser.add_argument("--check", action="store_true", help="diff summaries against a full recompute")
+    parser.add_argument("--repair", action="store_true", help="with --check, rebuild summaries on mismatch")
+    parser.add_argument("--from", dest="period_from", help="first period, YYYY-MM")
+    parser.add_argument("--to", dest="period_to", help="last period, YYYY-MM")
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    if args.check:
+        mismatches = check_consistency()
+        if not mismatches:
+            print("revenue_summary is consistent")
+            return 0
+        print(f"{len(mismatches)} mismatched summary row(s):")
+        for m in mismatches:
+            print(f"  {m['period']} client={m['client_id']} {m['category']}/{m['status']}: "
+                  f"expected {m['expected_amount']:.2f} got {m['actual_amount']:.2f}")
+        if args.repair:
+            rebuild_summaries()
+            print("rebuilt revenue_summary")
+            return 0
+        return 1
+
+    for r in revenue_by_month(args.period_from, args.period_to):
+        print(f"{r['period']}  {r['amount']:>12,.2f}  tax {r['tax']:>10,.2f}  total {r['total']:>12,.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
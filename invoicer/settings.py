@@ -1,4 +1,6 @@
 # settings.py
+from pathlib import Path
+
 BUSINESS_NAME = "Leyton Does IT All"
 BUSINESS_PHONE = "(773) 412-3219"
 BUSINESS_EMAIL = "leytonmeadows16@gmail.com"
@@ -12,3 +14,14 @@ LOGO_PATH = "assets/logo.png"
 
 DB_PATH = "data/invoicer.db"
 INVOICE_OUTPUT_DIR = "invoices"
+
+# Relative paths above are taken from this folder, not the working directory,
+# so the app and the CLI tools find the same files wherever they're started from
+BASE_DIR = Path(__file__).resolve().parent
+LOGO_PATH, DB_PATH, INVOICE_OUTPUT_DIR = (str(BASE_DIR / p) for p in (LOGO_PATH, DB_PATH, INVOICE_OUTPUT_DIR))
+
+# Diagnostics (metrics.py): latency timing of db.py calls, SQL statements and PDF
+# stages. Can also be switched on at runtime from the app's sidebar.
+METRICS_ENABLED = False
+METRICS_PORT = None       # e.g. 9464 to serve /metrics and /metrics.json
+SLOW_QUERY_MS = 50.0      # statements at least this slow go in the slow-query log
@@ -0,0 +1,21 @@
+# tests/conftest.py
+# The app's modules import each other as top-level modules (import db), the way
+# they run from the invoicer folder; put that folder on sys.path for the tests.
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    """A migrated, empty database for the test; the app's own database is untouched."""
+    previous = db.DB_PATH
+    db.set_db_path(str(tmp_path / "test.db"))
+    db.init_db()
+    yield db
+    db.set_db_path(previous)
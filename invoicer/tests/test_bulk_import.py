@@ -0,0 +1,73 @@
+# tests/test_bulk_import.py
+import json
+
+import bulk_import
+
+
+def _item(number, description, line_price=10.0):
+    return {
+        "invoice_number": number, "client_ref": "C1", "issue_date": "2024-03-01",
+        "due_date": "2024-03-31", "tax_rate": "0.1", "status": "Unpaid",
+        "description": description, "qty": "1", "unit_price": str(line_price), "category": "labor",
+    }
+
+
+def test_interleaved_invoice_rows_are_rejected_not_dropped(fresh_db):
+    bulk_import.import_clients([(2, {"ref": "C1", "name": "Acme", "email": "a@acme.test"})])
+    rows = [
+        (2, _item("H-1", "First row")),
+        (3, _item("H-1", "Second row")),
+        (4, _item("H-2", "Other invoice")),
+        (5, _item("H-1", "Late row")),
+        (6, _item("H-1", "Another late row")),
+    ]
+
+    result = bulk_import.import_invoices(rows)
+
+    assert result.inserted == 2
+    assert result.skipped == 0
+    assert [line for line, _ in result.rejected] == [5, 6]
+    assert all("must be adjacent" in reason for _, reason in result.rejected)
+    conn = fresh_db.get_conn()
+    items = conn.execute("""
+        SELECT i.invoice_number, it.description FROM invoice_items it
+        JOIN invoices i USING (invoice_id) ORDER BY it.item_id
+    """).fetchall()
+    assert [tuple(r) for r in items] == [
+        ("H-1", "First row"), ("H-1", "Second row"), ("H-2", "Other invoice"),
+    ]
+
+
+def test_interleaved_rows_across_chunks_are_rejected(fresh_db):
+    bulk_import.import_clients([(2, {"ref": "C1", "name": "Acme", "email": "a@acme.test"})])
+    rows = [(2, _item("H-1", "a")), (3, _item("H-2", "b")), (4, _item("H-1", "late"))]
+
+    result = bulk_import.import_invoices(rows, chunk_rows=1)
+
+    assert result.inserted == 2
+    assert result.rejected and result.rejected[0][0] == 4
+
+
+def test_reimport_skips_invoices_already_present(fresh_db):
+    bulk_import.import_clients([(2, {"ref": "C1", "name": "Acme", "email": "a@acme.test"})])
+    rows = [(2, _item("H-1", "a")), (3, _item("H-1", "b"))]
+    bulk_import.import_invoices(rows)
+
+    again = bulk_import.import_invoices(rows)
+
+    assert (again.inserted, again.skipped, again.rejected) == (0, 1, [])
+
+
+def test_invoice_created_after_keep_indexes_import_gets_next_number(fresh_db, tmp_path):
+    bulk_import.import_clients([(2, {"ref": "C1", "name": "Acme", "email": "a@acme.test"})])
+    client_id = fresh_db.get_conn().execute("SELECT client_id FROM clients").fetchone()[0]
+    item = {"description": "Work", "qty": 1, "unit_price": 10, "category": "labor"}
+    first = fresh_db.create_invoice_with_items(client_id, "2026-01-05", "2026-02-04", "", 0.1, [item])
+    assert first["invoice"]["invoice_number"] == "2026-00001"
+    path = tmp_path / "invoices.jsonl"
+    path.write_text(json.dumps(_item("2026-00002", "Imported")) + "\n")
+
+    assert bulk_import.main(["invoices", str(path), "--keep-indexes", "--quiet"]) == 0
+
+    created = fresh_db.create_invoice_with_items(client_id, "2026-03-01", "2026-03-31", "", 0.1, [item])
+    assert created["invoice"]["invoice_number"] == "2026-00003"
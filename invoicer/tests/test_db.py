@@ -0,0 +1,39 @@
+# tests/test_db.py
+import pytest
+
+
+def _invoice(db):
+    client_id = db.create_client("Acme", "", "a@acme.test", "")
+    item = {"description": "Work", "qty": 1, "unit_price": 10, "category": "labor"}
+    return db.create_invoice_with_items(client_id, "2026-01-05", "2026-02-04", "", 0.1, [item])["invoice"]
+
+
+def test_set_invoice_pdf_path_without_hash_keeps_stored_hash(fresh_db):
+    invoice_id = _invoice(fresh_db)["invoice_id"]
+    fresh_db.set_invoice_pdf_path(invoice_id, "invoices/a.pdf", "abc123")
+
+    fresh_db.set_invoice_pdf_path(invoice_id, "invoices/b.pdf")
+
+    row = fresh_db.get_conn().execute(
+        "SELECT pdf_path, pdf_hash FROM invoices WHERE invoice_id=?", (invoice_id,)).fetchone()
+    assert tuple(row) == ("invoices/b.pdf", "abc123")
+
+
+def test_transaction_keeps_the_error_when_sqlite_already_rolled_back(fresh_db):
+    with pytest.raises(ZeroDivisionError):
+        with fresh_db.transaction() as conn:
+            conn.execute("ROLLBACK")  # as SQLite does by itself on e.g. SQLITE_FULL
+            1 / 0
+    assert not fresh_db.get_conn().in_transaction
+    fresh_db.create_client("After", "", "", "")
+
+
+def test_deleting_an_invoice_removes_its_revenue(fresh_db):
+    invoice_id = _invoice(fresh_db)["invoice_id"]
+    conn = fresh_db.get_conn()
+    assert conn.execute("SELECT SUM(amount) FROM revenue_summary").fetchone()[0] == 10
+
+    with fresh_db.transaction() as conn:
+        conn.execute("DELETE FROM invoices WHERE invoice_id=?", (invoice_id,))
+
+    assert conn.execute("SELECT COALESCE(SUM(amount), 0) FROM revenue_summary").fetchone()[0] == 0
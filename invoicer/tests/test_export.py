@@ -0,0 +1,34 @@
+# tests/test_export.py
+import os
+
+import pytest
+
+import export
+
+
+def _seed(db):
+    client_id = db.create_client("Acme", "", "a@acme.test", "")
+    item = {"description": "Work", "qty": 1, "unit_price": 10, "category": "labor"}
+    db.create_invoice_with_items(client_id, "2026-01-05", "2026-02-04", "", 0.1, [item])
+
+
+def test_export_inside_a_transaction(fresh_db, tmp_path):
+    _seed(fresh_db)
+    with fresh_db.transaction():
+        counts = export.export_ledger(str(tmp_path / "out"), fmt="csv")
+    assert counts == {"clients": 1, "invoices": 1, "invoice_items": 1}
+
+
+def test_failed_close_leaves_no_partial_files(fresh_db, tmp_path, monkeypatch):
+    _seed(fresh_db)
+
+    def fail_replace(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(export.os, "replace", fail_replace)
+    out = tmp_path / "out"
+    with pytest.raises(OSError, match="disk full"):
+        export.export_ledger(str(out), fmt="csv")
+
+    assert [name for _, _, files in os.walk(out) for name in files] == []
+    assert not fresh_db.get_conn().in_transaction
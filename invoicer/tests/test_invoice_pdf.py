@@ -0,0 +1,79 @@
+# tests/test_invoice_pdf.py
+import io
+import re
+
+import pytest
+from pypdf import PdfReader
+
+import invoice_pdf
+
+# About 15 pages of text in one description cell
+OVERSIZED = " ".join(f"word{i}" for i in range(4000))
+
+
+def _invoice(items):
+    return {
+        "invoice": {"invoice_number": "INV-T1", "issue_date": "2026-01-01", "due_date": "2026-01-31",
+                    "notes": "", "tax_rate": 0.1},
+        "client": {"name": "Test Client", "address": "1 Test Street", "phone": "", "email": ""},
+        "items": items,
+    }
+
+
+def _pages_text(pdf: bytes):
+    return [page.extract_text() for page in PdfReader(io.BytesIO(pdf)).pages]
+
+
+@pytest.mark.parametrize("large", [False, True], ids=["table", "large"])
+def test_oversized_description_continues_across_pages(large):
+    items = [
+        {"description": "Setup", "qty": 1, "unit_price": 10},
+        {"description": OVERSIZED, "qty": 2, "unit_price": 25},
+        {"description": "Wrap-up", "qty": 1, "unit_price": 5},
+    ]
+    buf = io.BytesIO()
+    if large:
+        invoice_pdf.render_large_invoice_pdf(_invoice(iter(items)), buf)
+    else:
+        invoice_pdf.render_invoice_pdf(_invoice(items), buf)
+
+    pages = _pages_text(buf.getvalue())
+    assert len(pages) > 10
+    text = "\n".join(pages)
+    # Every word exactly once and in order: nothing dropped or repeated at the page breaks
+    assert re.findall(r"word\d+", text) == OVERSIZED.split()
+    assert "Wrap-up" in text
+    assert "$65.00" in text  # subtotal
+    assert "$71.50" in text  # total
+
+
+def test_large_mode_carries_totals_between_pages():
+    items = [{"description": f"Item {i}", "qty": 1, "unit_price": 1} for i in range(120)]
+    buf = io.BytesIO()
+    invoice_pdf.render_large_invoice_pdf(_invoice(items), buf)
+
+    pages = _pages_text(buf.getvalue())
+    assert len(pages) > 1
+    for i, text in enumerate(pages):
+        assert "Description" in text
+        assert f"INV-T1 - page {i + 1}" in text
+    for before, after in zip(pages, pages[1:]):
+        carried = re.search(r"Carried forward\s+\$([\d.]+)", before).group(1)
+        assert re.search(r"Brought forward\s+\$([\d.]+)", after).group(1) == carried
+    assert "$120.00" in pages[-1]
+    assert all(f"Item {i}" in "\n".join(pages) for i in range(120))
+
+
+def test_cached_build_returns_legacy_relative_path_resolved(tmp_path, monkeypatch):
+    monkeypatch.setattr(invoice_pdf.settings, "BASE_DIR", tmp_path)
+    monkeypatch.chdir(tmp_path.parent)
+    (tmp_path / "invoices").mkdir()
+    (tmp_path / "invoices" / "invoice_INV-T1.pdf").write_bytes(b"%PDF-1.4")
+    data = _invoice([{"description": "Setup", "qty": 1, "unit_price": 10}])
+    data["invoice"]["pdf_path"] = "invoices/invoice_INV-T1.pdf"
+    data["invoice"]["pdf_hash"] = invoice_pdf.invoice_content_hash(data)
+
+    pdf_path, _, rendered = invoice_pdf.build_invoice_pdf_cached(data)
+
+    assert not rendered
+    assert pdf_path == str(tmp_path / "invoices" / "invoice_INV-T1.pdf")